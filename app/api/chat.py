@@ -1,13 +1,26 @@
 """OpenAI-compatible chat completions endpoint"""
 import time
 import uuid
-from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, HTTPException, Header, Request
+from typing import List, Optional, Dict, Any, Tuple
+from fastapi import APIRouter, HTTPException, Request, Response
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
+from app.core.auth import current_user
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.cache import CachedResponse, cache_key, canonical_request
+from app.services.llm import ProviderError
+from app.services.context import AssembledContext
+from app.services.conversations import ConversationState
+from app.services.streaming import ChunkEncoder, encode_stream
+from app.services.tokens import ContextWindowError, FittedPrompt
+
 router = APIRouter()
 
+# Requests without a user share this id; nothing is remembered for them
+ANONYMOUS_USER = "default"
+
 
 class Message(BaseModel):
     role: str
@@ -20,6 +33,7 @@ class ChatCompletionRequest(BaseModel):
     temperature: Optional[float] = 0.7
     max_tokens: Optional[int] = None
     stream: Optional[bool] = False
+    stream_options: Optional[Dict[str, Any]] = None
     user: Optional[str] = None
 
 
@@ -36,45 +50,182 @@ class ChatCompletionResponse(BaseModel):
 async def chat_completions(
     request: ChatCompletionRequest,
     req: Request,
-    authorization: Optional[str] = Header(None),
-    x_user_id: Optional[str] = Header(None),
+    response: Response,
 ):
     """OpenAI-compatible chat completions endpoint"""
+    started = time.perf_counter()
     
-    # Get user ID from header or request
-    user_id = x_user_id or request.user or "default"
+    # Get user ID from the token or X-User-ID header, else the request
+    user_id = current_user(req) or request.user or ANONYMOUS_USER
     
     # Get services from app state
     services = req.app.state.services
     
+    # Cap concurrent streams per user; anonymous users are told apart by address
+    slot = user_id
+    if user_id == ANONYMOUS_USER and req.client:
+        slot = f"{ANONYMOUS_USER}:{req.client.host}"
+    holding = bool(request.stream)
+    if holding and not services.streams.acquire(slot):
+        raise HTTPException(
+            status_code=429,
+            detail="Too many concurrent streams, please retry later",
+            headers={"Retry-After": "1"},
+        )
+    
     try:
+        # Also warms the LLM before headers go out so failures become HTTP errors
+        prompt, state, headers = await prepare_prompt(request, services, user_id)
+        
         if request.stream:
-            # Streaming response
+            # Streaming response; the slot is released when the stream ends
+            events = stream_chat_completion(
+                request, services, user_id, prompt, state, started
+            )
+            holding = False
             return StreamingResponse(
-                stream_chat_completion(request, services, user_id),
-                media_type="text/event-stream"
+                services.streams.hold(slot, events),
+                media_type="text/event-stream",
+                headers=headers
             )
         else:
             # Regular response
-            response = await generate_chat_completion(request, services, user_id)
-            return response
+            response.headers.update(headers)
+            return await generate_chat_completion(
+                request, services, user_id, prompt, state
+            )
             
+    except ContextWindowError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ProviderError as e:
+        status_code = e.status_code if e.status_code in (429, 503, 504) else 502
+        raise HTTPException(status_code=status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if holding:
+            services.streams.release(slot)
 
 
-async def generate_chat_completion(
+async def prepare_prompt(
     request: ChatCompletionRequest,
     services,
     user_id: str
-) -> ChatCompletionResponse:
-    """Generate a chat completion"""
+) -> Tuple[FittedPrompt, ConversationState, Dict[str, str]]:
+    """Context-augmented prompt fitted to the upstream model's window
+    
+    Token counts and retrieved context are carried over from the longest
+    conversation prefix an earlier turn already processed.
+    """
+    messages = [m.model_dump() for m in request.messages]
+    llm = await services.get("llm")
+    model = llm.resolve(request.model)[1]
+    state = services.conversations.resume(user_id, messages, model, services.tokens)
+    services.conversations.save(user_id, state)
+    headers = {"X-Synapse-Reused-Messages": str(state.reused)}
+    
+    counts = state.counts
+    context, reused = await assemble_context(messages, services, user_id, state)
+    if context is not None:
+        headers.update(context.headers(reused=reused))
+        if context.content:
+            position = context.position(messages)
+            messages = context.apply(messages)
+            added = services.tokens.count_message(messages[position], model)
+            counts = counts[:position] + [added] + counts[position:]
+    
+    prompt = services.tokens.fit(messages, model, request.max_tokens, counts=counts)
+    return prompt, state, headers
+
+
+async def assemble_context(
+    messages: List[Dict[str, str]],
+    services,
+    user_id: str,
+    state: ConversationState
+) -> Tuple[Optional[AssembledContext], bool]:
+    """Retrieved context for the latest user message, and whether it was reused"""
+    query = next(
+        (m["content"] for m in reversed(messages) if m["role"] == "user"), None
+    )
+    if services.context is None or not query:
+        return None, False
     
-    # TODO: Implement actual logic with LiteLLM + Mem0 + R2R
-    # For now, return a mock response
+    query = query[-2000:]
+    if state.context is not None and state.query == query:
+        return state.context, True
+    context = await services.context.assemble(query, user_id)
+    state.query, state.context = query, context
+    return context, False
+
+
+def finish_turn(
+    request: ChatCompletionRequest,
+    services,
+    user_id: str,
+    state: ConversationState,
+    content: str
+):
+    """Remember the prefix including the reply and queue memory extraction
+    
+    The next turn resends the reply, so storing it lets that turn match
+    everything but its new message. Only messages no earlier turn has
+    queued are handed to the extractor.
+    """
+    reply = {"role": "assistant", "content": content}
+    following = services.conversations.extend(state, reply, services.tokens)
+    if services.extractor is not None and user_id != ANONYMOUS_USER:
+        messages = [m.model_dump() for m in request.messages[state.extracted :]]
+        services.extractor.submit(user_id, messages + [reply])
+        following.extracted = following.length
+    services.conversations.save(user_id, following)
+
+
+def is_coalescable(request: ChatCompletionRequest, services) -> bool:
+    """Only deterministic requests may share one upstream call"""
+    return services.coalescer is not None and request.temperature == 0
+
+
+async def generate_chat_completion(
+    request: ChatCompletionRequest,
+    services,
+    user_id: str,
+    prompt: FittedPrompt,
+    state: ConversationState
+) -> ChatCompletionResponse:
+    """Generate a chat completion from a fitted, context-augmented prompt"""
     
     completion_id = f"chatcmpl-{uuid.uuid4()}"
     
+    llm = await services.get("llm")
+    canonical = canonical_request(
+        request.model, prompt.messages, request.temperature, prompt.max_tokens
+    )
+    
+    async def upstream():
+        completion = await llm.complete(
+            request.model,
+            prompt.messages,
+            temperature=request.temperature,
+            max_tokens=prompt.max_tokens,
+        )
+        result = CachedResponse(
+            content=completion.content,
+            finish_reason=completion.finish_reason,
+            usage=completion.usage,
+        )
+        if services.cache:
+            await services.cache.set(canonical, result)
+        return result
+    
+    cached = await services.cache.get(canonical) if services.cache else None
+    if cached is None:
+        if is_coalescable(request, services):
+            cached = await services.coalescer.do(cache_key(canonical), upstream)
+        else:
+            cached = await upstream()
+    finish_turn(request, services, user_id, state, cached.content)
+    
     return ChatCompletionResponse(
         id=completion_id,
         created=int(time.time()),
@@ -83,56 +234,93 @@ async def generate_chat_completion(
             "index": 0,
             "message": {
                 "role": "assistant",
-                "content": "Hello! I'm Synapse, your AI assistant with persistent memory. This is a placeholder response - the actual implementation will integrate LiteLLM, Mem0, and R2R."
+                "content": cached.content
             },
-            "finish_reason": "stop"
+            "finish_reason": cached.finish_reason
         }],
-        usage={
-            "prompt_tokens": 10,
-            "completion_tokens": 20,
-            "total_tokens": 30
-        }
+        usage=services.tokens.usage(prompt, cached.content, cached.usage)
     )
 
 
-async def stream_chat_completion(request, services, user_id):
-    """Stream a chat completion"""
+def upstream_label(llm, model: str) -> str:
+    """Metrics label for ``model``: a virtual model or the serving provider
     
-    # TODO: Implement actual streaming with LiteLLM
-    # For now, yield mock SSE events
+    Model names come from clients, so they are never used as labels as-is.
+    """
+    if model in llm.router.routes:
+        return model
+    return llm.resolve(model)[0].name
+
+
+async def stream_chat_completion(
+    request, services, user_id, prompt, state, started=None
+):
+    """Stream a chat completion from a fitted, context-augmented prompt"""
     
-    completion_id = f"chatcmpl-{uuid.uuid4()}"
+    async def replay(cached):
+        for delta in cached.deltas():
+            yield delta
+    
+    reply: List[str] = []
+    
+    async def transcript(deltas):
+        async for delta in deltas:
+            timer.delta()
+            reply.append(delta)
+            yield delta
+    
+    async def record(deltas, canonical):
+        # Only cache streams that ran to completion
+        chunks = []
+        async for delta in deltas:
+            chunks.append(delta)
+            yield delta
+        await services.cache.set(
+            canonical, CachedResponse(content="".join(chunks), chunks=chunks)
+        )
+    
+    finish_reason = "stop"
+    llm = await services.get("llm")
+    timer = metrics.stream_timer(
+        upstream_label(llm, request.model), started or time.perf_counter()
+    )
+    canonical = canonical_request(
+        request.model, prompt.messages, request.temperature, prompt.max_tokens
+    )
+    cached = await services.cache.get(canonical) if services.cache else None
+    if cached is not None:
+        deltas = replay(cached)
+        finish_reason = cached.finish_reason
+    else:
+        def upstream():
+            deltas = llm.stream(
+                request.model,
+                prompt.messages,
+                temperature=request.temperature,
+                max_tokens=prompt.max_tokens,
+            )
+            return record(deltas, canonical) if services.cache else deltas
+        
+        if is_coalescable(request, services):
+            deltas = services.coalescer.stream(cache_key(canonical), upstream)
+        else:
+            deltas = upstream()
+    
+    usage = None
+    if (request.stream_options or {}).get("include_usage"):
+        def usage(content):
+            return services.tokens.usage(prompt, content)
     
-    # Initial chunk
-    yield f"data: {{"
-    yield f'"id":"{completion_id}",'
-    yield f'"object":"chat.completion.chunk",'
-    yield f'"created":{int(time.time())},'
-    yield f'"model":"{request.model}",'
-    yield f'"choices":[{{"index":0,"delta":{{"role":"assistant"}},"finish_reason":null}}]'
-    yield f"}}\n\n"
-    
-    # Content chunks
-    content = "Hello! I'm Synapse. This is a streaming response placeholder."
-    for word in content.split():
-        yield f"data: {{"
-        yield f'"id":"{completion_id}",'
-        yield f'"object":"chat.completion.chunk",'
-        yield f'"created":{int(time.time())},'
-        yield f'"model":"{request.model}",'
-        yield f'"choices":[{{"index":0,"delta":{{"content":" {word}"}},"finish_reason":null}}]'
-        yield f"}}\n\n"
-    
-    # Final chunk
-    yield f"data: {{"
-    yield f'"id":"{completion_id}",'
-    yield f'"object":"chat.completion.chunk",'
-    yield f'"created":{int(time.time())},'
-    yield f'"model":"{request.model}",'
-    yield f'"choices":[{{"index":0,"delta":{{}},"finish_reason":"stop"}}]'
-    yield f"}}\n\n"
-    
-    yield "data: [DONE]\n\n"
+    encoder = ChunkEncoder(request.model)
+    async for event in encode_stream(
+        encoder,
+        transcript(deltas),
+        flush_interval=settings.STREAM_FLUSH_INTERVAL,
+        finish_reason=finish_reason,
+        usage=usage,
+    ):
+        yield event
+    finish_turn(request, services, user_id, state, "".join(reply))
 
 
 @router.get("/models")
@@ -1,8 +1,11 @@
 """Document management endpoints"""
-from typing import List, Optional
-from fastapi import APIRouter, UploadFile, File, Header, HTTPException
+import asyncio
+from typing import List
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request
 from pydantic import BaseModel
 
+from app.core.auth import authorize_user, current_user
+
 router = APIRouter()
 
 
@@ -14,52 +17,96 @@ class SearchRequest(BaseModel):
 
 @router.post("/documents/upload")
 async def upload_documents(
-    files: List[UploadFile] = File(...),
-    authorization: Optional[str] = Header(None)
+    req: Request,
+    files: List[UploadFile] = File(...)
 ):
-    """Upload documents to the RAG system"""
-    # TODO: Implement with R2R
-    uploaded = []
-    
-    for file in files:
-        # TODO: Process and index file
-        uploaded.append({
-            "filename": file.filename,
-            "size": file.size,
-            "status": "indexed"
-        })
-    
+    """Upload documents to the RAG system
+
+    Files are queued for background ingestion; poll
+    ``/documents/jobs/{job_id}`` for progress.
+    """
+    rag = await req.app.state.services.get("rag")
+    job = await rag.submit(files, user_id=current_user(req))
+
     return {
-        "status": "success",
-        "documents": uploaded,
-        "count": len(uploaded)
+        "status": "accepted",
+        "job_id": job.id,
+        "documents": [
+            {
+                "document_id": progress.document_id,
+                "filename": progress.filename,
+                "size": progress.size,
+                "status": progress.status
+            }
+            for progress in job.files
+        ],
+        "count": len(job.files)
     }
 
 
+@router.get("/documents/jobs/{job_id}")
+async def get_ingestion_job(
+    job_id: str,
+    req: Request
+):
+    """Progress of an ingestion job"""
+    rag = await req.app.state.services.get("rag")
+    job = await rag.job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    authorize_user(req, job["user_id"])
+    return job
+
+
 @router.post("/documents/search")
 async def search_documents(
     request: SearchRequest,
-    x_user_id: Optional[str] = Header(None),
-    authorization: Optional[str] = Header(None)
+    req: Request
 ):
-    """Search documents with optional memory context"""
-    # TODO: Implement with R2R + Mem0
+    """Search documents with optional memory context
+
+    Document retrieval and the user's memory lookup run concurrently.
+    """
+    services = req.app.state.services
+    rag = await services.get("rag")
+    user_id = current_user(req)
+    use_memory = request.use_memory and user_id is not None
+
+    if use_memory:
+        memory = await services.get("memory")
+        results, memories = await asyncio.gather(
+            rag.search(request.query, request.limit, user_id=user_id),
+            memory.search(user_id, request.query, 5),
+        )
+    else:
+        results = await rag.search(request.query, request.limit, user_id=user_id)
+        memories = []
+
     return {
         "query": request.query,
-        "results": [],
-        "count": 0,
-        "user_context_applied": request.use_memory and x_user_id is not None
+        "results": results,
+        "count": len(results),
+        "memories": memories,
+        "user_context_applied": use_memory
     }
 
 
 @router.delete("/documents/{document_id}")
 async def delete_document(
     document_id: str,
-    authorization: Optional[str] = Header(None)
+    req: Request
 ):
-    """Delete a document from the system"""
-    # TODO: Implement with R2R
+    """Delete a document and its chunks"""
+    rag = await req.app.state.services.get("rag")
+    document = await rag.document(document_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    authorize_user(req, document["user_id"])
+
+    if not await rag.delete_document(document_id):
+        raise HTTPException(status_code=404, detail="Document not found")
+
     return {
         "status": "deleted",
         "document_id": document_id
-    }
\ No newline at end of file
+    }
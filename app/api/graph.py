@@ -0,0 +1,43 @@
+"""Knowledge graph endpoints"""
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+
+from app.core.config import settings
+
+router = APIRouter()
+
+
+@router.get("/graph/entities/{entity_id}/neighbors")
+async def get_entity_neighbors(
+    entity_id: str,
+    req: Request,
+    hops: int = Query(2, ge=1),
+    relationship_type: Optional[List[str]] = Query(None),
+    min_weight: float = 0.0,
+    limit: int = Query(50, ge=1, le=1000),
+    both_directions: bool = False
+):
+    """k-hop neighborhood of an entity, strongest paths first
+
+    A path's weight is the product of its relationship weights.
+    """
+    if hops > settings.GRAPH_MAX_HOPS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"hops must be at most {settings.GRAPH_MAX_HOPS}"
+        )
+    entities = await req.app.state.services.get("entities")
+    neighbors = await entities.neighborhood(
+        entity_id,
+        hops=hops,
+        relationship_types=relationship_type,
+        min_weight=min_weight,
+        limit=limit,
+        both_directions=both_directions,
+    )
+
+    return {
+        "entity_id": entity_id,
+        "neighbors": neighbors,
+        "count": len(neighbors)
+    }
@@ -1,5 +1,5 @@
 """Health check endpoints"""
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -19,27 +19,39 @@ async def health_check():
 
 
 @router.get("/health/ready")
-async def readiness_check(db: AsyncSession = Depends(get_db)):
-    """Readiness check - verifies all services are ready"""
+async def readiness_check(request: Request, db: AsyncSession = Depends(get_db)):
+    """Readiness check - verifies the database and reports warm/cold services"""
     try:
         # Check database
         await db.execute(text("SELECT 1"))
         
-        # TODO: Check Redis
-        # TODO: Check R2R
-        # TODO: Check Mem0
+        # TODO: Ping Redis
+        
+        # In lazy mode cold services are still ready; they warm on first use
+        manager = getattr(request.app.state, "services", None)
+        services = manager.status() if manager else {}
+        services["database"] = "healthy"
         
         return {
             "status": "ready",
-            "services": {
-                "database": "healthy",
-                "redis": "healthy",
-                "r2r": "healthy",
-                "mem0": "healthy"
-            }
+            "lazy": bool(manager and manager.lazy),
+            "services": services,
         }
     except Exception as e:
         return {
             "status": "not_ready",
             "error": str(e)
-        }
\ No newline at end of file
+        }
+
+
+@router.get("/health/upstreams")
+async def upstream_health(request: Request):
+    """Rolling time-to-first-token and error rate per upstream model"""
+    manager = getattr(request.app.state, "services", None)
+    llm = manager.llm if manager else None
+    if llm is None:
+        return {"upstreams": {}}
+    return {
+        "upstreams": llm.router.snapshot(),
+        "hedging": llm.router.budget.snapshot()
+    }
@@ -1,8 +1,10 @@
 """Memory management endpoints"""
 from typing import Optional
-from fastapi import APIRouter, Header, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
 from pydantic import BaseModel
 
+from app.core.auth import authorize_user
+
 router = APIRouter()
 
 
@@ -15,14 +17,23 @@ class MemoryCreate(BaseModel):
 @router.get("/memory/{user_id}")
 async def get_user_memory(
     user_id: str,
-    authorization: Optional[str] = Header(None)
+    req: Request,
+    query: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000)
 ):
-    """Get all memories for a user"""
-    # TODO: Implement with Mem0
+    """Get a user's memories: top-k by similarity to ``query``, else most recent"""
+    authorize_user(req, user_id)
+    memory = await req.app.state.services.get("memory")
+
+    if query:
+        memories = await memory.search(user_id, query, limit or 10)
+    else:
+        memories = await memory.list(user_id, limit or 100)
+
     return {
         "user_id": user_id,
-        "memories": [],
-        "count": 0
+        "memories": memories,
+        "count": len(memories)
     }
 
 
@@ -30,14 +41,17 @@ async def get_user_memory(
 async def create_memory(
     user_id: str,
     memory: MemoryCreate,
-    authorization: Optional[str] = Header(None)
+    req: Request
 ):
     """Create a new memory for a user"""
-    # TODO: Implement with Mem0
+    authorize_user(req, user_id)
+    service = await req.app.state.services.get("memory")
+    created = await service.add(user_id, memory.content, memory.type, memory.metadata)
+
     return {
         "status": "created",
         "user_id": user_id,
-        "memory_id": "placeholder"
+        "memory_id": created["id"]
     }
 
 
@@ -45,11 +59,16 @@ async def create_memory(
 async def delete_memory(
     user_id: str,
     memory_id: str,
-    authorization: Optional[str] = Header(None)
+    req: Request
 ):
     """Delete a specific memory"""
-    # TODO: Implement with Mem0
+    authorize_user(req, user_id)
+    memory = await req.app.state.services.get("memory")
+
+    if not await memory.delete(user_id, memory_id):
+        raise HTTPException(status_code=404, detail="Memory not found")
+
     return {
         "status": "deleted",
         "memory_id": memory_id
-    }
\ No newline at end of file
+    }
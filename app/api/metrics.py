@@ -0,0 +1,13 @@
+"""Prometheus metrics endpoint"""
+from fastapi import APIRouter, Response
+
+from app.core.metrics import metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Metrics in the Prometheus text format"""
+    body, content_type = metrics.exposition()
+    return Response(content=body, headers={"Content-Type": content_type})
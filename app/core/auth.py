@@ -0,0 +1,138 @@
+"""API-key and JWT authentication with a verified-token cache"""
+import hashlib
+import hmac
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Request
+
+from app.core.config import settings
+from app.core.lazy import lazy_import
+
+jwt = lazy_import("jose.jwt")
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Who a verified token belongs to"""
+
+    key_id: str  # hash of the token, safe to log and to key limits on
+    method: str  # "api_key" or "jwt"
+    user_id: Optional[str] = None  # the JWT subject; API keys act for any user
+
+
+def token_hash(token: str) -> str:
+    return hashlib.blake2b(token.encode(), digest_size=12).hexdigest()
+
+
+def bearer_token(authorization: Optional[str]) -> Optional[str]:
+    """``Bearer <token>`` -> ``<token>``; a bare token is accepted too"""
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if token and scheme.lower() == "bearer":
+        return token.strip() or None
+    return authorization.strip() or None
+
+
+class TokenVerifier:
+    """Verifies API keys and HMAC-signed JWTs, caching the outcome
+
+    Results, including rejections, are cached by token hash for ``ttl``
+    seconds (never past a JWT's ``exp``), so a streaming client that sends
+    the same token on every request has its signature checked once.
+    """
+
+    def __init__(
+        self,
+        api_keys: Sequence[str] = (),
+        jwt_secret: Optional[str] = None,
+        algorithms: Sequence[str] = ("HS256",),
+        ttl: float = 300.0,
+        max_entries: int = 10_000,
+    ):
+        self.api_keys = [key.encode() for key in api_keys if key]
+        self.jwt_secret = jwt_secret
+        self.algorithms = list(algorithms)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[str, Tuple[Optional[Principal], float]]" = (
+            OrderedDict()
+        )
+
+    @classmethod
+    def from_settings(cls) -> "TokenVerifier":
+        return cls(
+            api_keys=[settings.API_KEY],
+            jwt_secret=settings.JWT_SECRET,
+            algorithms=settings.JWT_ALGORITHMS,
+            ttl=settings.AUTH_CACHE_TTL,
+            max_entries=settings.AUTH_CACHE_SIZE,
+        )
+
+    def verify(self, token: str) -> Optional[Principal]:
+        """The token's principal, or None if it is not valid"""
+        key_id = token_hash(token)
+        now = time.time()
+        cached = self._cache.get(key_id)
+        if cached is not None:
+            if cached[1] > now:
+                self._cache.move_to_end(key_id)
+                self.hits += 1
+                return cached[0]
+            del self._cache[key_id]
+
+        self.misses += 1
+        principal, expires = self._check(token, key_id, now)
+        self._cache[key_id] = (principal, expires)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return principal
+
+    def _check(
+        self, token: str, key_id: str, now: float
+    ) -> Tuple[Optional[Principal], float]:
+        encoded = token.encode()
+        # Every key is compared so timing does not reveal which one matched
+        matched = False
+        for api_key in self.api_keys:
+            matched |= hmac.compare_digest(encoded, api_key)
+        if matched:
+            return Principal(key_id, "api_key"), now + self.ttl
+
+        if self.jwt_secret and token.count(".") == 2:
+            try:
+                claims = jwt.decode(token, self.jwt_secret, algorithms=self.algorithms)
+            except Exception as e:
+                logger.debug(f"Rejected JWT {key_id}: {e}")
+            else:
+                subject = claims.get("sub")
+                if subject:
+                    expires = now + self.ttl
+                    if isinstance(claims.get("exp"), (int, float)):
+                        expires = min(expires, claims["exp"])
+                    return Principal(key_id, "jwt", str(subject)), expires
+        return None, now + self.ttl
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+
+def current_user(req: Request) -> Optional[str]:
+    """User id resolved by the auth middleware: JWT subject or X-User-ID"""
+    return getattr(req.state, "user_id", None)
+
+
+def authorize_user(req: Request, user_id: str):
+    """Reject JWT callers acting on another user's data"""
+    principal: Optional[Principal] = getattr(req.state, "principal", None)
+    if principal is not None and principal.method == "jwt":
+        if principal.user_id != user_id:
+            raise HTTPException(status_code=403, detail="Not allowed for this user")
@@ -1,8 +1,32 @@
 """Database configuration and session management"""
+import time
+
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.core.config import settings
+from app.core.metrics import metrics
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that reports how long each checkout waited
+    
+    The time includes opening a connection when the pool grows.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._wait = metrics.pool_wait()
+    
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self._wait.observe(time.perf_counter() - started)
+
 
 # Create async engine
 engine = create_async_engine(
@@ -11,6 +35,7 @@ engine = create_async_engine(
     pool_size=20,
     max_overflow=40,
     pool_pre_ping=True,
+    poolclass=TimedQueuePool,
 )
 
 # Create session factory
@@ -39,12 +64,12 @@ async def init_db():
     """Initialize database"""
     # Create schemas
     async with engine.begin() as conn:
-        await conn.execute("CREATE SCHEMA IF NOT EXISTS r2r")
-        await conn.execute("CREATE SCHEMA IF NOT EXISTS mem0")
-        await conn.execute("CREATE SCHEMA IF NOT EXISTS shared")
+        await conn.execute(text("CREATE SCHEMA IF NOT EXISTS r2r"))
+        await conn.execute(text("CREATE SCHEMA IF NOT EXISTS mem0"))
+        await conn.execute(text("CREATE SCHEMA IF NOT EXISTS shared"))
         
         # TODO: Run alembic migrations
         # For now, just ensure extensions
-        await conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
-        await conn.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
-        await conn.execute('CREATE EXTENSION IF NOT EXISTS "uuid-ossp"')
\ No newline at end of file
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        await conn.execute(text('CREATE EXTENSION IF NOT EXISTS "uuid-ossp"'))
\ No newline at end of file
@@ -0,0 +1,29 @@
+"""Deferred imports for heavy dependencies"""
+import importlib
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """Module proxy that imports the real module on first attribute access
+
+    After the first access the real module's namespace is copied onto the
+    proxy, so later lookups are plain attribute hits.
+    """
+
+    def _load(self) -> types.ModuleType:
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """Return ``name`` without importing it until an attribute is used"""
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
@@ -0,0 +1,189 @@
+"""Prometheus metrics for the request, streaming and upstream hot paths"""
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.lazy import lazy_import
+
+prometheus_client = lazy_import("prometheus_client")
+prometheus_core = lazy_import("prometheus_client.core")
+
+CacheStats = Callable[[], Dict[str, Tuple[int, int]]]
+
+REQUEST_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120
+)
+TTFT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 10, 30)
+INTER_TOKEN_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class _Noop:
+    """Stand-in for a label child when metrics are disabled"""
+
+    def observe(self, value: float):
+        pass
+
+
+NOOP = _Noop()
+
+
+class StreamTimer:
+    """Time to first delta and the gaps between deltas of one stream"""
+
+    __slots__ = ("ttft", "inter_token", "started", "last")
+
+    def __init__(self, ttft, inter_token, started: float):
+        self.ttft = ttft
+        self.inter_token = inter_token
+        self.started = started
+        self.last: Optional[float] = None
+
+    def delta(self):
+        now = time.perf_counter()
+        if self.last is None:
+            self.ttft.observe(now - self.started)
+        else:
+            self.inter_token.observe(now - self.last)
+        self.last = now
+
+
+class CacheCollector:
+    """Cache hits, misses and hit ratio, read from the caches at scrape time"""
+
+    def __init__(self, stats: CacheStats):
+        self.stats = stats
+
+    def collect(self):
+        hits = prometheus_core.CounterMetricFamily(
+            "synapse_cache_hits", "Cache hits", labels=["cache"]
+        )
+        misses = prometheus_core.CounterMetricFamily(
+            "synapse_cache_misses", "Cache misses", labels=["cache"]
+        )
+        ratio = prometheus_core.GaugeMetricFamily(
+            "synapse_cache_hit_ratio", "Cache hits over lookups", labels=["cache"]
+        )
+        for name, (hit, miss) in self.stats().items():
+            hits.add_metric([name], hit)
+            misses.add_metric([name], miss)
+            ratio.add_metric([name], hit / (hit + miss) if hit + miss else 0.0)
+        return [hits, misses, ratio]
+
+
+class Metrics:
+    """Histograms for the hot paths, in a registry of their own
+
+    Callers bind label children once (per provider, per route, per
+    stream) and keep them, so an observation is a single ``observe``
+    call with no label lookup. Children are cached here as well, so
+    binding again is one dictionary hit. When disabled every child is a
+    no-op and prometheus_client is never imported.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._children: Dict[Tuple[str, Tuple[str, ...]], Any] = {}
+        self._caches: Optional[CacheCollector] = None
+        if not enabled:
+            return
+        histogram = prometheus_client.Histogram
+        self.registry = prometheus_client.CollectorRegistry()
+        prometheus_client.ProcessCollector(registry=self.registry)
+        self._metrics = {
+            "request": histogram(
+                "synapse_request_duration_seconds",
+                "Time to complete an API request, streamed body included",
+                ["method", "route"],
+                buckets=REQUEST_BUCKETS,
+                registry=self.registry,
+            ),
+            "ttft": histogram(
+                "synapse_stream_ttft_seconds",
+                "Time from request to the first streamed delta",
+                ["upstream"],
+                buckets=TTFT_BUCKETS,
+                registry=self.registry,
+            ),
+            "inter_token": histogram(
+                "synapse_stream_inter_token_seconds",
+                "Time between streamed deltas",
+                ["upstream"],
+                buckets=INTER_TOKEN_BUCKETS,
+                registry=self.registry,
+            ),
+            "upstream": histogram(
+                "synapse_upstream_duration_seconds",
+                "Upstream completion latency; time to first delta for streams",
+                ["provider", "kind"],
+                buckets=TTFT_BUCKETS,
+                registry=self.registry,
+            ),
+            "pool_wait": histogram(
+                "synapse_db_pool_wait_seconds",
+                "Time to check a connection out of the database pool",
+                buckets=POOL_WAIT_BUCKETS,
+                registry=self.registry,
+            ),
+            "embedding_batch": histogram(
+                "synapse_embedding_batch_size",
+                "Texts per upstream embedding call",
+                buckets=BATCH_BUCKETS,
+                registry=self.registry,
+            ),
+        }
+
+    def child(self, name: str, *labels: str):
+        """The label child of metric ``name``, bound once"""
+        key = (name, labels)
+        child = self._children.get(key)
+        if child is None:
+            if not self.enabled:
+                return NOOP
+            metric = self._metrics[name]
+            child = self._children[key] = metric.labels(*labels) if labels else metric
+        return child
+
+    def request_latency(self, method: str, route: str):
+        return self.child("request", method, route)
+
+    def upstream_latency(self, provider: str, kind: str):
+        return self.child("upstream", provider, kind)
+
+    def pool_wait(self):
+        return self.child("pool_wait")
+
+    def embedding_batch_size(self):
+        return self.child("embedding_batch")
+
+    def stream_timer(self, upstream: str, started: float) -> StreamTimer:
+        """Timer for one stream; ``upstream`` must come from a bounded set"""
+        return StreamTimer(
+            self.child("ttft", upstream),
+            self.child("inter_token", upstream),
+            started,
+        )
+
+    def track_caches(self, stats: CacheStats):
+        """Report cache hit ratios from ``stats`` on every scrape
+
+        Calling again swaps the source; the collector is registered once.
+        """
+        if not self.enabled:
+            return
+        if self._caches is None:
+            self._caches = CacheCollector(stats)
+            self.registry.register(self._caches)
+        else:
+            self._caches.stats = stats
+
+    def exposition(self) -> Tuple[bytes, str]:
+        """Current metrics in the text format, with its content type"""
+        return (
+            prometheus_client.generate_latest(self.registry),
+            prometheus_client.CONTENT_TYPE_LATEST,
+        )
+
+
+metrics = Metrics(settings.ENABLE_PROMETHEUS)
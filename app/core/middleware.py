@@ -0,0 +1,162 @@
+"""ASGI middleware applied to every API request"""
+import math
+import time
+from typing import List, Optional, Sequence, Tuple
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.auth import Principal, TokenVerifier, bearer_token
+from app.core.config import settings
+from app.core.metrics import Metrics
+
+
+def rate_limit_response(retry_after: float, message: str) -> JSONResponse:
+    """OpenAI-style 429 telling the client when to retry"""
+    return JSONResponse(
+        status_code=429,
+        content={
+            "error": {
+                "message": message,
+                "type": "rate_limit_error",
+                "code": "rate_limit_exceeded",
+            }
+        },
+        headers={
+            "Retry-After": str(max(1, math.ceil(retry_after))),
+            "Retry-After-Ms": str(max(1, math.ceil(retry_after * 1000))),
+        },
+    )
+
+
+def request_identities(scope: Scope) -> List[Tuple[str, str]]:
+    """Rate-limit identities of a request: its API key and its user
+
+    Both come from ``AuthMiddleware``. Requests without a verified key are
+    also limited per client address, since their user id is only a header.
+    """
+    state = scope.get("state") or {}
+    principal: Optional[Principal] = state.get("principal")
+    user_id = state.get("user_id")
+    identities = []
+    if principal is not None:
+        identities.append(("key", principal.key_id))
+    if user_id is not None:
+        identities.append(("user", user_id))
+    if principal is None:
+        client = scope.get("client")
+        identities.append(("user", f"ip:{client[0] if client else ''}"))
+    return identities
+
+
+class AuthMiddleware:
+    """Resolves the caller once per request from its bearer token
+
+    Stores the verified ``Principal`` (or None) and the user id in the
+    request state, read with ``current_user``. The user is the JWT subject,
+    or the ``X-User-ID`` header for API keys and unauthenticated requests.
+    With ``required`` a missing or invalid token is rejected with a 401.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        verifier: Optional[TokenVerifier] = None,
+        required: Optional[bool] = None,
+        paths: Sequence[str] = ("/v1/", "/api/"),
+    ):
+        self.app = app
+        self.verifier = verifier or TokenVerifier.from_settings()
+        if required is None:
+            required = settings.AUTH_REQUIRED
+        self.required = required
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+        authorization = user_id = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                authorization = value.decode("latin-1")
+            elif name == b"x-user-id":
+                user_id = value.decode("latin-1")
+        token = bearer_token(authorization)
+        principal = self.verifier.verify(token) if token else None
+        if principal is None and self.required:
+            response = JSONResponse(
+                status_code=401,
+                content={
+                    "error": {
+                        "message": "Invalid or missing API key",
+                        "type": "invalid_request_error",
+                        "code": "invalid_api_key",
+                    }
+                },
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+            await response(scope, receive, send)
+            return
+        state = scope.setdefault("state", {})
+        state["principal"] = principal
+        if principal is not None and principal.user_id is not None:
+            user_id = principal.user_id
+        state["user_id"] = user_id
+        await self.app(scope, receive, send)
+
+
+class RateLimitMiddleware:
+    """Rejects requests over their per-key or per-user rate with a 429
+
+    Pure ASGI rather than ``BaseHTTPMiddleware`` so streamed responses pass
+    through untouched. The limiter is read from ``app.state.services`` and
+    requests go through unlimited until it exists.
+    """
+
+    def __init__(self, app: ASGIApp, paths: Sequence[str] = ("/v1/", "/api/")):
+        self.app = app
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+        services = getattr(scope["app"].state, "services", None)
+        limiter = services.limiter if services is not None else None
+        if limiter is not None:
+            retry_after = await limiter.check(request_identities(scope))
+            if retry_after > 0:
+                response = rate_limit_response(
+                    retry_after, "Rate limit reached, please retry later"
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+class MetricsMiddleware:
+    """Records each request's latency under its route template
+
+    Raw paths would make a label per user or document id, so requests
+    that match no route share one label. Streamed responses are timed
+    until their last chunk.
+    """
+
+    def __init__(self, app: ASGIApp, metrics: Metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            self.metrics.request_latency(scope["method"], path).observe(
+                time.perf_counter() - started
+            )
@@ -1,69 +1,290 @@
 """Service manager for initializing all services"""
+import asyncio
 import logging
-from typing import Optional
+import time
+from typing import Dict, List, Optional, Set, Tuple
 
 from app.core.config import settings
+from app.core.database import engine, init_db
+from app.core.lazy import lazy_import
+from app.core.startup import Step, StartupScheduler
+from app.services.cache import ResponseCache, SemanticIndex
+from app.services.coalescing import SingleFlight
+from app.services.context import ContextAssembler
+from app.services.conversations import ConversationStore
+from app.services.embeddings import BatchingEmbedder, LocalEmbedder
+from app.services.entities import EntityStore
+from app.services.extraction import MemoryExtractor
+from app.services.llm import LLMService
+from app.services.memory import MemoryService
+from app.services.rag import RAGService
+from app.services.rate_limit import Limit, RateLimiter, StreamLimiter
+from app.services.tokens import TokenCounter
+
+aioredis = lazy_import("redis.asyncio")
 
 logger = logging.getLogger(__name__)
 
 
 class ServiceManager:
-    """Manages all application services"""
+    """Manages all application services
+    
+    By default every service is initialized at startup. With
+    ``settings.LAZY_SERVICES`` the services in ``LAZY`` are left cold and
+    constructed on first use via ``get()``, optionally pre-warmed in the
+    background.
+    """
     
-    def __init__(self):
+    LAZY = ("llm", "embeddings", "memory", "rag", "mcp")
+    
+    def __init__(self, lazy: Optional[bool] = None):
         self.llm = None
+        self.embeddings = None
         self.memory = None
         self.rag = None
+        self.entities = None
+        self.extractor = None
         self.mcp = None
+        self.redis = None
+        self.cache = None
+        self.limiter = None
+        self.streams = StreamLimiter(settings.RATE_LIMIT_MAX_STREAMS)
+        self.coalescer = None
+        if settings.REQUEST_COALESCING:
+            self.coalescer = SingleFlight(settings.REQUEST_COALESCING_START_TIMEOUT)
+        self.tokens = TokenCounter(
+            max_entries=settings.TOKEN_COUNT_CACHE_SIZE,
+            windows=settings.MODEL_CONTEXT_WINDOWS,
+            default_window=settings.DEFAULT_CONTEXT_WINDOW,
+            completion_reserve=settings.COMPLETION_TOKEN_RESERVE,
+        )
+        self.conversations = ConversationStore(
+            max_users=settings.CONVERSATION_STATE_MAX_USERS,
+            per_user=settings.CONVERSATION_STATE_PER_USER,
+            ttl=settings.CONVERSATION_STATE_TTL,
+        )
+        self.context = None
+        if settings.CONTEXT_ENABLED:
+            self.context = ContextAssembler(
+                self.get,
+                timeouts=settings.CONTEXT_TIMEOUTS,
+                token_budget=settings.CONTEXT_TOKEN_BUDGET,
+                count_tokens=self.tokens.count,
+                memory_limit=settings.CONTEXT_MEMORY_LIMIT,
+                document_limit=settings.CONTEXT_DOCUMENT_LIMIT,
+                graph_seeds=settings.CONTEXT_GRAPH_SEEDS,
+                graph_limit=settings.CONTEXT_GRAPH_LIMIT,
+            )
+        self.lazy = settings.LAZY_SERVICES if lazy is None else lazy
+        self.startup_timings: Dict[str, float] = {}
+        self.warm: Set[str] = set()
+        self.failed: Dict[str, str] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._prewarm_tasks: List[asyncio.Task] = []
         
     async def initialize(self):
-        """Initialize all services"""
+        """Initialize all services, running independent ones concurrently"""
         logger.info("Initializing services...")
         
-        # Initialize LLM service
-        await self._init_llm()
-        
-        # Initialize Memory service
-        await self._init_memory()
+        scheduler = StartupScheduler(default_timeout=settings.STARTUP_TIMEOUT)
+        for name, (init, depends_on) in self.startup_steps().items():
+            if self.lazy and name in self.LAZY:
+                continue
+            scheduler.add(
+                name,
+                self._tracked(name, init),
+                depends_on=depends_on,
+                timeout=settings.STARTUP_TIMEOUTS.get(name),
+            )
         
-        # Initialize RAG service
-        await self._init_rag()
+        try:
+            await scheduler.run()
+        finally:
+            self.startup_timings.update(scheduler.timings)
         
-        # Initialize MCP service
-        await self._init_mcp()
+        if self.lazy:
+            for name in settings.PREWARM_SERVICES:
+                self._prewarm_tasks.append(asyncio.create_task(self._prewarm(name)))
+            logger.info(
+                f"✅ Core services initialized in {scheduler.total:.2f}s "
+                f"(lazy: {', '.join(self.LAZY)})"
+            )
+        else:
+            logger.info(f"✅ All services initialized in {scheduler.total:.2f}s")
+    
+    def _tracked(self, name: str, init: Step) -> Step:
+        async def step():
+            try:
+                await init()
+            except Exception as e:
+                self.failed[name] = repr(e)
+                raise
+            self.warm.add(name)
+            self.failed.pop(name, None)
         
-        logger.info("✅ All services initialized")
+        return step
+    
+    async def ensure(self, name: str):
+        """Initialize a service (and its dependencies) if it is still cold"""
+        if name in self.warm:
+            return
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            if name in self.warm:
+                return
+            init, depends_on = self.startup_steps()[name]
+            for dependency in depends_on:
+                await self.ensure(dependency)
+            
+            logger.info(f"Warming {name} service on demand...")
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(
+                    self._tracked(name, init)(),
+                    settings.STARTUP_TIMEOUTS.get(name, settings.STARTUP_TIMEOUT),
+                )
+            finally:
+                self.startup_timings[name] = time.perf_counter() - started
+    
+    async def get(self, name: str):
+        """Return a service, constructing it on first use"""
+        if name not in self.warm:
+            await self.ensure(name)
+        return getattr(self, name)
+    
+    async def _prewarm(self, name: str):
+        try:
+            await self.ensure(name)
+        except Exception as e:
+            logger.warning(f"Background pre-warm of {name} failed: {e}")
+    
+    def status(self) -> Dict[str, str]:
+        """Warm/cold/failed state of every service"""
+        status = {}
+        for name in self.startup_steps():
+            if name in self.warm:
+                status[name] = "warm"
+            else:
+                status[name] = "failed" if name in self.failed else "cold"
+        return status
+    
+    def cache_stats(self) -> Dict[str, Tuple[int, int]]:
+        """Hits and misses of every cache that is up, by cache name"""
+        stats = {
+            "tokens": (self.tokens.hits, self.tokens.misses),
+            "conversations": (self.conversations.hits, self.conversations.misses),
+        }
+        if self.cache:
+            counters = self.cache.counters
+            hits = sum(v for k, v in counters.items() if k.endswith("_hits"))
+            stats["response"] = (hits, counters["misses"])
+        if self.memory and self.memory.cache:
+            stats["memory"] = (self.memory.cache.hits, self.memory.cache.misses)
+        if self.rag and self.rag.pipeline.cache:
+            cache = self.rag.pipeline.cache
+            stats["embeddings"] = (cache.hits, cache.misses)
+        if self.entities and self.entities.cache:
+            stats["graph"] = (self.entities.cache.hits, self.entities.cache.misses)
+        return stats
+    
+    def startup_steps(self) -> Dict[str, Tuple[Step, Tuple[str, ...]]]:
+        """Startup steps and the steps each one depends on"""
+        return {
+            "database": (init_db, ()),
+            "redis": (self._init_redis, ()),
+            "llm": (self._init_llm, ()),
+            "embeddings": (self._init_embeddings, ("llm",)),
+            "cache": (self._init_cache, ("redis",)),
+            "limiter": (self._init_limiter, ("redis",)),
+            "memory": (self._init_memory, ("database", "embeddings", "redis")),
+            "rag": (self._init_rag, ("database", "embeddings", "redis")),
+            "entities": (self._init_entities, ("database",)),
+            "extractor": (self._init_extractor, ("redis",)),
+            "mcp": (self._init_mcp, ()),
+        }
+    
+    async def _init_redis(self):
+        """Create the shared Redis client (connects lazily)"""
+        self.redis = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
     
     async def _init_llm(self):
-        """Initialize LiteLLM with available providers"""
+        """Initialize upstream LLM providers"""
         try:
-            # TODO: Import and initialize actual LiteLLM service
             logger.info("Initializing LLM service...")
             
-            # Check available providers
-            providers = []
-            if settings.OPENAI_API_KEY:
-                providers.append("openai")
-            if settings.ANTHROPIC_API_KEY:
-                providers.append("anthropic")
-            if settings.GOOGLE_API_KEY:
-                providers.append("google")
+            self.llm = LLMService.from_settings()
             
-            logger.info(f"Available LLM providers: {providers}")
-            
-            # self.llm = LLMService(providers)
+            logger.info(f"Available LLM providers: {list(self.llm.providers)}")
             
         except Exception as e:
             logger.error(f"Failed to initialize LLM service: {e}")
             raise
     
+    async def _init_embeddings(self):
+        """Initialize the shared micro-batching embedder"""
+        provider, _, _ = settings.EMBEDDING_MODEL.partition("/")
+        if provider == "local":
+            embed = LocalEmbedder(settings.EMBEDDING_DIMENSIONS)
+        else:
+            embed = self.llm.embed
+        
+        self.embeddings = BatchingEmbedder(
+            embed,
+            max_batch_size=settings.EMBEDDING_BATCH_SIZE,
+            max_wait=settings.EMBEDDING_BATCH_WAIT,
+            max_concurrency=settings.EMBEDDING_MAX_CONCURRENCY,
+        )
+    
+    async def _embed_one(self, text: str) -> List[float]:
+        """Embed one text, warming the embedding service if needed"""
+        embeddings = await self.get("embeddings")
+        return await embeddings.embed_one(text)
+    
+    async def _init_cache(self):
+        """Initialize the chat response cache"""
+        if not settings.RESPONSE_CACHE_ENABLED:
+            return
+        
+        logger.info("Initializing response cache...")
+        
+        semantic = None
+        if settings.SEMANTIC_CACHE_THRESHOLD is not None:
+            semantic = SemanticIndex(self._embed_one, settings.SEMANTIC_CACHE_THRESHOLD)
+        
+        self.cache = ResponseCache(
+            ttl=settings.RESPONSE_CACHE_TTL,
+            max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+            max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+            redis=self.redis if settings.RESPONSE_CACHE_REDIS else None,
+            semantic=semantic,
+        )
+    
+    async def _init_limiter(self):
+        """Initialize per-key and per-user request rate limits"""
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        
+        self.limiter = RateLimiter(
+            {
+                "key": Limit.per_minute(
+                    settings.RATE_LIMIT_KEY_RPM, settings.RATE_LIMIT_KEY_BURST
+                ),
+                "user": Limit.per_minute(
+                    settings.RATE_LIMIT_USER_RPM, settings.RATE_LIMIT_USER_BURST
+                ),
+            },
+            redis=self.redis if settings.RATE_LIMIT_REDIS else None,
+            max_lease=settings.RATE_LIMIT_MAX_LEASE,
+        )
+    
     async def _init_memory(self):
         """Initialize Mem0 memory system"""
         try:
             logger.info("Initializing Memory service...")
             
-            # TODO: Import and initialize actual Mem0
-            # self.memory = MemoryService(settings.DATABASE_URL)
+            self.memory = await MemoryService.create(
+                engine, self.embeddings.embed, redis=self.redis
+            )
             
         except Exception as e:
             logger.error(f"Failed to initialize Memory service: {e}")
@@ -74,19 +295,46 @@ class ServiceManager:
         try:
             logger.info("Initializing RAG service...")
             
-            # TODO: Import and initialize actual R2R
-            # self.rag = RAGService(settings.DATABASE_URL)
+            self.rag = await RAGService.create(
+                engine, self.embeddings.embed, redis=self.redis
+            )
             
         except Exception as e:
             logger.error(f"Failed to initialize RAG service: {e}")
             raise
     
+    async def _init_entities(self):
+        """Initialize the shared knowledge-graph store"""
+        self.entities = await EntityStore.create(engine)
+    
+    async def _init_extractor(self):
+        """Start the background memory extraction worker
+        
+        The LLM and memory services are fetched on first use, so lazy mode
+        does not warm them at startup.
+        """
+        if not settings.MEMORY_EXTRACTION_ENABLED:
+            return
+        
+        self.extractor = MemoryExtractor(
+            self.get,
+            redis=self.redis if settings.MEMORY_EXTRACTION_REDIS else None,
+            model=settings.MEMORY_EXTRACTION_MODEL,
+            batch_size=settings.MEMORY_EXTRACTION_BATCH,
+            batch_wait=settings.MEMORY_EXTRACTION_WAIT,
+            concurrency=settings.MEMORY_EXTRACTION_CONCURRENCY,
+            max_chars=settings.MEMORY_EXTRACTION_MAX_CHARS,
+            dedupe_threshold=settings.MEMORY_DEDUPE_THRESHOLD,
+            queue_size=settings.MEMORY_EXTRACTION_QUEUE_SIZE,
+        )
+        self.extractor.start()
+    
     async def _init_mcp(self):
         """Initialize MCP servers"""
         try:
             logger.info("Initializing MCP service...")
             
-            # TODO: Import and initialize FastMCP
+            # TODO: Import (here, not at module level) and initialize FastMCP
             # self.mcp = MCPService()
             
         except Exception as e:
@@ -97,6 +345,22 @@ class ServiceManager:
         """Cleanup services on shutdown"""
         logger.info("Shutting down services...")
         
-        # TODO: Implement cleanup for each service
+        for task in self._prewarm_tasks:
+            task.cancel()
+        
+        if self.extractor:
+            await self.extractor.close()
+        if self.rag:
+            await self.rag.close()
+        if self.memory:
+            await self.memory.close()
+        if self.embeddings:
+            await self.embeddings.close()
+        if self.llm:
+            await self.llm.close()
+        if self.redis:
+            await self.redis.aclose()
+        
+        # TODO: Implement cleanup for remaining services
         
         logger.info("✅ All services shut down")
\ No newline at end of file
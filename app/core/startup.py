@@ -0,0 +1,105 @@
+"""Dependency-aware concurrent startup scheduler"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Step = Callable[[], Awaitable[None]]
+
+
+class StartupError(Exception):
+    """Raised when one or more startup steps fail"""
+
+    def __init__(self, failures: Dict[str, BaseException]):
+        self.failures = failures
+        details = ", ".join(f"{name}: {error!r}" for name, error in failures.items())
+        super().__init__(f"Startup failed ({details})")
+
+
+class StartupScheduler:
+    """Runs initializers concurrently while honouring declared dependencies
+
+    Every step starts as soon as all of its dependencies have finished, so
+    total startup time is the longest dependency chain rather than the sum
+    of all steps. A step whose dependency failed is skipped.
+    """
+
+    def __init__(self, default_timeout: Optional[float] = None):
+        self.default_timeout = default_timeout
+        self._steps: Dict[str, Tuple[Step, Tuple[str, ...], Optional[float]]] = {}
+        self.timings: Dict[str, float] = {}
+        self.total = 0.0
+
+    def add(
+        self,
+        name: str,
+        fn: Step,
+        depends_on: Iterable[str] = (),
+        timeout: Optional[float] = None,
+    ):
+        """Register a startup step"""
+        self._steps[name] = (fn, tuple(depends_on), timeout or self.default_timeout)
+
+    def _check(self):
+        for name, (_, deps, _) in self._steps.items():
+            for dep in deps:
+                if dep not in self._steps:
+                    raise ValueError(f"Step {name!r} depends on unknown {dep!r}")
+
+        visiting: List[str] = []
+        done = set()
+
+        def visit(name: str):
+            if name in done:
+                return
+            if name in visiting:
+                cycle = " -> ".join(visiting[visiting.index(name):] + [name])
+                raise ValueError(f"Startup dependency cycle: {cycle}")
+            visiting.append(name)
+            for dep in self._steps[name][1]:
+                visit(dep)
+            visiting.pop()
+            done.add(name)
+
+        for name in self._steps:
+            visit(name)
+
+    async def run(self):
+        """Run every step; raise StartupError if any failed"""
+        self._check()
+        tasks: Dict[str, asyncio.Task] = {}
+        started = time.perf_counter()
+
+        async def run_step(name: str):
+            fn, deps, timeout = self._steps[name]
+            if deps:
+                try:
+                    await asyncio.gather(*(tasks[dep] for dep in deps))
+                except Exception:
+                    raise RuntimeError("skipped, a dependency failed") from None
+            step_started = time.perf_counter()
+            try:
+                await asyncio.wait_for(fn(), timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"timed out after {timeout}s") from None
+            finally:
+                self.timings[name] = time.perf_counter() - step_started
+
+        for name in self._steps:
+            tasks[name] = asyncio.ensure_future(run_step(name))
+
+        results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+        self.total = time.perf_counter() - started
+
+        failures = {
+            name: result
+            for name, result in zip(tasks, results)
+            if isinstance(result, BaseException)
+        }
+        for name, seconds in self.timings.items():
+            logger.info(f"Startup step {name}: {seconds * 1000:.1f} ms")
+        logger.info(f"Startup finished in {self.total * 1000:.1f} ms")
+        if failures:
+            raise StartupError(failures)
@@ -7,9 +7,10 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
-from app.api import chat, memory, documents, health
+from app.api import chat, memory, documents, graph, health, metrics as metrics_api
 from app.core.config import settings
-from app.core.database import init_db
+from app.core.metrics import metrics
+from app.core.middleware import AuthMiddleware, MetricsMiddleware, RateLimitMiddleware
 from app.core.services import ServiceManager
 
 
@@ -19,14 +20,16 @@ async def lifespan(app: FastAPI):
     # Startup
     print("🚀 Starting Synapse...")
     
-    # Initialize database
-    await init_db()
-    
-    # Initialize services
+    # Initialize database and services
     app.state.services = ServiceManager()
     await app.state.services.initialize()
+    metrics.track_caches(app.state.services.cache_stats)
     
-    print("✅ Synapse is ready!")
+    timings = ", ".join(
+        f"{name}={seconds * 1000:.0f}ms"
+        for name, seconds in app.state.services.startup_timings.items()
+    )
+    print(f"✅ Synapse is ready! ({timings})")
     
     yield
     
@@ -45,6 +48,11 @@ app = FastAPI(
     redoc_url="/redoc" if settings.ENVIRONMENT == "development" else None,
 )
 
+# Authentication, then per-key and per-user rate limits; both run inside
+# CORS so their 401s and 429s carry its headers
+app.add_middleware(RateLimitMiddleware)
+app.add_middleware(AuthMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -54,11 +62,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency per route, outermost so everything above is timed
+if settings.ENABLE_PROMETHEUS:
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
+
 # Include routers
 app.include_router(health.router, tags=["health"])
 app.include_router(chat.router, prefix="/v1", tags=["chat"])
 app.include_router(memory.router, prefix="/api", tags=["memory"])
 app.include_router(documents.router, prefix="/api", tags=["documents"])
+app.include_router(graph.router, prefix="/api", tags=["graph"])
+if settings.ENABLE_PROMETHEUS:
+    app.include_router(metrics_api.router, tags=["metrics"])
 
 
 @app.exception_handler(HTTPException)
@@ -69,10 +84,15 @@ async def http_exception_handler(request, exc):
         content={
             "error": {
                 "message": exc.detail,
-                "type": "invalid_request_error",
+                "type": (
+                    "rate_limit_error"
+                    if exc.status_code == 429
+                    else "invalid_request_error"
+                ),
                 "code": exc.status_code,
             }
         },
+        headers=exc.headers,
     )
 
 
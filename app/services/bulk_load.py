@@ -0,0 +1,315 @@
+"""Bulk loading of knowledge-graph entities and relationships via COPY"""
+import json
+import logging
+import struct
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+_VECTOR_HEADER = struct.Struct(">HH")
+
+
+def encode_vector(vector: Sequence[float]) -> bytes:
+    """pgvector binary wire format: dim (int16), unused (int16), float4[dim]"""
+    return _VECTOR_HEADER.pack(len(vector), 0) + struct.pack(
+        f">{len(vector)}f", *vector
+    )
+
+
+def decode_vector(data: bytes) -> List[float]:
+    dimensions, _ = _VECTOR_HEADER.unpack_from(data)
+    return list(struct.unpack_from(f">{dimensions}f", data, _VECTOR_HEADER.size))
+
+
+@dataclass
+class EntityRecord:
+    """An entity to upsert, identified by (name, type)"""
+
+    name: str
+    type: str
+    embedding: Optional[Sequence[float]] = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    source_system: Optional[str] = None
+
+
+@dataclass
+class RelationshipRecord:
+    """A relationship to upsert between two entities given by (name, type)"""
+
+    from_name: str
+    from_type: str
+    to_name: str
+    to_type: str
+    relationship_type: str
+    weight: float = 1.0
+    properties: Dict[str, Any] = field(default_factory=dict)
+    source_system: Optional[str] = None
+
+
+_LOCK = text("SELECT pg_advisory_xact_lock(hashtext('shared graph bulk load'))")
+
+
+def _merge_source(old: str, new: str) -> str:
+    """Rows merged from both extractors are marked as coming from both"""
+    return f"""
+        CASE
+            WHEN {old} IS NULL OR {old} = {new} THEN COALESCE({new}, {old})
+            WHEN {new} IS NULL THEN {old}
+            ELSE 'both'
+        END
+    """
+
+
+def _entity_staging(dimensions: int) -> str:
+    return f"""
+    CREATE TEMP TABLE entities_staging (
+        seq INTEGER,
+        name TEXT,
+        type TEXT,
+        metadata JSONB,
+        embedding vector({dimensions}),
+        source_system TEXT
+    ) ON COMMIT DROP
+    """
+
+
+# The latest staged row wins per (name, type); existing entities are merged
+# into, everything else is inserted. One statement, one round trip.
+_MERGE_ENTITIES = text(
+    f"""
+    WITH latest AS (
+        SELECT DISTINCT ON (name, type) *
+        FROM entities_staging
+        ORDER BY name, type, seq DESC
+    ),
+    updated AS (
+        UPDATE shared.entities e
+        SET metadata = COALESCE(e.metadata, '{{}}') || l.metadata,
+            embedding = COALESCE(l.embedding, e.embedding),
+            source_system = {_merge_source("e.source_system", "l.source_system")},
+            updated_at = NOW()
+        FROM latest l
+        WHERE e.name = l.name AND e.type = l.type
+        RETURNING e.id
+    ),
+    inserted AS (
+        INSERT INTO shared.entities (name, type, metadata, embedding, source_system)
+        SELECT l.name, l.type, l.metadata, l.embedding, l.source_system
+        FROM latest l
+        WHERE NOT EXISTS (
+            SELECT 1 FROM shared.entities e
+            WHERE e.name = l.name AND e.type = l.type
+        )
+        RETURNING id
+    )
+    SELECT
+        (SELECT count(*) FROM inserted) AS inserted,
+        (SELECT count(*) FROM updated) AS updated
+    """
+)
+
+_RELATIONSHIP_STAGING = """
+    CREATE TEMP TABLE relationships_staging (
+        seq INTEGER,
+        from_name TEXT,
+        from_type TEXT,
+        to_name TEXT,
+        to_type TEXT,
+        relationship_type TEXT,
+        weight DOUBLE PRECISION,
+        properties JSONB,
+        source_system TEXT
+    ) ON COMMIT DROP
+"""
+
+_MERGE_RELATIONSHIPS = text(
+    f"""
+    WITH resolved AS (
+        SELECT DISTINCT ON (f.id, t.id, s.relationship_type)
+            f.id AS from_id, t.id AS to_id, s.*
+        FROM relationships_staging s
+        JOIN shared.entities f ON f.name = s.from_name AND f.type = s.from_type
+        JOIN shared.entities t ON t.name = s.to_name AND t.type = s.to_type
+        ORDER BY f.id, t.id, s.relationship_type, s.seq DESC
+    ),
+    updated AS (
+        UPDATE shared.relationships r
+        SET properties = COALESCE(r.properties, '{{}}') || x.properties,
+            weight = x.weight,
+            source_system = {_merge_source("r.source_system", "x.source_system")}
+        FROM resolved x
+        WHERE r.from_entity_id = x.from_id
+            AND r.to_entity_id = x.to_id
+            AND r.relationship_type = x.relationship_type
+        RETURNING r.id
+    ),
+    inserted AS (
+        INSERT INTO shared.relationships (
+            from_entity_id, to_entity_id, relationship_type, properties, weight,
+            source_system
+        )
+        SELECT
+            x.from_id, x.to_id, x.relationship_type, x.properties, x.weight,
+            x.source_system
+        FROM resolved x
+        WHERE NOT EXISTS (
+            SELECT 1 FROM shared.relationships r
+            WHERE r.from_entity_id = x.from_id
+                AND r.to_entity_id = x.to_id
+                AND r.relationship_type = x.relationship_type
+        )
+        RETURNING id
+    )
+    SELECT
+        (SELECT count(*) FROM inserted) AS inserted,
+        (SELECT count(*) FROM updated) AS updated,
+        (
+            SELECT count(*) FROM relationships_staging s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM shared.entities f
+                WHERE f.name = s.from_name AND f.type = s.from_type
+            ) OR NOT EXISTS (
+                SELECT 1 FROM shared.entities t
+                WHERE t.name = s.to_name AND t.type = s.to_type
+            )
+        ) AS unresolved
+    """
+)
+
+
+def _batches(records: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(records)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class BulkLoader:
+    """Loads the shared knowledge graph with binary COPY
+
+    Each batch is copied into a temporary staging table with asyncpg's
+    ``copy_records_to_table`` (vectors included, in pgvector's binary
+    format) and merged into ``shared.entities`` / ``shared.relationships``
+    with a single upsert statement keyed on ``(name, type)``. Concurrent
+    loads are serialized with an advisory lock so the merge cannot race
+    itself into duplicates.
+    """
+
+    def __init__(
+        self, engine: AsyncEngine, dimensions: int = 1536, batch_size: int = 50_000
+    ):
+        self.engine = engine
+        self.dimensions = dimensions
+        self.batch_size = batch_size
+
+    async def _copy(
+        self, conn: AsyncConnection, table: str, columns: List[str], records
+    ):
+        raw = await conn.get_raw_connection()
+        driver = raw.driver_connection
+        # The binary codec is only for COPY; the connection goes back to the
+        # pool, where queries bind vectors as text literals
+        await driver.set_type_codec(
+            "vector",
+            encoder=encode_vector,
+            decoder=decode_vector,
+            format="binary",
+        )
+        try:
+            await driver.copy_records_to_table(
+                table, records=records, columns=columns
+            )
+        finally:
+            await driver.reset_type_codec("vector")
+        await conn.execute(text(f"ANALYZE {table}"))
+
+    def _check(self, record: EntityRecord):
+        if record.embedding is not None and len(record.embedding) != self.dimensions:
+            raise ValueError(
+                f"Entity {record.name!r}: expected {self.dimensions}-d embedding, "
+                f"got {len(record.embedding)}"
+            )
+
+    async def load_entities(self, records: Iterable[EntityRecord]) -> Dict[str, int]:
+        """Upsert entities; returns how many were inserted and updated"""
+        totals = {"inserted": 0, "updated": 0}
+        for batch in _batches(records, self.batch_size):
+            rows = []
+            for seq, record in enumerate(batch):
+                self._check(record)
+                rows.append(
+                    (
+                        seq,
+                        record.name,
+                        record.type,
+                        json.dumps(record.metadata or {}),
+                        record.embedding,
+                        record.source_system,
+                    )
+                )
+            async with self.engine.begin() as conn:
+                await conn.execute(_LOCK)
+                await conn.execute(text(_entity_staging(self.dimensions)))
+                await self._copy(
+                    conn,
+                    "entities_staging",
+                    ["seq", "name", "type", "metadata", "embedding", "source_system"],
+                    rows,
+                )
+                counts = (await conn.execute(_MERGE_ENTITIES)).one()
+            totals["inserted"] += counts.inserted
+            totals["updated"] += counts.updated
+        logger.info(f"Bulk loaded entities: {totals}")
+        return totals
+
+    async def load_relationships(
+        self, records: Iterable[RelationshipRecord]
+    ) -> Dict[str, int]:
+        """Upsert relationships between existing entities
+
+        Returns how many were inserted and updated, and how many staged rows
+        were skipped because an endpoint entity does not exist.
+        """
+        totals = {"inserted": 0, "updated": 0, "unresolved": 0}
+        columns = [
+            "seq",
+            "from_name",
+            "from_type",
+            "to_name",
+            "to_type",
+            "relationship_type",
+            "weight",
+            "properties",
+            "source_system",
+        ]
+        for batch in _batches(records, self.batch_size):
+            rows = [
+                (
+                    seq,
+                    r.from_name,
+                    r.from_type,
+                    r.to_name,
+                    r.to_type,
+                    r.relationship_type,
+                    float(r.weight),
+                    json.dumps(r.properties or {}),
+                    r.source_system,
+                )
+                for seq, r in enumerate(batch)
+            ]
+            async with self.engine.begin() as conn:
+                await conn.execute(_LOCK)
+                await conn.execute(text(_RELATIONSHIP_STAGING))
+                await self._copy(conn, "relationships_staging", columns, rows)
+                counts = (await conn.execute(_MERGE_RELATIONSHIPS)).one()
+            for key in totals:
+                totals[key] += getattr(counts, key)
+        logger.info(f"Bulk loaded relationships: {totals}")
+        return totals
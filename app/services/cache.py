@@ -0,0 +1,256 @@
+"""Response cache for chat completions"""
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.core.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+logger = logging.getLogger(__name__)
+
+Embedder = Callable[[str], Awaitable[Sequence[float]]]
+
+
+def canonical_request(
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: Optional[float],
+    max_tokens: Optional[int] = None,
+) -> Dict[str, Any]:
+    """The fields of a chat request that determine its response"""
+    return {
+        "model": model,
+        "messages": [{"role": m["role"], "content": m["content"]} for m in messages],
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }
+
+
+def cache_key(canonical: Dict[str, Any]) -> str:
+    """Stable hash of a canonical request"""
+    encoded = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+@dataclass
+class CachedResponse:
+    """A completed response, replayable as a stream or a single message"""
+
+    content: str
+    finish_reason: str = "stop"
+    usage: Dict[str, int] = field(default_factory=dict)
+    chunks: List[str] = field(default_factory=list)
+
+    def deltas(self) -> List[str]:
+        return self.chunks or [self.content]
+
+    @property
+    def size(self) -> int:
+        return len(self.content) + sum(len(c) for c in self.chunks)
+
+    def dumps(self) -> str:
+        return json.dumps(asdict(self), separators=(",", ":"))
+
+    @classmethod
+    def loads(cls, raw) -> "CachedResponse":
+        return cls(**json.loads(raw))
+
+
+class LRUCache:
+    """In-process LRU with TTL, bounded by entry count and payload size"""
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self._entries: "OrderedDict[str, Tuple[float, CachedResponse]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            self.pop(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: CachedResponse, ttl: Optional[float] = None):
+        if value.size > self.max_bytes:
+            return
+        self.pop(key)
+        self._entries[key] = (time.monotonic() + (ttl or self.ttl), value)
+        self.bytes += value.size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.bytes -= evicted.size
+
+    def pop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1].size
+
+
+class SemanticIndex:
+    """Near-duplicate lookup over prompt embeddings
+
+    Entries are grouped by the non-message request parameters (model,
+    temperature, max_tokens), so only prompts that would be sent with the
+    same settings can match. Vectors are kept L2-normalized in one matrix
+    per group, making a lookup a single matrix-vector product.
+    """
+
+    def __init__(self, embed: Embedder, threshold: float, max_entries: int = 1024):
+        self.embed = embed
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._groups: Dict[str, Tuple["np.ndarray", List[str]]] = {}
+
+    @staticmethod
+    def text(canonical: Dict[str, Any]) -> str:
+        return "\n".join(f"{m['role']}: {m['content']}" for m in canonical["messages"])
+
+    @staticmethod
+    def group(canonical: Dict[str, Any]) -> str:
+        return cache_key({k: v for k, v in canonical.items() if k != "messages"})
+
+    async def vector(self, canonical: Dict[str, Any]) -> "np.ndarray":
+        vector = np.asarray(await self.embed(self.text(canonical)), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def search(self, group: str, vector: "np.ndarray") -> Optional[str]:
+        """Key of the most similar cached prompt above the threshold"""
+        if group not in self._groups:
+            return None
+        matrix, keys = self._groups[group]
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        return keys[best] if scores[best] >= self.threshold else None
+
+    def add(self, group: str, vector: "np.ndarray", key: str):
+        if group in self._groups:
+            matrix, keys = self._groups[group]
+            matrix, keys = np.vstack([matrix, vector]), keys + [key]
+        else:
+            matrix, keys = vector[np.newaxis, :], [key]
+        if len(keys) > self.max_entries:
+            matrix, keys = matrix[-self.max_entries :], keys[-self.max_entries :]
+        self._groups[group] = (matrix, keys)
+
+
+class ResponseCache:
+    """Two-tier exact-match cache with an optional semantic tier
+
+    Lookups go local LRU → Redis → semantic index. Redis hits are promoted
+    into the LRU, and Redis failures degrade to the local tier instead of
+    failing the request. The semantic tier maps a near-duplicate prompt to
+    the exact key of a cached response, so it reuses the exact tiers for
+    storage and expiry. The prompt vector of a semantic miss is kept until
+    ``set`` stores the response, so a miss costs one embedding call.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 3600,
+        max_entries: int = 1024,
+        max_bytes: int = 64 * 1024 * 1024,
+        redis=None,
+        prefix: str = "synapse:response:",
+        semantic: Optional[SemanticIndex] = None,
+        max_pending: int = 256,
+    ):
+        self.ttl = ttl
+        self.local = LRUCache(max_entries, max_bytes, ttl)
+        self.redis = redis
+        self.prefix = prefix
+        self.semantic = semantic
+        self.max_pending = max_pending
+        self._pending: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.counters = {
+            "local_hits": 0,
+            "redis_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "redis_errors": 0,
+        }
+
+    async def _get_exact(self, key: str) -> Tuple[Optional[CachedResponse], str]:
+        value = self.local.get(key)
+        if value is not None:
+            return value, "local_hits"
+        if self.redis is not None:
+            try:
+                raw = await self.redis.get(self.prefix + key)
+            except Exception as e:
+                self.counters["redis_errors"] += 1
+                logger.warning(f"Response cache Redis read failed: {e}")
+                raw = None
+            if raw is not None:
+                value = CachedResponse.loads(raw)
+                self.local.set(key, value)
+                return value, "redis_hits"
+        return None, "misses"
+
+    async def get(self, canonical: Dict[str, Any]) -> Optional[CachedResponse]:
+        """Look up a response for a canonical request"""
+        key = cache_key(canonical)
+        value, tier = await self._get_exact(key)
+        if value is None and self.semantic is not None:
+            vector = None
+            try:
+                vector = await self.semantic.vector(canonical)
+                match = self.semantic.search(self.semantic.group(canonical), vector)
+            except Exception as e:
+                logger.warning(f"Semantic cache lookup failed: {e}")
+                match = None
+            if match is not None:
+                value, _ = await self._get_exact(match)
+                if value is not None:
+                    tier = "semantic_hits"
+            if value is None and vector is not None:
+                self._pending[key] = vector
+                self._pending.move_to_end(key)
+                if len(self._pending) > self.max_pending:
+                    self._pending.popitem(last=False)
+        self.counters[tier] += 1
+        return value
+
+    async def set(self, canonical: Dict[str, Any], value: CachedResponse):
+        """Store a completed response in every tier"""
+        key = cache_key(canonical)
+        self.local.set(key, value)
+        if self.redis is not None:
+            try:
+                await self.redis.set(self.prefix + key, value.dumps(), ex=int(self.ttl))
+            except Exception as e:
+                self.counters["redis_errors"] += 1
+                logger.warning(f"Response cache Redis write failed: {e}")
+        if self.semantic is not None:
+            try:
+                vector = self._pending.pop(key, None)
+                if vector is None:
+                    vector = await self.semantic.vector(canonical)
+                self.semantic.add(self.semantic.group(canonical), vector, key)
+            except Exception as e:
+                logger.warning(f"Semantic cache insert failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        hits = sum(v for k, v in self.counters.items() if k.endswith("_hits"))
+        lookups = hits + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "local_entries": len(self.local),
+            "local_bytes": self.local.bytes,
+        }
@@ -0,0 +1,160 @@
+"""Single-flight coalescing of identical in-flight requests"""
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """One upstream call shared by every request with the same key"""
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+
+    def release(self):
+        self.waiters -= 1
+        self.cancel_if_idle()
+
+    def cancel_if_idle(self):
+        if self.waiters == 0 and self.task is not None and not self.task.done():
+            # Nobody is listening any more; stop paying for the upstream call
+            self.task.cancel()
+
+
+class _Broadcast(_Flight):
+    """Fans a stream of chunks out to every subscriber
+
+    Chunks are retained for the lifetime of the flight, so a follower that
+    attaches mid-stream replays from the first chunk before following live.
+    Subscribers only count once they start iterating, so the pump is also
+    cancelled if nobody has started within the start timeout.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.chunks: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._event = asyncio.Event()
+        self._idle: Optional[asyncio.TimerHandle] = None
+
+    def arm(self, timeout: float):
+        """Cancel the pump unless a subscriber starts within ``timeout``"""
+        if self._idle is not None:
+            self._idle.cancel()
+        loop = asyncio.get_running_loop()
+        self._idle = loop.call_later(timeout, self.cancel_if_idle)
+
+    def _wake(self):
+        self._event.set()
+        self._event = asyncio.Event()
+
+    async def pump(self, source: AsyncIterator[Any]):
+        try:
+            async for chunk in source:
+                self.chunks.append(chunk)
+                self._wake()
+        except Exception as e:
+            self.error = e
+        except asyncio.CancelledError:
+            # Subscribers that had not started yet must not see a clean end
+            self.error = RuntimeError("Coalesced stream was cancelled")
+            raise
+        finally:
+            self.done = True
+            self._wake()
+            if self._idle is not None:
+                self._idle.cancel()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        # Counted from the first iteration, so a stream nobody reads holds nothing
+        self.waiters += 1
+        index = 0
+        try:
+            while True:
+                while index < len(self.chunks):
+                    yield self.chunks[index]
+                    index += 1
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await self._event.wait()
+        finally:
+            self.release()
+
+
+class SingleFlight:
+    """Attach identical concurrent requests to one leader's upstream call
+
+    The upstream call runs in its own task, so a leader disconnecting does
+    not fail its followers; the task is only cancelled once every waiter
+    has gone, or, for streams, when no subscriber has started iterating
+    ``start_timeout`` seconds after the last one attached. Flights are
+    forgotten as soon as they finish, so later requests go through the
+    response cache instead.
+    """
+
+    def __init__(self, start_timeout: float = 5.0):
+        self.start_timeout = start_timeout
+        self._calls: Dict[str, _Flight] = {}
+        self._streams: Dict[str, _Broadcast] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Await ``fn()``, sharing the call with identical in-flight keys"""
+        flight = self._calls.get(key)
+        if flight is None:
+            flight = _Flight()
+            flight.task = asyncio.ensure_future(fn())
+            flight.task.add_done_callback(self._forget(self._calls, key, flight))
+            self._calls[key] = flight
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.release()
+
+    def stream(
+        self, key: str, factory: Callable[[], AsyncIterator[Any]]
+    ) -> AsyncIterator[Any]:
+        """Iterate ``factory()``, sharing the stream with identical keys"""
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = _Broadcast()
+            broadcast.task = asyncio.ensure_future(broadcast.pump(factory()))
+            broadcast.task.add_done_callback(
+                self._forget(self._streams, key, broadcast)
+            )
+            self._streams[key] = broadcast
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        broadcast.arm(self.start_timeout)
+        return broadcast.subscribe()
+
+    @staticmethod
+    def _forget(registry: Dict[str, _Flight], key: str, flight: _Flight):
+        def callback(task: asyncio.Task):
+            if registry.get(key) is flight:
+                del registry[key]
+            if not task.cancelled() and task.exception() is not None:
+                # Retrieved here so abandoned failures are not logged as unhandled
+                logger.debug(f"Coalesced call {key[:12]} failed: {task.exception()}")
+
+        return callback
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls) + len(self._streams),
+        }
@@ -0,0 +1,205 @@
+"""Concurrent retrieval-context assembly for chat requests"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.services.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+ServiceGetter = Callable[[str], Awaitable[Any]]
+CountTokens = Callable[[str], int]
+
+# Order in which legs are packed into the token budget
+LEGS = ("memory", "graph", "documents")
+
+_HEADINGS = {
+    "memory": "Relevant memories about the user:",
+    "graph": "Related entities:",
+    "documents": "Relevant documents:",
+}
+
+
+@dataclass
+class LegResult:
+    """Outcome of one retrieval leg"""
+
+    name: str
+    status: str = "ok"  # ok | timeout | error | disabled
+    elapsed: float = 0.0
+    items: List[str] = field(default_factory=list)
+    packed: int = 0
+
+
+@dataclass
+class AssembledContext:
+    """Retrieved context packed into a system message"""
+
+    legs: Dict[str, LegResult]
+    content: Optional[str] = None
+    tokens: int = 0
+    elapsed: float = 0.0
+
+    @staticmethod
+    def position(messages: List[Dict[str, str]]) -> int:
+        """Index the context message is inserted at"""
+        position = 0
+        while position < len(messages) and messages[position]["role"] == "system":
+            position += 1
+        return position
+
+    def apply(self, messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Insert the context after any leading system messages"""
+        if not self.content:
+            return messages
+        position = self.position(messages)
+        context = {"role": "system", "content": self.content}
+        return messages[:position] + [context] + messages[position:]
+
+    def headers(self, reused: bool = False) -> Dict[str, str]:
+        """``Server-Timing`` entry per leg plus the packed token count
+
+        Context reused from an earlier turn reports no leg timings.
+        """
+        if reused:
+            timings = ['context;dur=0.0;desc="reused"']
+        else:
+            timings = [
+                f'{leg.name};dur={leg.elapsed * 1000:.1f};desc="{leg.status}"'
+                for leg in self.legs.values()
+            ]
+            timings.append(f"context;dur={self.elapsed * 1000:.1f}")
+        return {
+            "Server-Timing": ", ".join(timings),
+            "X-Synapse-Context-Tokens": str(self.tokens),
+        }
+
+
+class ContextAssembler:
+    """Fetches memories, documents and graph context concurrently
+
+    Every leg runs under its own deadline; a leg that times out or fails
+    is dropped rather than delaying or failing the request. Results are
+    then packed, in ``LEGS`` order, into one system message that fits the
+    token budget.
+    """
+
+    def __init__(
+        self,
+        get: ServiceGetter,
+        timeouts: Dict[str, float],
+        token_budget: int = 2000,
+        count_tokens: CountTokens = estimate_tokens,
+        memory_limit: int = 5,
+        document_limit: int = 5,
+        graph_seeds: int = 3,
+        graph_limit: int = 10,
+    ):
+        self.get = get
+        self.timeouts = timeouts
+        self.token_budget = token_budget
+        self.count_tokens = count_tokens
+        self.memory_limit = memory_limit
+        self.document_limit = document_limit
+        self.graph_seeds = graph_seeds
+        self.graph_limit = graph_limit
+
+    async def _service(self, name: str):
+        # A leg may time out while a lazy service is still warming up; let
+        # the warm-up finish in the background instead of cancelling it
+        return await asyncio.shield(self.get(name))
+
+    async def _memory(self, query: str, user_id: str) -> List[str]:
+        memory = await self._service("memory")
+        memories = await memory.search(user_id, query, self.memory_limit)
+        return [f"- {m['content']}" for m in memories]
+
+    async def _documents(self, query: str, user_id: str) -> List[str]:
+        rag = await self._service("rag")
+        hits = await rag.search(query, self.document_limit, user_id=user_id)
+        return [f"[{hit['filename']}]\n{hit['content']}" for hit in hits]
+
+    async def _graph(self, query: str, user_id: str) -> List[str]:
+        embeddings = await self._service("embeddings")
+        entities = await self._service("entities")
+        embedding = await embeddings.embed_one(query)
+        seeds = await entities.search(embedding, self.graph_seeds)
+        if not seeds:
+            return []
+        neighborhoods = await entities.neighborhoods(
+            [seed["id"] for seed in seeds], hops=1, limit=self.graph_limit
+        )
+        items = []
+        for seed in seeds:
+            related = neighborhoods.get(seed["id"], [])
+            line = f"- {seed['name']} ({seed['type']})"
+            if related:
+                line += ": " + ", ".join(
+                    f"{n['relationship_type']} {n['name']}" for n in related
+                )
+            items.append(line)
+        return items
+
+    async def _run(
+        self,
+        name: str,
+        fetch: Callable[[str, str], Awaitable[List[str]]],
+        query: str,
+        user_id: str,
+    ) -> LegResult:
+        timeout = self.timeouts.get(name)
+        result = LegResult(name)
+        if timeout is not None and timeout <= 0:
+            result.status = "disabled"
+            return result
+        started = time.perf_counter()
+        try:
+            result.items = await asyncio.wait_for(fetch(query, user_id), timeout)
+        except asyncio.TimeoutError:
+            result.status = "timeout"
+        except Exception as e:
+            logger.warning(f"Context leg {name} failed: {e}")
+            result.status = "error"
+        result.elapsed = time.perf_counter() - started
+        return result
+
+    async def assemble(self, query: str, user_id: str) -> AssembledContext:
+        started = time.perf_counter()
+        fetchers = {
+            "memory": self._memory,
+            "graph": self._graph,
+            "documents": self._documents,
+        }
+        results = await asyncio.gather(
+            *(self._run(name, fetchers[name], query, user_id) for name in LEGS)
+        )
+        context = AssembledContext(legs={leg.name: leg for leg in results})
+        context.content, context.tokens = self.pack(results)
+        context.elapsed = time.perf_counter() - started
+        return context
+
+    def pack(self, legs: List[LegResult]):
+        """Greedily fill the token budget, leg by leg, item by item"""
+        sections = []
+        used = 0
+        for leg in legs:
+            if not leg.items:
+                continue
+            heading = _HEADINGS[leg.name]
+            cost = self.count_tokens(heading)
+            lines = []
+            for item in leg.items:
+                tokens = self.count_tokens(item)
+                if used + cost + tokens > self.token_budget:
+                    break
+                cost += tokens
+                lines.append(item)
+            if lines:
+                used += cost
+                leg.packed = len(lines)
+                sections.append("\n".join([heading, *lines]))
+        if not sections:
+            return None, 0
+        return "\n\n".join(sections), used
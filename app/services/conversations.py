@@ -0,0 +1,148 @@
+"""Per-user conversation state reused across chat turns"""
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+from app.services.context import AssembledContext
+from app.services.tokens import TokenCounter
+
+
+def step(digest: bytes, message: Dict[str, str]) -> bytes:
+    """Extend a conversation prefix hash by one message"""
+    h = hashlib.blake2b(digest, digest_size=16)
+    h.update(message["role"].encode())
+    h.update(b"\0")
+    h.update((message.get("content") or "").encode())
+    return h.digest()
+
+
+def chain(messages: Sequence[Dict[str, str]]) -> List[bytes]:
+    """Prefix hash after each message; ``chain(m)[i]`` identifies ``m[:i + 1]``"""
+    digests = []
+    digest = b""
+    for message in messages:
+        digest = step(digest, message)
+        digests.append(digest)
+    return digests
+
+
+@dataclass
+class ConversationState:
+    """What has been computed for one conversation prefix"""
+
+    key: bytes
+    model: str
+    counts: List[int] = field(default_factory=list)  # tokens per message
+    reused: int = 0  # leading messages matched to an earlier turn
+    query: Optional[str] = None  # user message the context was retrieved for
+    context: Optional[AssembledContext] = None
+    extracted: int = 0  # leading messages already queued for memory extraction
+    expires: float = 0.0
+
+    @property
+    def length(self) -> int:
+        return len(self.counts)
+
+
+class ConversationStore:
+    """Recent conversation prefixes per user, in process
+
+    IDE clients resend the whole history every turn. Prefixes are chained
+    hashes over the messages, so the longest prefix seen before is found
+    with one dictionary probe per message and only the new tail has to be
+    tokenized. After a reply the prefix including the assistant message is
+    stored as well, so the next turn usually matches all but its last
+    message. A TTL of 0 disables the store.
+    """
+
+    def __init__(
+        self, max_users: int = 10_000, per_user: int = 8, ttl: float = 1800.0
+    ):
+        self.max_users = max_users
+        self.per_user = per_user
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._users: "OrderedDict[str, OrderedDict[bytes, ConversationState]]" = (
+            OrderedDict()
+        )
+
+    def lookup(
+        self, user_id: str, digests: Sequence[bytes]
+    ) -> Optional[ConversationState]:
+        """State for the longest stored prefix of the hashed conversation"""
+        states = self._users.get(user_id)
+        if states:
+            now = time.monotonic()
+            for digest in reversed(digests):
+                state = states.get(digest)
+                if state is None:
+                    continue
+                if state.expires < now:
+                    del states[digest]
+                    continue
+                states.move_to_end(digest)
+                self._users.move_to_end(user_id)
+                self.hits += 1
+                return state
+        self.misses += 1
+        return None
+
+    def resume(
+        self,
+        user_id: str,
+        messages: Sequence[Dict[str, str]],
+        model: str,
+        tokens: TokenCounter,
+    ) -> ConversationState:
+        """State for ``messages``, counting only what no earlier turn did"""
+        digests = chain(messages)
+        previous = self.lookup(user_id, digests) if self.ttl > 0 else None
+        state = ConversationState(digests[-1] if digests else b"", model)
+        if previous is not None:
+            state.reused = previous.length
+            state.query, state.context = previous.query, previous.context
+            state.extracted = previous.extracted
+            if previous.model == model:
+                state.counts = list(previous.counts)
+        state.counts += [
+            tokens.count_message(m, model) for m in messages[state.length :]
+        ]
+        return state
+
+    def extend(
+        self,
+        state: ConversationState,
+        message: Dict[str, str],
+        tokens: TokenCounter,
+    ) -> ConversationState:
+        """State for the conversation with ``message`` (the reply) appended"""
+        return ConversationState(
+            step(state.key, message),
+            state.model,
+            counts=state.counts + [tokens.count_message(message, state.model)],
+            reused=state.length,
+            query=state.query,
+            context=state.context,
+            extracted=state.extracted,
+        )
+
+    def save(self, user_id: str, state: ConversationState):
+        if self.ttl <= 0 or not state.key:
+            return
+        state.expires = time.monotonic() + self.ttl
+        states = self._users.get(user_id)
+        if states is None:
+            states = self._users[user_id] = OrderedDict()
+        states[state.key] = state
+        states.move_to_end(state.key)
+        self._users.move_to_end(user_id)
+        while len(states) > self.per_user:
+            states.popitem(last=False)
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {"users": len(self._users), "hits": self.hits, "misses": self.misses}
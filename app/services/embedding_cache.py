@@ -0,0 +1,218 @@
+"""Content-addressed cache of text embeddings"""
+import array
+import base64
+import hashlib
+import logging
+import re
+import unicodedata
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.services.memory import vector_literal
+
+logger = logging.getLogger(__name__)
+
+BatchEmbedder = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(content: str) -> str:
+    """Canonical form of a chunk: NFC, whitespace runs collapsed, trimmed"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", content)).strip()
+
+
+def embedding_key(model: str, content: str) -> str:
+    """Cache key for ``content`` embedded by ``model``"""
+    digest = hashlib.sha256(f"{model}\0{normalize_text(content)}".encode())
+    return digest.hexdigest()
+
+
+def embedding_cache_schema(dimensions: int) -> List[str]:
+    """DDL for ``r2r.embedding_cache``"""
+    return [
+        f"""
+        CREATE TABLE IF NOT EXISTS r2r.embedding_cache (
+            key TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            embedding vector({dimensions}) NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT NOW()
+        )
+        """
+    ]
+
+
+_SELECT = text(
+    """
+    SELECT key, embedding::text AS embedding
+    FROM r2r.embedding_cache
+    WHERE key = ANY(:keys)
+    """
+)
+
+_INSERT = text(
+    """
+    INSERT INTO r2r.embedding_cache (key, model, embedding)
+    VALUES (:key, :model, CAST(:embedding AS vector))
+    ON CONFLICT (key) DO NOTHING
+    """
+)
+
+
+def _pack(vector: Sequence[float]) -> str:
+    return base64.b64encode(array.array("f", vector).tobytes()).decode()
+
+
+def _unpack(raw: str) -> array.array:
+    vector = array.array("f")
+    vector.frombytes(base64.b64decode(raw))
+    return vector
+
+
+def _parse_vector(literal: str) -> array.array:
+    return array.array("f", (float(x) for x in literal[1:-1].split(",")))
+
+
+class EmbeddingCache:
+    """Embeddings keyed by a hash of (model, normalized text)
+
+    Lookups go local LRU → Redis → Postgres, and hits are promoted to the
+    faster tiers. Because keys are content hashes, entries never go stale;
+    Redis entries expire only to bound its memory. Vectors are kept as
+    float32 arrays locally and in Redis.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        engine: Optional[AsyncEngine] = None,
+        redis=None,
+        max_entries: int = 10_000,
+        ttl: int = 7 * 86400,
+        prefix: str = "synapse:emb:",
+    ):
+        self.model = model
+        self.engine = engine
+        self.redis = redis
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.prefix = prefix
+        self._entries: "OrderedDict[str, array.array]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, content: str) -> str:
+        return embedding_key(self.model, content)
+
+    async def create_schema(self, dimensions: int):
+        if self.engine is None:
+            return
+        async with self.engine.begin() as conn:
+            for statement in embedding_cache_schema(dimensions):
+                await conn.execute(text(statement))
+
+    def _remember(self, key: str, vector: array.array):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_many(self, keys: List[str]) -> Dict[str, array.array]:
+        found: Dict[str, array.array] = {}
+        for key in keys:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                found[key] = vector
+
+        missing = [key for key in keys if key not in found]
+        if missing and self.redis is not None:
+            try:
+                raws = await self.redis.mget([self.prefix + key for key in missing])
+            except Exception as e:
+                logger.warning(f"Embedding cache Redis lookup failed: {e}")
+                raws = [None] * len(missing)
+            for key, raw in zip(missing, raws):
+                if raw is not None:
+                    found[key] = _unpack(raw)
+                    self._remember(key, found[key])
+
+        missing = [key for key in keys if key not in found]
+        if missing and self.engine is not None:
+            async with self.engine.connect() as conn:
+                result = await conn.execute(_SELECT, {"keys": missing})
+                rows = [(row.key, _parse_vector(row.embedding)) for row in result]
+            for key, vector in rows:
+                found[key] = vector
+                self._remember(key, vector)
+            await self._set_redis(rows)
+        return found
+
+    async def set_many(self, items: List[Tuple[str, Sequence[float]]]):
+        if not items:
+            return
+        packed = [(key, array.array("f", vector)) for key, vector in items]
+        for key, vector in packed:
+            self._remember(key, vector)
+        await self._set_redis(packed)
+        if self.engine is not None:
+            async with self.engine.begin() as conn:
+                await conn.execute(
+                    _INSERT,
+                    [
+                        {
+                            "key": key,
+                            "model": self.model,
+                            "embedding": vector_literal(vector),
+                        }
+                        for key, vector in items
+                    ],
+                )
+
+    async def _set_redis(self, items: List[Tuple[str, array.array]]):
+        if self.redis is None or not items:
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, vector in items:
+                    pipe.set(self.prefix + key, _pack(vector), ex=self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Embedding cache Redis write failed: {e}")
+
+    async def embed(
+        self, texts: List[str], embed: BatchEmbedder
+    ) -> Tuple[List[List[float]], int]:
+        """Embed ``texts``, calling ``embed`` only for uncached content
+
+        Returns the vectors in input order and how many came from the cache.
+        """
+        keys = [self.key(content) for content in texts]
+        found = await self.get_many(list(dict.fromkeys(keys)))
+        hits = sum(1 for key in keys if key in found)
+
+        pending: Dict[str, str] = {}
+        for key, content in zip(keys, texts):
+            if key not in found:
+                pending.setdefault(key, content)
+        if pending:
+            vectors = await embed(list(pending.values()))
+            fresh = list(zip(pending, vectors))
+            await self.set_many(fresh)
+            found.update((key, vector) for key, vector in fresh)
+
+        self.hits += hits
+        self.misses += len(texts) - hits
+        return [list(found[key]) for key in keys], hits
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
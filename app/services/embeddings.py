@@ -0,0 +1,148 @@
+"""Shared embedding engine with dynamic micro-batching"""
+import asyncio
+import hashlib
+import logging
+import math
+import re
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+BatchEmbedder = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+class LocalEmbedder:
+    """Deterministic feature-hashing embedder
+
+    Tokens and token bigrams are hashed into signed buckets and the result
+    is L2-normalized, so texts sharing words score a positive cosine. Needs
+    no network or model weights; meant for tests, benchmarks and local
+    development, not retrieval quality.
+    """
+
+    def __init__(self, dimensions: int = 1536):
+        self.dimensions = dimensions
+
+    def _features(self, text: str) -> List[str]:
+        tokens = _TOKEN.findall(text.lower())
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def embed_text(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            vector[value % self.dimensions] += 1.0 if value >> 63 else -1.0
+        norm = math.sqrt(sum(x * x for x in vector))
+        return [x / norm for x in vector] if norm else vector
+
+    async def __call__(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_text(text) for text in texts]
+
+
+class BatchingEmbedder:
+    """Collects concurrent embedding requests into micro-batches
+
+    Callers submit texts individually; pending texts are flushed as one
+    upstream call when ``max_batch_size`` is reached or ``max_wait``
+    seconds after the first one arrived, whichever comes first. Identical
+    texts in a batch are embedded once. At most ``max_concurrency``
+    batches are in flight upstream at a time.
+    """
+
+    def __init__(
+        self,
+        embed: BatchEmbedder,
+        max_batch_size: int = 64,
+        max_wait: float = 0.005,
+        max_concurrency: int = 4,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self._embed = embed
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.requests = 0
+        self.batches = 0
+        self.embedded = 0
+        self._batch_sizes = metrics.embedding_batch_size()
+
+    def embed_one(self, text: str) -> "asyncio.Future[List[float]]":
+        """Queue one text; the returned future resolves to its vector"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        self.requests += 1
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return future
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed many texts, sharing batches with concurrent callers"""
+        return list(await asyncio.gather(*(self.embed_one(t) for t in texts)))
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch = self._pending[: self.max_batch_size]
+            del self._pending[: self.max_batch_size]
+            task = asyncio.create_task(self._dispatch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]]):
+        waiters: Dict[str, List[asyncio.Future]] = {}
+        for text, future in batch:
+            waiters.setdefault(text, []).append(future)
+        texts = list(waiters)
+        try:
+            async with self._semaphore:
+                vectors = await self._embed(texts)
+            if len(vectors) != len(texts):
+                raise ValueError(
+                    f"Embedder returned {len(vectors)} vectors for {len(texts)} texts"
+                )
+        except asyncio.CancelledError:
+            for futures in waiters.values():
+                for future in futures:
+                    future.cancel()
+            raise
+        except Exception as e:
+            for futures in waiters.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        self.batches += 1
+        self.embedded += len(texts)
+        self._batch_sizes.observe(len(texts))
+        for text, vector in zip(texts, vectors):
+            for future in waiters[text]:
+                if not future.done():
+                    future.set_result(vector)
+
+    async def close(self):
+        """Flush anything pending and wait for in-flight batches"""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "embedded": self.embedded,
+            "mean_batch_size": self.embedded / self.batches if self.batches else 0.0,
+        }
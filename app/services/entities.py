@@ -0,0 +1,256 @@
+"""Knowledge-graph entities in the shared schema"""
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.services import vector_index
+from app.services.memory import vector_literal
+
+logger = logging.getLogger(__name__)
+
+_COLUMNS = "id, name, type, metadata, source_system, created_at, updated_at"
+
+_SEARCH = text(
+    f"""
+    SELECT {_COLUMNS}, 1 - (embedding <=> CAST(:embedding AS vector)) AS score
+    FROM shared.entities
+    WHERE embedding IS NOT NULL
+    ORDER BY embedding <=> CAST(:embedding AS vector)
+    LIMIT :limit
+    """
+)
+
+
+# k-hop walk from one or more roots in a single recursive CTE. Each path
+# scores the product of its edge weights; a neighbor reached by several
+# paths keeps its best one. ``path`` prevents cycles.
+_NEIGHBORHOOD = text(
+    """
+    WITH RECURSIVE walk(root, entity_id, depth, score, path, via) AS (
+        SELECT root, root, 0, 1.0::float8, ARRAY[root], NULL::text
+        FROM unnest(CAST(:roots AS uuid[])) AS root
+      UNION ALL
+        SELECT w.root, edge.next, w.depth + 1, w.score * edge.weight,
+            w.path || edge.next, edge.relationship_type
+        FROM walk w
+        CROSS JOIN LATERAL (
+            SELECT to_entity_id AS next, relationship_type, weight
+            FROM shared.relationships
+            WHERE from_entity_id = w.entity_id
+          UNION ALL
+            SELECT from_entity_id, relationship_type, weight
+            FROM shared.relationships
+            WHERE :both AND to_entity_id = w.entity_id
+        ) edge
+        WHERE w.depth < :hops
+            AND NOT edge.next = ANY(w.path)
+            AND edge.weight >= :min_weight
+            AND (
+                CAST(:types AS text[]) IS NULL
+                OR edge.relationship_type = ANY(CAST(:types AS text[]))
+            )
+    ),
+    best AS (
+        SELECT DISTINCT ON (root, entity_id) *
+        FROM walk
+        WHERE depth > 0
+        ORDER BY root, entity_id, score DESC, depth
+    ),
+    ranked AS (
+        SELECT *, row_number() OVER (
+            PARTITION BY root ORDER BY score DESC, depth
+        ) AS rank
+        FROM best
+    )
+    SELECT
+        r.root, e.id, e.name, e.type, e.metadata, e.source_system,
+        e.created_at, e.updated_at, r.depth, r.score AS weight, r.path, r.via
+    FROM ranked r
+    JOIN shared.entities e ON e.id = r.entity_id
+    WHERE r.rank <= :limit
+    ORDER BY r.root, r.rank
+    """
+)
+
+
+def _row(row) -> Dict[str, Any]:
+    entity = {
+        "id": str(row.id),
+        "name": row.name,
+        "type": row.type,
+        "metadata": row.metadata or {},
+        "source_system": row.source_system,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+        "updated_at": row.updated_at.isoformat() if row.updated_at else None,
+    }
+    if "score" in row._fields:
+        entity["score"] = float(row.score)
+    return entity
+
+
+def _neighbor(row) -> Dict[str, Any]:
+    neighbor = _row(row)
+    neighbor.update(
+        depth=row.depth,
+        weight=float(row.weight),
+        relationship_type=row.via,
+        path=[str(entity_id) for entity_id in row.path],
+    )
+    return neighbor
+
+
+class NeighborhoodCache:
+    """LRU of recent k-hop neighborhoods with a TTL
+
+    Hot entities are looked up on every chat turn; their neighborhoods
+    change only when the graph is (bulk) loaded, so a short TTL keeps them
+    fresh enough without any invalidation traffic.
+    """
+
+    def __init__(self, max_entries: int = 10_000, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple, Tuple[float, List[Dict[str, Any]]]]" = (
+            OrderedDict()
+        )
+
+    def get(self, key: Tuple) -> Optional[List[Dict[str, Any]]]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Tuple, neighbors: List[Dict[str, Any]]):
+        self._entries[key] = (time.monotonic() + self.ttl, neighbors)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class EntityStore:
+    """SQL access to ``shared.entities`` (created by ``scripts/init.sql``)"""
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        ef_search: Optional[int] = None,
+        cache: Optional[NeighborhoodCache] = None,
+    ):
+        self.engine = engine
+        self.ef_search = ef_search
+        self.cache = cache
+        self.index = vector_index.managed_indexes()["idx_entities_embedding"]
+
+    @classmethod
+    async def create(cls, engine: AsyncEngine) -> "EntityStore":
+        cache = None
+        if settings.GRAPH_CACHE_TTL > 0:
+            cache = NeighborhoodCache(
+                max_entries=settings.GRAPH_CACHE_MAX_ENTRIES,
+                ttl=settings.GRAPH_CACHE_TTL,
+            )
+        store = cls(engine, ef_search=settings.ENTITY_HNSW_EF_SEARCH, cache=cache)
+        # Rebuilding a large index is an operator decision, so only report
+        await vector_index.check(engine, store.index)
+        return store
+
+    async def search(
+        self,
+        embedding: Sequence[float],
+        limit: int = 10,
+        ef_search: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Nearest entities by cosine similarity through the HNSW index
+
+        ``ef_search`` trades latency for recall per query; it should be at
+        least ``limit``, as HNSW returns at most ``ef_search`` rows.
+        """
+        ef_search = ef_search or self.ef_search
+        async with self.engine.begin() as conn:
+            if ef_search is not None:
+                await vector_index.set_ef_search(conn, max(ef_search, limit))
+            result = await conn.execute(
+                _SEARCH, {"embedding": vector_literal(embedding), "limit": limit}
+            )
+            return [_row(row) for row in result]
+
+    async def neighborhood(
+        self,
+        entity_id: str,
+        hops: int = 2,
+        relationship_types: Optional[Sequence[str]] = None,
+        min_weight: float = 0.0,
+        limit: int = 50,
+        both_directions: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """Entities within ``hops`` of ``entity_id``, strongest paths first"""
+        neighborhoods = await self.neighborhoods(
+            [entity_id], hops, relationship_types, min_weight, limit, both_directions
+        )
+        return neighborhoods[entity_id]
+
+    async def neighborhoods(
+        self,
+        entity_ids: Sequence[str],
+        hops: int = 2,
+        relationship_types: Optional[Sequence[str]] = None,
+        min_weight: float = 0.0,
+        limit: int = 50,
+        both_directions: bool = False,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """Neighborhoods of several entities, uncached ones in one query
+
+        Unknown or malformed ids map to an empty list.
+        """
+        types = sorted(set(relationship_types)) if relationship_types else None
+        params = (hops, tuple(types or ()), min_weight, limit, both_directions)
+        results: Dict[str, List[Dict[str, Any]]] = {}
+        missing: Dict[str, str] = {}  # canonical id -> id as given
+        for entity_id in dict.fromkeys(entity_ids):
+            try:
+                canonical = str(uuid.UUID(entity_id))
+            except ValueError:
+                results[entity_id] = []
+                continue
+            cached = self.cache.get((canonical, *params)) if self.cache else None
+            if cached is None:
+                missing[canonical] = entity_id
+            else:
+                results[entity_id] = cached
+
+        if missing:
+            fetched: Dict[str, List[Dict[str, Any]]] = {e: [] for e in missing}
+            async with self.engine.connect() as conn:
+                result = await conn.execute(
+                    _NEIGHBORHOOD,
+                    {
+                        "roots": list(missing),
+                        "hops": hops,
+                        "types": types,
+                        "min_weight": min_weight,
+                        "limit": limit,
+                        "both": both_directions,
+                    },
+                )
+                for row in result:
+                    fetched[str(row.root)].append(_neighbor(row))
+            for canonical, neighbors in fetched.items():
+                if self.cache is not None:
+                    self.cache.set((canonical, *params), neighbors)
+                results[missing[canonical]] = neighbors
+        return results
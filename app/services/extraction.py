@@ -0,0 +1,346 @@
+"""Background memory extraction from finished chat turns"""
+import asyncio
+import json
+import logging
+import os
+import re
+import socket
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+ServiceGetter = Callable[[str], Awaitable[Any]]
+
+EXTRACTION_PROMPT = (
+    "Extract durable facts about the user from the conversation below: "
+    "preferences, personal details, projects, decisions and instructions "
+    "they want remembered. Ignore anything only relevant to this one "
+    "exchange. Reply with only a JSON array of short, self-contained "
+    'statements such as ["Prefers Python over Go"], or [] if there is '
+    "nothing worth remembering."
+)
+
+_REMEMBER = re.compile(r"^\s*(?:please\s+)?remember\s+(?:that\s+)?(.+)", re.I | re.S)
+
+
+@dataclass
+class Turn:
+    """New messages of one conversation, queued for extraction"""
+
+    user_id: str
+    messages: List[Dict[str, str]]
+
+    def dumps(self) -> Dict[str, str]:
+        return {"user_id": self.user_id, "messages": json.dumps(self.messages)}
+
+    @classmethod
+    def loads(cls, fields: Dict[str, str]) -> "Turn":
+        return cls(fields["user_id"], json.loads(fields["messages"]))
+
+
+def transcript(turns: List[Turn], max_chars: int) -> str:
+    """Newest-last transcript of a user's turns, keeping the newest text"""
+    lines = []
+    used = 0
+    for message in reversed([m for turn in turns for m in turn.messages]):
+        content = message.get("content") or ""
+        # IDE clients paste whole files; a message's head says what it is
+        line = f"{message['role']}: {content[:2000]}"
+        if used + len(line) > max_chars:
+            break
+        lines.append(line)
+        used += len(line) + 1
+    return "\n".join(reversed(lines))
+
+
+def parse_statements(content: str) -> List[str]:
+    """The JSON array of strings in an extraction reply, or []"""
+    start, end = content.find("["), content.rfind("]")
+    if start < 0 or end < start:
+        return []
+    try:
+        statements = json.loads(content[start : end + 1])
+    except ValueError:
+        return []
+    if not isinstance(statements, list):
+        return []
+    return [s.strip() for s in statements if isinstance(s, str) and s.strip()]
+
+
+def explicit_statements(turns: List[Turn]) -> List[str]:
+    """"Remember that ..." requests, used when no LLM is configured"""
+    statements = []
+    for turn in turns:
+        for message in turn.messages:
+            if message["role"] != "user":
+                continue
+            match = _REMEMBER.match(message.get("content") or "")
+            if match:
+                statements.append(match.group(1).strip().rstrip("."))
+    return statements
+
+
+class MemoryExtractor:
+    """Turns finished conversations into memories off the response path
+
+    ``submit`` never waits on I/O: turns go to a Redis stream (shared by
+    all pods through a consumer group) or, without Redis or when it is
+    unreachable, to a bounded in-process queue. A worker reads batches,
+    groups them per user, runs one extraction per user and stores the
+    results with ``MemoryService.add_many``, skipping near-duplicates of
+    what the user already has. Stream entries are only acknowledged once
+    their user's memories are stored; the rest stay pending and are claimed
+    again every ``claim_idle`` seconds.
+    """
+
+    def __init__(
+        self,
+        get: ServiceGetter,
+        redis=None,
+        model: str = "synapse",
+        stream: str = "synapse:memory:extract",
+        group: str = "extractors",
+        batch_size: int = 32,
+        batch_wait: float = 1.0,
+        concurrency: int = 4,
+        max_chars: int = 8000,
+        dedupe_threshold: Optional[float] = 0.9,
+        queue_size: int = 10_000,
+        claim_idle: float = 60.0,
+    ):
+        self.get = get
+        self.redis = redis
+        self.model = model
+        self.stream = stream
+        self.group = group
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_chars = max_chars
+        self.dedupe_threshold = dedupe_threshold
+        self.queue_size = queue_size
+        self.claim_idle = claim_idle
+        self.queued = 0
+        self.dropped = 0
+        self.extracted = 0
+        self.stored = 0
+        self.failed = 0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._publishing: Set[asyncio.Task] = set()
+        self._workers: List[asyncio.Task] = []
+
+    def submit(self, user_id: str, messages: List[Dict[str, str]]):
+        """Queue a turn's new messages; returns immediately"""
+        if not messages:
+            return
+        turn = Turn(user_id, messages)
+        if self.redis is None:
+            self._enqueue(turn)
+            return
+        task = asyncio.ensure_future(self._publish(turn))
+        self._publishing.add(task)
+        task.add_done_callback(self._publishing.discard)
+
+    def _enqueue(self, turn: Turn):
+        try:
+            self._queue.put_nowait(turn)
+            self.queued += 1
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(
+                f"Memory extraction queue full, dropped turn for {turn.user_id}"
+            )
+
+    async def _publish(self, turn: Turn):
+        try:
+            await self.redis.xadd(
+                self.stream, turn.dumps(), maxlen=self.queue_size, approximate=True
+            )
+            self.queued += 1
+        except Exception as e:
+            logger.warning(f"Memory extraction stream unavailable, queued locally: {e}")
+            self._enqueue(turn)
+
+    def start(self):
+        """Start the local queue worker and, with Redis, the stream worker"""
+        self._workers.append(asyncio.ensure_future(self._consume_local()))
+        if self.redis is not None:
+            self._workers.append(asyncio.ensure_future(self._consume_stream()))
+
+    async def _consume_local(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self.process(batch)
+
+    async def _consume_stream(self):
+        backoff = self.batch_wait
+        while True:
+            try:
+                await self.redis.xgroup_create(
+                    self.stream, self.group, id="0", mkstream=True
+                )
+                break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if "BUSYGROUP" in str(e):
+                    break
+                logger.warning(f"Memory extraction group not created, retrying: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+        # Entries left pending by a consumer that died are taken over first
+        loop = asyncio.get_running_loop()
+        await self._claim_pending()
+        next_claim = loop.time() + self.claim_idle
+        while True:
+            if loop.time() >= next_claim:
+                await self._claim_pending()
+                next_claim = loop.time() + self.claim_idle
+            try:
+                response = await self.redis.xreadgroup(
+                    self.group,
+                    self.consumer,
+                    {self.stream: ">"},
+                    count=self.batch_size,
+                    block=int(self.batch_wait * 1000),
+                )
+                for _, entries in response or []:
+                    await self._process_entries(entries)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Memory extraction stream read failed: {e}")
+                await asyncio.sleep(self.batch_wait)
+
+    async def _claim_pending(self):
+        """Process entries pending for longer than ``claim_idle``, from any consumer"""
+        start = "0-0"
+        while True:
+            try:
+                start, entries, *_ = await self.redis.xautoclaim(
+                    self.stream,
+                    self.group,
+                    self.consumer,
+                    int(self.claim_idle * 1000),
+                    start_id=start,
+                    count=self.batch_size,
+                )
+                await self._process_entries(entries)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Memory extraction claim failed: {e}")
+                await asyncio.sleep(self.batch_wait)
+                return
+            if start in ("0-0", b"0-0"):
+                return
+
+    async def _process_entries(self, entries: List[Tuple[str, Dict[str, str]]]):
+        if not entries:
+            return
+        turns = []
+        users: Dict[str, Optional[str]] = {}
+        for entry_id, fields in entries:
+            try:
+                turn = Turn.loads(fields)
+            except (KeyError, ValueError) as e:
+                logger.warning(f"Skipping malformed memory extraction entry: {e}")
+                users[entry_id] = None
+                continue
+            turns.append(turn)
+            users[entry_id] = turn.user_id
+        failed = await self.process(turns)
+        # Entries of users whose extraction failed stay pending for a retry
+        done = [i for i, user_id in users.items() if user_id not in failed]
+        if done:
+            await self.redis.xack(self.stream, self.group, *done)
+
+    async def process(self, turns: List[Turn]) -> Set[str]:
+        """Extract and store memories for a batch of turns, per user
+
+        Returns the users whose extraction failed.
+        """
+        by_user: Dict[str, List[Turn]] = defaultdict(list)
+        for turn in turns:
+            by_user[turn.user_id].append(turn)
+        results = await asyncio.gather(
+            *(self._extract_user(user_id, turns) for user_id, turns in by_user.items()),
+            return_exceptions=True,
+        )
+        return {
+            user_id
+            for user_id, result in zip(by_user, results)
+            if isinstance(result, Exception)
+        }
+
+    async def _extract_user(self, user_id: str, turns: List[Turn]):
+        async with self._semaphore:
+            started = time.perf_counter()
+            try:
+                statements = await self.extract(turns)
+                self.extracted += len(statements)
+                if not statements:
+                    return
+                memory = await self.get("memory")
+                stored = await memory.add_many(
+                    user_id,
+                    statements,
+                    type="extracted",
+                    dedupe_threshold=self.dedupe_threshold,
+                )
+                self.stored += len(stored)
+                logger.debug(
+                    f"Stored {len(stored)}/{len(statements)} memories for {user_id} "
+                    f"in {time.perf_counter() - started:.2f}s"
+                )
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"Memory extraction failed for {user_id}: {e}")
+                raise
+
+    async def extract(self, turns: List[Turn]) -> List[str]:
+        """Statements worth remembering from a user's turns"""
+        llm = await self.get("llm")
+        if llm is None or not llm.providers:
+            return explicit_statements(turns)
+        completion = await llm.complete(
+            self.model,
+            [
+                {"role": "system", "content": EXTRACTION_PROMPT},
+                {"role": "user", "content": transcript(turns, self.max_chars)},
+            ],
+            temperature=0,
+            max_tokens=512,
+        )
+        return parse_statements(completion.content)
+
+    async def close(self):
+        for task in [*self._workers, *self._publishing]:
+            task.cancel()
+        await asyncio.gather(*self._workers, *self._publishing, return_exceptions=True)
+        self._workers.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self.queued,
+            "pending_local": self._queue.qsize(),
+            "dropped": self.dropped,
+            "extracted": self.extracted,
+            "stored": self.stored,
+            "failed": self.failed,
+        }
@@ -0,0 +1,286 @@
+"""Streaming document ingestion pipeline"""
+import asyncio
+import codecs
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.services.embedding_cache import EmbeddingCache
+
+logger = logging.getLogger(__name__)
+
+BatchEmbedder = Callable[[List[str]], Awaitable[List[List[float]]]]
+ChunkWriter = Callable[[List[Tuple[int, str, List[float]]]], Awaitable[None]]
+
+# Formats that need a binary parser, which is not part of this pipeline yet
+BINARY_EXTENSIONS = {
+    ".pdf",
+    ".docx",
+    ".doc",
+    ".xlsx",
+    ".pptx",
+    ".zip",
+    ".png",
+    ".jpg",
+}
+
+_END = object()
+
+
+class _Failure:
+    """Carries a stage exception across a queue"""
+
+    __slots__ = ("error",)
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+async def buffered(source: AsyncIterator[Any], maxsize: int) -> AsyncIterator[Any]:
+    """Run ``source`` in its own task behind a bounded queue
+
+    This lets adjacent stages overlap (reading while embedding while
+    inserting) while capping how many items can pile up between them.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    async def pump():
+        try:
+            async for item in source:
+                await queue.put(item)
+        except Exception as e:
+            await queue.put(_Failure(e))
+        else:
+            await queue.put(_END)
+
+    task = asyncio.ensure_future(pump())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _END:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+async def read_blocks(
+    path: str, block_size: int, progress: Optional[Callable[[int], None]] = None
+) -> AsyncIterator[bytes]:
+    """Read a file in fixed-size blocks without blocking the event loop"""
+    with open(path, "rb") as f:
+        while True:
+            block = await asyncio.to_thread(f.read, block_size)
+            if not block:
+                return
+            if progress is not None:
+                progress(len(block))
+            yield block
+
+
+async def decode_text(blocks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Incrementally decode UTF-8, never splitting a multi-byte character"""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    async for block in blocks:
+        text = decoder.decode(block)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+async def split_chunks(
+    pieces: AsyncIterator[str], size: int, overlap: int
+) -> AsyncIterator[str]:
+    """Split streamed text into ~``size`` character chunks with overlap
+
+    Chunks end on whitespace where possible. Only one chunk plus one
+    incoming piece is ever buffered.
+    """
+    if not 0 <= overlap < size // 2:
+        raise ValueError("chunk overlap must be smaller than half the chunk size")
+
+    buffer = ""
+    carried = 0  # leading characters of buffer already emitted as overlap
+    async for piece in pieces:
+        buffer += piece
+        while len(buffer) >= size:
+            cut = buffer.rfind(" ", size // 2, size)
+            if cut == -1:
+                cut = buffer.rfind("\n", size // 2, size)
+            if cut == -1:
+                cut = size
+            chunk = buffer[:cut].strip()
+            if chunk:
+                yield chunk
+            carried = min(overlap, cut)
+            buffer = buffer[cut - carried :]
+    tail = buffer.strip()
+    if tail and len(buffer) > carried:
+        yield tail
+
+
+async def embed_batches(
+    chunks: AsyncIterator[str], embed: BatchEmbedder, batch_size: int
+) -> AsyncIterator[List[Tuple[int, str, List[float]]]]:
+    """Group chunks into batches and embed each batch with one call"""
+    index = 0
+    batch: List[str] = []
+
+    async def flush(texts: List[str], start: int):
+        vectors = await embed(texts)
+        return [
+            (start + i, text, vector)
+            for i, (text, vector) in enumerate(zip(texts, vectors))
+        ]
+
+    async for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            yield await flush(batch, index)
+            index += len(batch)
+            batch = []
+    if batch:
+        yield await flush(batch, index)
+
+
+@dataclass
+class FileProgress:
+    """Per-file ingestion progress"""
+
+    filename: str
+    document_id: str
+    size: int = 0
+    bytes_read: int = 0
+    chunks_embedded: int = 0
+    chunks_cached: int = 0  # embeddings served from the embedding cache
+    chunks_inserted: int = 0
+    status: str = "queued"
+    error: Optional[str] = None
+
+
+@dataclass
+class IngestionJob:
+    """A batch of uploaded files processed in the background"""
+
+    id: str
+    user_id: Optional[str] = None
+    status: str = "queued"
+    files: List[FileProgress] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        job = asdict(self)
+        embedded = sum(f.chunks_embedded for f in self.files)
+        cached = sum(f.chunks_cached for f in self.files)
+        job["embedding_cache"] = {
+            "hits": cached,
+            "misses": embedded - cached,
+            "hit_ratio": cached / embedded if embedded else 0.0,
+        }
+        return job
+
+
+class JobRegistry:
+    """Recent ingestion jobs, mirrored to Redis so any pod can report them"""
+
+    def __init__(self, redis=None, max_jobs: int = 1000, ttl: int = 86400):
+        self.redis = redis
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self._jobs: Dict[str, IngestionJob] = {}
+
+    def add(self, job: IngestionJob):
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.max_jobs:
+            del self._jobs[next(iter(self._jobs))]
+
+    async def publish(self, job: IngestionJob):
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(
+                f"synapse:ingest:{job.id}", json.dumps(job.to_dict()), ex=self.ttl
+            )
+        except Exception as e:
+            logger.warning(f"Failed to publish ingestion job {job.id}: {e}")
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if self.redis is not None:
+            raw = await self.redis.get(f"synapse:ingest:{job_id}")
+            if raw is not None:
+                return json.loads(raw)
+        return None
+
+
+class IngestionPipeline:
+    """read → decode → chunk → embed → insert, one bounded stage per step
+
+    Memory per upload is bounded by the block size, chunk size and queue
+    depths, independent of file size.
+    """
+
+    def __init__(
+        self,
+        embed: BatchEmbedder,
+        block_size: int = 64 * 1024,
+        chunk_size: int = 2000,
+        chunk_overlap: int = 200,
+        embed_batch_size: int = 32,
+        queue_size: int = 4,
+        cache: Optional[EmbeddingCache] = None,
+    ):
+        self.embed = embed
+        self.cache = cache
+        self.block_size = block_size
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.embed_batch_size = embed_batch_size
+        self.queue_size = queue_size
+
+    async def run(
+        self,
+        path: str,
+        progress: FileProgress,
+        write: ChunkWriter,
+        on_progress: Optional[Callable[[], Awaitable[None]]] = None,
+    ):
+        extension = os.path.splitext(progress.filename)[1].lower()
+        if extension in BINARY_EXTENSIONS:
+            raise ValueError(f"Unsupported document format: {extension}")
+
+        def read(n: int):
+            progress.bytes_read += n
+
+        async def embed(texts: List[str]) -> List[List[float]]:
+            if self.cache is None:
+                return await self.embed(texts)
+            vectors, hits = await self.cache.embed(texts, self.embed)
+            progress.chunks_cached += hits
+            return vectors
+
+        blocks = buffered(read_blocks(path, self.block_size, read), self.queue_size)
+        chunks = buffered(
+            split_chunks(decode_text(blocks), self.chunk_size, self.chunk_overlap),
+            self.queue_size * self.embed_batch_size,
+        )
+        batches = buffered(
+            embed_batches(chunks, embed, self.embed_batch_size), self.queue_size
+        )
+        async for batch in batches:
+            progress.chunks_embedded += len(batch)
+            await write(batch)
+            progress.chunks_inserted += len(batch)
+            if on_progress is not None:
+                await on_progress()
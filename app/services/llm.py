@@ -0,0 +1,488 @@
+"""LLM provider engine with pooled HTTP clients"""
+import asyncio
+import contextlib
+import importlib.util
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.lazy import lazy_import
+from app.core.metrics import metrics
+from app.services.router import HedgeBudget, ModelRouter
+
+httpx = lazy_import("httpx")
+
+logger = logging.getLogger(__name__)
+
+# Checked without importing; h2 is only loaded when a client is created
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class ProviderError(Exception):
+    """Raised when an upstream provider call fails"""
+
+    def __init__(self, provider: str, message: str, status_code: int = 502):
+        super().__init__(f"{provider}: {message}")
+        self.provider = provider
+        self.status_code = status_code
+
+
+@dataclass
+class Completion:
+    """Normalized non-streaming completion result"""
+
+    content: str
+    model: str
+    finish_reason: str = "stop"
+    usage: Dict[str, int] = field(default_factory=dict)
+
+
+def _usage(prompt_tokens: int, completion_tokens: int) -> Dict[str, int]:
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+class Provider:
+    """Base class for an upstream LLM provider
+
+    Each provider owns one ``httpx.AsyncClient`` for the lifetime of the
+    process, so keep-alive connections, HTTP/2 streams and the TLS context
+    are reused across completions instead of being set up per request.
+    A semaphore caps the number of in-flight calls to the provider.
+    """
+
+    name = "base"
+    default_model = ""
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: Optional[str] = None,
+        max_concurrency: int = 64,
+        max_connections: int = 100,
+        timeout: float = 120.0,
+        http2: bool = True,
+        transport: Optional["httpx.AsyncBaseTransport"] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._latency = {
+            kind: metrics.upstream_latency(self.name, kind)
+            for kind in ("complete", "stream")
+        }
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=self.headers(),
+            timeout=httpx.Timeout(timeout, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=300.0,
+            ),
+            http2=http2 and HTTP2_AVAILABLE,
+            transport=transport,
+        )
+
+    @property
+    def in_flight(self) -> int:
+        """Number of calls currently holding a concurrency slot"""
+        return self.max_concurrency - self._semaphore._value
+
+    def headers(self) -> Dict[str, str]:
+        """Static headers sent with every request"""
+        return {}
+
+    @contextlib.contextmanager
+    def _transport_errors(self):
+        """Raise connection failures and timeouts as ``ProviderError``"""
+        try:
+            yield
+        except httpx.TimeoutException as e:
+            message = f"timed out ({type(e).__name__})"
+            raise ProviderError(self.name, message, 504) from e
+        except httpx.HTTPError as e:
+            message = f"unreachable ({type(e).__name__})"
+            raise ProviderError(self.name, message) from e
+
+    async def complete(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> Completion:
+        """Run a non-streaming completion"""
+        async with self._semaphore:
+            started = time.perf_counter()
+            with self._transport_errors():
+                response = await self.client.post(
+                    self.path,
+                    json=self.payload(model, messages, temperature, max_tokens, False),
+                )
+            self._raise_for_status(response)
+            self._latency["complete"].observe(time.perf_counter() - started)
+            return self.parse(model, response.json())
+
+    async def stream(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> AsyncIterator[str]:
+        """Stream content deltas for a completion"""
+        async with self._semaphore:
+            started = time.perf_counter()
+            with self._transport_errors():
+                async with self.client.stream(
+                    "POST",
+                    self.path,
+                    json=self.payload(model, messages, temperature, max_tokens, True),
+                ) as response:
+                    if response.status_code >= 400:
+                        await response.aread()
+                        self._raise_for_status(response)
+                    async for line in response.aiter_lines():
+                        delta, done = self.parse_line(line)
+                        if delta:
+                            if started is not None:
+                                now = time.perf_counter()
+                                self._latency["stream"].observe(now - started)
+                                started = None
+                            yield delta
+                        if done:
+                            break
+
+    async def embed(self, model: str, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of texts with one upstream call"""
+        raise ProviderError(self.name, "embeddings are not supported", 400)
+
+    async def close(self):
+        await self.client.aclose()
+
+    def _raise_for_status(self, response: "httpx.Response"):
+        if response.status_code >= 400:
+            raise ProviderError(
+                self.name,
+                f"HTTP {response.status_code}: {response.text[:200]}",
+                status_code=response.status_code,
+            )
+
+    # Provider-specific wire format
+    path = ""
+
+    def payload(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        stream: bool,
+    ) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def parse(self, model: str, data: Dict[str, Any]) -> Completion:
+        raise NotImplementedError
+
+    def parse_line(self, line: str) -> Tuple[Optional[str], bool]:
+        """Return (content delta, done) for one line of a streamed response"""
+        raise NotImplementedError
+
+
+class OpenAIProvider(Provider):
+    """OpenAI chat completions API (also used for compatible servers)"""
+
+    name = "openai"
+    default_model = "gpt-4o-mini"
+    path = "/chat/completions"
+
+    def headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+
+    def payload(self, model, messages, temperature, max_tokens, stream):
+        payload: Dict[str, Any] = {
+            "model": model,
+            "messages": messages,
+            "stream": stream,
+        }
+        if temperature is not None:
+            payload["temperature"] = temperature
+        if max_tokens is not None:
+            payload["max_tokens"] = max_tokens
+        return payload
+
+    def parse(self, model, data):
+        choice = data["choices"][0]
+        usage = data.get("usage") or {}
+        return Completion(
+            content=choice["message"].get("content") or "",
+            model=data.get("model", model),
+            finish_reason=choice.get("finish_reason") or "stop",
+            usage=_usage(
+                usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+            ),
+        )
+
+    def parse_line(self, line):
+        if not line.startswith("data:"):
+            return None, False
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return None, True
+        choices = json.loads(data).get("choices") or [{}]
+        return (choices[0].get("delta") or {}).get("content"), False
+
+    async def embed(self, model, texts):
+        async with self._semaphore:
+            with self._transport_errors():
+                response = await self.client.post(
+                    "/embeddings", json={"model": model, "input": texts}
+                )
+            self._raise_for_status(response)
+        data = sorted(response.json()["data"], key=lambda item: item["index"])
+        return [item["embedding"] for item in data]
+
+
+class OpenRouterProvider(OpenAIProvider):
+    """OpenRouter, an OpenAI-compatible aggregator"""
+
+    name = "openrouter"
+    default_model = "openai/gpt-4o-mini"
+
+
+class AnthropicProvider(Provider):
+    """Anthropic messages API"""
+
+    name = "anthropic"
+    default_model = "claude-3-5-haiku-latest"
+    path = "/v1/messages"
+    api_version = "2023-06-01"
+
+    def headers(self) -> Dict[str, str]:
+        headers = {"anthropic-version": self.api_version}
+        if self.api_key:
+            headers["x-api-key"] = self.api_key
+        return headers
+
+    def payload(self, model, messages, temperature, max_tokens, stream):
+        system = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+        payload: Dict[str, Any] = {
+            "model": model,
+            "messages": [m for m in messages if m["role"] != "system"],
+            "max_tokens": max_tokens or 4096,
+            "stream": stream,
+        }
+        if system:
+            payload["system"] = system
+        if temperature is not None:
+            payload["temperature"] = temperature
+        return payload
+
+    def parse(self, model, data):
+        usage = data.get("usage") or {}
+        stop_reason = data.get("stop_reason")
+        return Completion(
+            content="".join(
+                block.get("text", "")
+                for block in data.get("content", [])
+                if block.get("type") == "text"
+            ),
+            model=data.get("model", model),
+            finish_reason="length" if stop_reason == "max_tokens" else "stop",
+            usage=_usage(usage.get("input_tokens", 0), usage.get("output_tokens", 0)),
+        )
+
+    def parse_line(self, line):
+        if not line.startswith("data:"):
+            return None, False
+        event = json.loads(line[5:].strip())
+        if event.get("type") == "content_block_delta":
+            return event.get("delta", {}).get("text"), False
+        return None, event.get("type") == "message_stop"
+
+
+class OllamaProvider(Provider):
+    """Local Ollama server"""
+
+    name = "ollama"
+    default_model = "llama3"
+    path = "/api/chat"
+
+    def payload(self, model, messages, temperature, max_tokens, stream):
+        options: Dict[str, Any] = {}
+        if temperature is not None:
+            options["temperature"] = temperature
+        if max_tokens is not None:
+            options["num_predict"] = max_tokens
+        return {
+            "model": model,
+            "messages": messages,
+            "stream": stream,
+            "options": options,
+        }
+
+    def parse(self, model, data):
+        return Completion(
+            content=data.get("message", {}).get("content", ""),
+            model=data.get("model", model),
+            finish_reason="length" if data.get("done_reason") == "length" else "stop",
+            usage=_usage(data.get("prompt_eval_count", 0), data.get("eval_count", 0)),
+        )
+
+    def parse_line(self, line):
+        if not line.strip():
+            return None, False
+        data = json.loads(line)
+        return data.get("message", {}).get("content"), bool(data.get("done"))
+
+    async def embed(self, model, texts):
+        async with self._semaphore:
+            with self._transport_errors():
+                response = await self.client.post(
+                    "/api/embed", json={"model": model, "input": texts}
+                )
+            self._raise_for_status(response)
+        return response.json()["embeddings"]
+
+
+class LLMService:
+    """Registry of configured providers and model resolution
+
+    Models are addressed as ``<provider>/<model>`` (``openai/gpt-4o``,
+    ``openrouter/anthropic/claude-3-opus``). Virtual models with a route
+    (``synapse-fast``, ``synapse-smart``) go through the ``ModelRouter``;
+    anything else goes to the default provider's default model.
+    """
+
+    def __init__(
+        self,
+        providers: List[Provider],
+        routes: Optional[Dict[str, List[str]]] = None,
+        **router_options,
+    ):
+        self.providers: Dict[str, Provider] = {p.name: p for p in providers}
+        self.default = providers[0] if providers else None
+        self.router = ModelRouter(self.providers, routes, **router_options)
+
+    @classmethod
+    def from_settings(cls, **kwargs) -> "LLMService":
+        """Build providers for every configured API key"""
+        limits = settings.LLM_CONCURRENCY_LIMITS
+        candidates = [
+            (OpenAIProvider, settings.OPENAI_API_KEY, settings.OPENAI_BASE_URL),
+            (
+                AnthropicProvider,
+                settings.ANTHROPIC_API_KEY,
+                settings.ANTHROPIC_BASE_URL,
+            ),
+            (
+                OpenRouterProvider,
+                settings.OPENROUTER_API_KEY,
+                settings.OPENROUTER_BASE_URL,
+            ),
+        ]
+        providers: List[Provider] = []
+        for provider_cls, api_key, base_url in candidates:
+            if api_key:
+                providers.append(
+                    provider_cls(
+                        base_url,
+                        api_key,
+                        max_concurrency=limits.get(
+                            provider_cls.name, settings.LLM_MAX_CONCURRENCY
+                        ),
+                        max_connections=settings.LLM_MAX_CONNECTIONS,
+                        timeout=settings.LLM_TIMEOUT,
+                        http2=settings.LLM_HTTP2,
+                        **kwargs,
+                    )
+                )
+        if settings.OLLAMA_HOST:
+            providers.append(
+                OllamaProvider(
+                    settings.OLLAMA_HOST,
+                    max_concurrency=limits.get(
+                        OllamaProvider.name, settings.LLM_MAX_CONCURRENCY
+                    ),
+                    max_connections=settings.LLM_MAX_CONNECTIONS,
+                    timeout=settings.LLM_TIMEOUT,
+                    http2=False,
+                    **kwargs,
+                )
+            )
+        return cls(
+            providers,
+            routes=settings.LLM_ROUTES,
+            hedge_routes=settings.LLM_HEDGE_ROUTES,
+            hedge_delay=settings.LLM_HEDGE_DELAY,
+            hedge_completions=settings.LLM_HEDGE_COMPLETIONS,
+            budget=HedgeBudget(settings.LLM_HEDGE_BUDGET, settings.LLM_HEDGE_BURST),
+            max_error_rate=settings.LLM_ROUTE_MAX_ERROR_RATE,
+            window=settings.LLM_ROUTE_WINDOW,
+        )
+
+    def resolve(self, model: str) -> Tuple[Provider, str]:
+        """Map a requested model name to a provider and upstream model"""
+        prefix, _, rest = model.partition("/")
+        if rest and prefix in self.providers:
+            return self.providers[prefix], rest
+        if model in self.router.routes:
+            return self.router.candidates(model)[0]
+        if self.default is None:
+            raise ProviderError("synapse", "no LLM providers configured", 503)
+        return self.default, self.default.default_model
+
+    async def complete(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> Completion:
+        if model in self.router.routes:
+            return await self.router.complete(
+                model, messages, temperature, max_tokens
+            )
+        provider, upstream_model = self.resolve(model)
+        return await provider.complete(
+            upstream_model, messages, temperature, max_tokens
+        )
+
+    async def stream(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> AsyncIterator[str]:
+        if model in self.router.routes:
+            deltas = self.router.stream(model, messages, temperature, max_tokens)
+        else:
+            provider, upstream_model = self.resolve(model)
+            deltas = provider.stream(upstream_model, messages, temperature, max_tokens)
+        async for delta in deltas:
+            yield delta
+
+    async def embed(
+        self, texts: List[str], model: Optional[str] = None
+    ) -> List[List[float]]:
+        """Embed texts with ``model`` (``<provider>/<model>``)"""
+        model = model or settings.EMBEDDING_MODEL
+        prefix, _, upstream_model = model.partition("/")
+        provider = self.providers.get(prefix)
+        if provider is None or not upstream_model:
+            raise ProviderError(
+                "synapse", f"embedding provider for {model!r} is not configured", 503
+            )
+        return await provider.embed(upstream_model, texts)
+
+    async def close(self):
+        await asyncio.gather(*(p.close() for p in self.providers.values()))
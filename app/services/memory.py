@@ -0,0 +1,448 @@
+"""Native memory store on pgvector in the mem0 schema"""
+import asyncio
+import json
+import logging
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.core.lazy import lazy_import
+from app.services import vector_index
+from app.services.memory_cache import MemoryCache, normalize
+
+np = lazy_import("numpy")
+
+logger = logging.getLogger(__name__)
+
+BatchEmbedder = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+_COLUMNS = "id, user_id, content, type, metadata, created_at"
+
+
+def vector_literal(vector: Sequence[float]) -> str:
+    """Format a vector as a pgvector text literal"""
+    return "[" + ",".join(format(float(x), ".7g") for x in vector) + "]"
+
+
+def memory_schema(
+    dimensions: int,
+    partitions: int,
+    m: int = 16,
+    ef_construction: int = 64,
+) -> List[str]:
+    """DDL for ``mem0.memories``
+
+    The table is hash-partitioned on ``user_id`` so every per-user query
+    prunes to one partition, and the primary key ``(user_id, id)`` doubles
+    as the per-user lookup index. The HNSW index is created on the parent
+    and inherited by every partition.
+    """
+    statements = [
+        f"""
+        CREATE TABLE IF NOT EXISTS mem0.memories (
+            id UUID NOT NULL DEFAULT uuid_generate_v4(),
+            user_id TEXT NOT NULL,
+            content TEXT NOT NULL,
+            type TEXT NOT NULL DEFAULT 'general',
+            metadata JSONB NOT NULL DEFAULT '{{}}',
+            embedding vector({dimensions}) NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (user_id, id)
+        ) PARTITION BY HASH (user_id)
+        """
+    ]
+    statements += [
+        f"""
+        CREATE TABLE IF NOT EXISTS mem0.memories_p{i}
+            PARTITION OF mem0.memories
+            FOR VALUES WITH (MODULUS {partitions}, REMAINDER {i})
+        """
+        for i in range(partitions)
+    ]
+    statements += [
+        """
+        CREATE INDEX IF NOT EXISTS idx_memories_user_created
+            ON mem0.memories (user_id, created_at DESC)
+        """,
+        f"""
+        CREATE INDEX IF NOT EXISTS idx_memories_embedding
+            ON mem0.memories USING hnsw (embedding vector_cosine_ops)
+            WITH (m = {m}, ef_construction = {ef_construction})
+        """,
+    ]
+    return statements
+
+
+# Exact top-k over the user's own rows: the MATERIALIZED CTE pins the plan
+# to the (user_id, id) primary key, so the HNSW index is never used with a
+# post-filter that would discard most candidates from other users.
+_SEARCH_EXACT = text(
+    f"""
+    WITH candidates AS MATERIALIZED (
+        SELECT {_COLUMNS}, embedding
+        FROM mem0.memories
+        WHERE user_id = :user_id
+    )
+    SELECT {_COLUMNS}, 1 - (embedding <=> CAST(:embedding AS vector)) AS score
+    FROM candidates
+    ORDER BY embedding <=> CAST(:embedding AS vector)
+    LIMIT :limit
+    """
+)
+
+# Approximate top-k through the HNSW index, for users with very large stores
+_SEARCH_ANN = text(
+    f"""
+    SELECT {_COLUMNS}, 1 - (embedding <=> CAST(:embedding AS vector)) AS score
+    FROM mem0.memories
+    WHERE user_id = :user_id
+    ORDER BY embedding <=> CAST(:embedding AS vector)
+    LIMIT :limit
+    """
+)
+
+_LIST = text(
+    f"""
+    SELECT {_COLUMNS}
+    FROM mem0.memories
+    WHERE user_id = :user_id
+    ORDER BY created_at DESC
+    LIMIT :limit
+    """
+)
+
+_LOAD = text(
+    f"""
+    SELECT {_COLUMNS}, embedding::text AS embedding
+    FROM mem0.memories
+    WHERE user_id = :user_id
+    ORDER BY created_at DESC
+    LIMIT :limit
+    """
+)
+
+_INSERT = text(
+    f"""
+    INSERT INTO mem0.memories (user_id, content, type, metadata, embedding)
+    VALUES (
+        :user_id, :content, :type, CAST(:metadata AS jsonb),
+        CAST(:embedding AS vector)
+    )
+    RETURNING {_COLUMNS}
+    """
+)
+
+# One round trip for a batch; rows come back in no guaranteed order
+_INSERT_MANY = text(
+    f"""
+    INSERT INTO mem0.memories (user_id, content, type, metadata, embedding)
+    SELECT
+        :user_id, t.content, :type, CAST(:metadata AS jsonb),
+        CAST(t.embedding AS vector)
+    FROM unnest(CAST(:contents AS text[]), CAST(:embeddings AS text[]))
+        AS t(content, embedding)
+    RETURNING {_COLUMNS}
+    """
+)
+
+_DELETE = text(
+    """
+    DELETE FROM mem0.memories
+    WHERE user_id = :user_id AND id = CAST(:memory_id AS uuid)
+    RETURNING id
+    """
+)
+
+
+def _row(row) -> Dict[str, Any]:
+    memory = {
+        "id": str(row.id),
+        "user_id": row.user_id,
+        "content": row.content,
+        "type": row.type,
+        "metadata": row.metadata or {},
+        "created_at": row.created_at.isoformat(),
+    }
+    if "score" in row._fields:
+        memory["score"] = float(row.score)
+    return memory
+
+
+class MemoryStore:
+    """SQL access to ``mem0.memories``"""
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        dimensions: int = 1536,
+        partitions: int = 16,
+        search_mode: str = "exact",
+        ef_search: Optional[int] = None,
+    ):
+        if search_mode not in ("exact", "ann"):
+            raise ValueError(f"Unknown memory search mode: {search_mode!r}")
+        self.engine = engine
+        self.dimensions = dimensions
+        self.partitions = partitions
+        self.search_mode = search_mode
+        self.ef_search = ef_search
+
+    async def create_schema(self, m: int = 16, ef_construction: int = 64):
+        async with self.engine.begin() as conn:
+            for statement in memory_schema(
+                self.dimensions, self.partitions, m, ef_construction
+            ):
+                await conn.execute(text(statement))
+
+    def _check(self, embedding: Sequence[float]):
+        if len(embedding) != self.dimensions:
+            raise ValueError(
+                f"Expected {self.dimensions}-d embedding, got {len(embedding)}"
+            )
+
+    async def add(
+        self,
+        user_id: str,
+        content: str,
+        embedding: Sequence[float],
+        type: str = "general",
+        metadata: Optional[dict] = None,
+    ) -> Dict[str, Any]:
+        self._check(embedding)
+        async with self.engine.begin() as conn:
+            result = await conn.execute(
+                _INSERT,
+                {
+                    "user_id": user_id,
+                    "content": content,
+                    "type": type,
+                    "metadata": json.dumps(metadata or {}),
+                    "embedding": vector_literal(embedding),
+                },
+            )
+            return _row(result.one())
+
+    async def add_many(
+        self,
+        user_id: str,
+        contents: List[str],
+        embeddings: List[Sequence[float]],
+        type: str = "general",
+        metadata: Optional[dict] = None,
+    ) -> List[Dict[str, Any]]:
+        """Insert several memories in one statement, in ``contents`` order"""
+        for embedding in embeddings:
+            self._check(embedding)
+        async with self.engine.begin() as conn:
+            result = await conn.execute(
+                _INSERT_MANY,
+                {
+                    "user_id": user_id,
+                    "contents": contents,
+                    "type": type,
+                    "metadata": json.dumps(metadata or {}),
+                    "embeddings": [vector_literal(e) for e in embeddings],
+                },
+            )
+            rows = {row.content: _row(row) for row in result}
+        return [rows[content] for content in contents]
+
+    async def search(
+        self, user_id: str, embedding: Sequence[float], limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """Top-k memories for a user by cosine similarity, in one query
+
+        In ``ann`` mode the index scan is post-filtered to the user, so
+        ``ef_search`` should leave room for other users' rows.
+        """
+        self._check(embedding)
+        ann = self.search_mode == "ann"
+        async with self.engine.begin() as conn:
+            if ann and self.ef_search is not None:
+                await vector_index.set_ef_search(conn, max(self.ef_search, limit))
+            result = await conn.execute(
+                _SEARCH_ANN if ann else _SEARCH_EXACT,
+                {
+                    "user_id": user_id,
+                    "embedding": vector_literal(embedding),
+                    "limit": limit,
+                },
+            )
+            return [_row(row) for row in result]
+
+    async def load(
+        self, user_id: str, max_memories: int
+    ) -> Optional[Tuple[List[Dict[str, Any]], "np.ndarray"]]:
+        """All of a user's memories with embeddings, newest first
+
+        Returns None if the user has more than ``max_memories`` memories.
+        """
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                _LOAD, {"user_id": user_id, "limit": max_memories + 1}
+            )
+            rows = result.all()
+        if len(rows) > max_memories:
+            return None
+        matrix = np.empty((len(rows), self.dimensions), dtype=np.float32)
+        for i, row in enumerate(rows):
+            matrix[i] = np.fromstring(row.embedding[1:-1], dtype=np.float32, sep=",")
+        return [_row(row) for row in rows], matrix
+
+    async def list(self, user_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Most recent memories for a user"""
+        async with self.engine.connect() as conn:
+            result = await conn.execute(_LIST, {"user_id": user_id, "limit": limit})
+            return [_row(row) for row in result]
+
+    async def delete(self, user_id: str, memory_id: str) -> bool:
+        try:
+            uuid.UUID(memory_id)
+        except ValueError:
+            return False
+        async with self.engine.begin() as conn:
+            result = await conn.execute(
+                _DELETE, {"user_id": user_id, "memory_id": memory_id}
+            )
+            return result.first() is not None
+
+
+class MemoryService:
+    """User memories: embedding plus storage, fronted by an optional hot cache"""
+
+    def __init__(
+        self,
+        store: MemoryStore,
+        embed: BatchEmbedder,
+        cache: Optional[MemoryCache] = None,
+    ):
+        self.store = store
+        self.embed = embed
+        self.cache = cache
+
+    @classmethod
+    async def create(
+        cls, engine: AsyncEngine, embed: BatchEmbedder, redis=None
+    ) -> "MemoryService":
+        store = MemoryStore(
+            engine,
+            dimensions=settings.EMBEDDING_DIMENSIONS,
+            partitions=settings.MEMORY_PARTITIONS,
+            search_mode=settings.MEMORY_SEARCH_MODE,
+            ef_search=settings.MEMORY_HNSW_EF_SEARCH,
+        )
+        await store.create_schema(
+            m=settings.MEMORY_HNSW_M,
+            ef_construction=settings.MEMORY_HNSW_EF_CONSTRUCTION,
+        )
+        cache = None
+        if settings.MEMORY_CACHE_ENABLED:
+            cache = MemoryCache(
+                lambda user_id: store.load(user_id, settings.MEMORY_CACHE_MAX_PER_USER),
+                max_users=settings.MEMORY_CACHE_MAX_USERS,
+                max_bytes=settings.MEMORY_CACHE_MAX_BYTES,
+                redis=redis,
+                max_per_user=settings.MEMORY_CACHE_MAX_PER_USER,
+            )
+            cache.start()
+        return cls(store, embed, cache)
+
+    async def add(
+        self,
+        user_id: str,
+        content: str,
+        type: str = "general",
+        metadata: Optional[dict] = None,
+    ) -> Dict[str, Any]:
+        [embedding] = await self.embed([content])
+        memory = await self.store.add(user_id, content, embedding, type, metadata)
+        if self.cache is not None:
+            await self.cache.added(user_id, memory, embedding)
+        return memory
+
+    async def add_many(
+        self,
+        user_id: str,
+        contents: List[str],
+        type: str = "general",
+        metadata: Optional[dict] = None,
+        dedupe_threshold: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """Embed and store several memories with one call each way
+
+        With ``dedupe_threshold``, a candidate whose cosine similarity to an
+        existing memory or to an earlier candidate reaches the threshold is
+        skipped. Returns the memories actually stored.
+        """
+        contents = list(dict.fromkeys(c.strip() for c in contents if c.strip()))
+        if not contents:
+            return []
+        embeddings = await self.embed(contents)
+        if dedupe_threshold is not None:
+            keep = await self._novel(user_id, embeddings, dedupe_threshold)
+            contents = [contents[i] for i in keep]
+            embeddings = [embeddings[i] for i in keep]
+            if not contents:
+                return []
+        memories = await self.store.add_many(
+            user_id, contents, embeddings, type, metadata
+        )
+        if self.cache is not None:
+            await self.cache.added_many(user_id, memories, embeddings)
+        return memories
+
+    async def _novel(
+        self, user_id: str, embeddings: List[Sequence[float]], threshold: float
+    ) -> List[int]:
+        """Indexes of embeddings not within ``threshold`` of anything known"""
+        vectors = normalize(embeddings)
+        entry = await self.cache.get(user_id) if self.cache is not None else None
+        if entry is not None:
+            nearest = [
+                float((entry.matrix @ v).max()) if entry.memories else -1.0
+                for v in vectors
+            ]
+        else:
+            matches = await asyncio.gather(
+                *(self.store.search(user_id, e, 1) for e in embeddings)
+            )
+            nearest = [m[0]["score"] if m else -1.0 for m in matches]
+
+        keep: List[int] = []
+        for i, vector in enumerate(vectors):
+            if nearest[i] >= threshold:
+                continue
+            if keep and float((vectors[keep] @ vector).max()) >= threshold:
+                continue
+            keep.append(i)
+        return keep
+
+    async def search(
+        self, user_id: str, query: str, limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        [embedding] = await self.embed([query])
+        if self.cache is not None:
+            entry = await self.cache.get(user_id)
+            if entry is not None:
+                return entry.search(normalize(embedding), limit)
+        return await self.store.search(user_id, embedding, limit)
+
+    async def list(self, user_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        if self.cache is not None:
+            entry = await self.cache.get(user_id)
+            if entry is not None:
+                return entry.memories[:limit]
+        return await self.store.list(user_id, limit)
+
+    async def delete(self, user_id: str, memory_id: str) -> bool:
+        deleted = await self.store.delete(user_id, memory_id)
+        if deleted and self.cache is not None:
+            await self.cache.removed(user_id, memory_id)
+        return deleted
+
+    async def close(self):
+        if self.cache is not None:
+            await self.cache.close()
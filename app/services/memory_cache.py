@@ -0,0 +1,268 @@
+"""Per-user hot memory cache with cross-pod invalidation"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.core.lazy import lazy_import
+from app.services.coalescing import SingleFlight
+
+np = lazy_import("numpy")
+
+logger = logging.getLogger(__name__)
+
+# Returns (memories newest first, embedding matrix) or None if too large to cache
+Loader = Callable[[str], Awaitable[Optional[Tuple[List[Dict[str, Any]], Any]]]]
+
+
+def normalize(vectors: "np.ndarray") -> "np.ndarray":
+    """L2-normalize rows so a dot product is cosine similarity"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class UserMemories:
+    """A user's memories, newest first, with a row-aligned embedding matrix"""
+
+    __slots__ = ("memories", "matrix")
+
+    def __init__(self, memories: List[Dict[str, Any]], matrix: "np.ndarray"):
+        self.memories = memories
+        self.matrix = matrix
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes
+
+    def search(self, query: "np.ndarray", limit: int) -> List[Dict[str, Any]]:
+        """Top-k by cosine similarity with one matrix-vector product"""
+        if not self.memories:
+            return []
+        scores = self.matrix @ query
+        if limit < len(scores):
+            top = np.argpartition(-scores, limit)[:limit]
+            top = top[np.argsort(-scores[top])]
+        else:
+            top = np.argsort(-scores)
+        return [{**self.memories[i], "score": float(scores[i])} for i in top]
+
+    def add(self, memory: Dict[str, Any], vector: "np.ndarray"):
+        self.memories.insert(0, memory)
+        self.matrix = np.vstack([vector[np.newaxis, :], self.matrix])
+
+    def remove(self, memory_id: str):
+        for index, memory in enumerate(self.memories):
+            if memory["id"] == memory_id:
+                del self.memories[index]
+                self.matrix = np.delete(self.matrix, index, axis=0)
+                return
+
+
+class MemoryCache:
+    """Size-bounded LRU of per-user memories fronting the memory store
+
+    Misses load the user's whole memory set once (concurrent misses for the
+    same user share the load). Users too large to cache are remembered for
+    ``oversized_ttl`` seconds, or until their memories change, so they go
+    straight to Postgres instead of being loaded again. Local writes update
+    the cached entry in place, dropping it once it outgrows ``max_per_user``
+    or the byte budget; every write is also published on Redis so other
+    pods evict their copy and reload it on next use.
+    """
+
+    def __init__(
+        self,
+        loader: Loader,
+        max_users: int = 10_000,
+        max_bytes: int = 256 * 1024 * 1024,
+        redis=None,
+        channel: str = "synapse:memory:invalidate",
+        oversized_ttl: float = 300.0,
+        max_per_user: Optional[int] = None,
+    ):
+        self.loader = loader
+        self.max_users = max_users
+        self.max_bytes = max_bytes
+        self.max_per_user = max_per_user
+        self.redis = redis
+        self.channel = channel
+        self.oversized_ttl = oversized_ttl
+        self.pod_id = uuid.uuid4().hex
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, UserMemories]" = OrderedDict()
+        self._oversized: "OrderedDict[str, float]" = OrderedDict()  # -> expiry
+        # Users being loaded -> False once invalidated, making the load stale
+        self._loading: Dict[str, bool] = {}
+        self._loads = SingleFlight()
+        self._listener: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, user_id: str) -> Optional[UserMemories]:
+        """Cached memories for a user, loading them on a miss
+
+        Returns None when the user has too many memories to cache.
+        """
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry
+        expires = self._oversized.get(user_id)
+        if expires is not None:
+            if expires > time.monotonic():
+                return None
+            del self._oversized[user_id]
+        self.misses += 1
+        return await self._loads.do(user_id, lambda: self._load(user_id))
+
+    async def _load(self, user_id: str) -> Optional[UserMemories]:
+        self._loading[user_id] = True
+        try:
+            loaded = await self.loader(user_id)
+        finally:
+            # An invalidation that raced with the load makes this copy stale
+            fresh = self._loading.pop(user_id)
+        if loaded is None:
+            if fresh:
+                self._mark_oversized(user_id)
+            return None
+        memories, vectors = loaded
+        entry = UserMemories(memories, normalize(vectors))
+        if fresh:
+            self._store(user_id, entry)
+        return entry
+
+    def _store(self, user_id: str, entry: UserMemories):
+        if entry.nbytes > self.max_bytes:
+            return
+        self.evict(user_id)
+        self._entries[user_id] = entry
+        self.bytes += entry.nbytes
+        while len(self._entries) > self.max_users or self.bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= evicted.nbytes
+
+    def _mark_oversized(self, user_id: str):
+        self._oversized[user_id] = time.monotonic() + self.oversized_ttl
+        while len(self._oversized) > self.max_users:
+            self._oversized.popitem(last=False)
+
+    def _invalidate(self, user_id: str):
+        if user_id in self._loading:
+            self._loading[user_id] = False
+        self._oversized.pop(user_id, None)
+
+    def evict(self, user_id: str):
+        self._invalidate(user_id)
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self.bytes -= entry.nbytes
+
+    async def added(
+        self, user_id: str, memory: Dict[str, Any], vector: Sequence[float]
+    ):
+        """Write-through after a memory was stored"""
+        await self.added_many(user_id, [memory], [vector])
+
+    async def added_many(
+        self,
+        user_id: str,
+        memories: List[Dict[str, Any]],
+        vectors: Sequence[Sequence[float]],
+    ):
+        """Write-through after several memories were stored, one invalidation"""
+        entry = self._entries.get(user_id)
+        self._invalidate(user_id)
+        if entry is not None:
+            self.bytes -= entry.nbytes
+            for memory, vector in zip(memories, normalize(vectors)):
+                entry.add(memory, vector)
+            too_many = self.max_per_user is not None and (
+                len(entry.memories) > self.max_per_user
+            )
+            if too_many or entry.nbytes > self.max_bytes:
+                # Same limits as a load: serve this user from Postgres
+                del self._entries[user_id]
+                self._mark_oversized(user_id)
+            else:
+                self._entries.move_to_end(user_id)
+                self.bytes += entry.nbytes
+                while self.bytes > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self.bytes -= evicted.nbytes
+        await self._publish(user_id)
+
+    async def removed(self, user_id: str, memory_id: str):
+        """Invalidate after a memory was deleted"""
+        entry = self._entries.get(user_id)
+        self._invalidate(user_id)
+        if entry is not None:
+            self.bytes -= entry.nbytes
+            entry.remove(memory_id)
+            self.bytes += entry.nbytes
+        await self._publish(user_id)
+
+    async def _publish(self, user_id: str):
+        if self.redis is None:
+            return
+        try:
+            await self.redis.publish(self.channel, f"{self.pod_id}:{user_id}")
+        except Exception as e:
+            logger.warning(f"Memory cache invalidation publish failed: {e}")
+
+    def handle_invalidation(self, message: str):
+        pod_id, _, user_id = message.partition(":")
+        if pod_id != self.pod_id:
+            self.evict(user_id)
+
+    def start(self):
+        """Start listening for invalidations from other pods"""
+        if self.redis is not None and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        backoff = 1.0
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                backoff = 1.0
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.handle_invalidation(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Anything may have changed while we were deaf
+                logger.warning(f"Memory cache invalidation listener failed: {e}")
+                self._entries.clear()
+                self._oversized.clear()
+                self.bytes = 0
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                await pubsub.aclose()
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "users": len(self._entries),
+            "oversized_users": len(self._oversized),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,437 @@
+"""Document store and ingestion on pgvector in the r2r schema"""
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.services.embedding_cache import EmbeddingCache
+from app.services.ingestion import (
+    BatchEmbedder,
+    FileProgress,
+    IngestionJob,
+    IngestionPipeline,
+    JobRegistry,
+)
+from app.services.memory import vector_literal
+
+logger = logging.getLogger(__name__)
+
+
+def document_schema(
+    dimensions: int, m: int = 16, ef_construction: int = 64
+) -> List[str]:
+    """DDL for ``r2r.documents`` and ``r2r.chunks``
+
+    Chunks carry a generated ``tsvector`` with a GIN index for the keyword
+    leg of hybrid search and an HNSW index for the vector leg.
+    """
+    return [
+        """
+        CREATE TABLE IF NOT EXISTS r2r.documents (
+            id UUID PRIMARY KEY,
+            filename TEXT NOT NULL,
+            user_id TEXT,
+            size BIGINT NOT NULL DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'processing',
+            chunk_count INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            metadata JSONB NOT NULL DEFAULT '{}',
+            created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+        )
+        """,
+        f"""
+        CREATE TABLE IF NOT EXISTS r2r.chunks (
+            id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+            document_id UUID NOT NULL
+                REFERENCES r2r.documents(id) ON DELETE CASCADE,
+            chunk_index INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            embedding vector({dimensions}) NOT NULL,
+            content_tsv tsvector
+                GENERATED ALWAYS AS (to_tsvector('english', content)) STORED,
+            UNIQUE (document_id, chunk_index)
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_chunks_content_tsv
+            ON r2r.chunks USING gin (content_tsv)
+        """,
+        f"""
+        CREATE INDEX IF NOT EXISTS idx_chunks_embedding
+            ON r2r.chunks USING hnsw (embedding vector_cosine_ops)
+            WITH (m = {m}, ef_construction = {ef_construction})
+        """,
+    ]
+
+
+_INSERT_DOCUMENT = text(
+    """
+    INSERT INTO r2r.documents (id, filename, user_id, size, metadata)
+    VALUES (
+        CAST(:id AS uuid), :filename, :user_id, :size, CAST(:metadata AS jsonb)
+    )
+    """
+)
+
+_INSERT_CHUNK = text(
+    """
+    INSERT INTO r2r.chunks (document_id, chunk_index, content, embedding)
+    VALUES (
+        CAST(:document_id AS uuid), :chunk_index, :content,
+        CAST(:embedding AS vector)
+    )
+    ON CONFLICT (document_id, chunk_index) DO NOTHING
+    """
+)
+
+_FINISH_DOCUMENT = text(
+    """
+    UPDATE r2r.documents
+    SET status = :status, chunk_count = :chunk_count, error = :error,
+        updated_at = NOW()
+    WHERE id = CAST(:id AS uuid)
+    """
+)
+
+# Hybrid retrieval in one round trip: the vector leg (HNSW) and the
+# full-text leg (GIN) each take their top candidates, which are fused by
+# reciprocal rank, score = sum over legs of 1 / (rrf_k + rank). Only
+# shared documents and the caller's own are searched.
+_HYBRID_SEARCH = text(
+    """
+    WITH visible AS (
+        SELECT id FROM r2r.documents
+        WHERE user_id IS NULL OR user_id = :user_id
+    ),
+    vector_leg AS (
+        SELECT id, row_number() OVER (ORDER BY distance) AS rank
+        FROM (
+            SELECT id, embedding <=> CAST(:embedding AS vector) AS distance
+            FROM r2r.chunks
+            WHERE document_id IN (SELECT id FROM visible)
+            ORDER BY distance
+            LIMIT :candidates
+        ) nearest
+    ),
+    text_leg AS (
+        SELECT id, row_number() OVER (ORDER BY relevance DESC) AS rank
+        FROM (
+            SELECT id, ts_rank_cd(content_tsv, query) AS relevance
+            FROM r2r.chunks, websearch_to_tsquery('english', :query) AS query
+            WHERE content_tsv @@ query
+                AND document_id IN (SELECT id FROM visible)
+            ORDER BY relevance DESC
+            LIMIT :candidates
+        ) matches
+    ),
+    fused AS (
+        SELECT
+            id,
+            COALESCE(1.0 / (:rrf_k + v.rank), 0)
+                + COALESCE(1.0 / (:rrf_k + t.rank), 0) AS score,
+            v.rank AS vector_rank,
+            t.rank AS text_rank
+        FROM vector_leg v
+        FULL OUTER JOIN text_leg t USING (id)
+        ORDER BY score DESC
+        LIMIT :limit
+    )
+    SELECT
+        c.id, c.document_id, d.filename, c.chunk_index, c.content,
+        f.score, f.vector_rank, f.text_rank
+    FROM fused f
+    JOIN r2r.chunks c ON c.id = f.id
+    JOIN r2r.documents d ON d.id = c.document_id
+    ORDER BY f.score DESC
+    """
+)
+
+_GET_DOCUMENT = text(
+    """
+    SELECT id, filename, user_id, size, status, chunk_count, error
+    FROM r2r.documents
+    WHERE id = CAST(:id AS uuid)
+    """
+)
+
+_DELETE_DOCUMENT = text(
+    """
+    DELETE FROM r2r.documents
+    WHERE id = CAST(:id AS uuid)
+    RETURNING id
+    """
+)
+
+
+class RAGService:
+    """Document ingestion and storage
+
+    Uploads are spooled to temporary files block by block (the request's
+    ``UploadFile`` objects are closed once the response is sent), then
+    ingested by a background job through :class:`IngestionPipeline`, so a
+    worker never holds more than a few blocks and batches of any file.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        pipeline: IngestionPipeline,
+        jobs: Optional[JobRegistry] = None,
+        max_concurrent_jobs: int = 4,
+        spool_dir: Optional[str] = None,
+    ):
+        self.engine = engine
+        self.pipeline = pipeline
+        self.embed = pipeline.embed
+        self.jobs = jobs or JobRegistry()
+        self.spool_dir = spool_dir
+        self._slots = asyncio.Semaphore(max_concurrent_jobs)
+        self._tasks: Set[asyncio.Task] = set()
+
+    @classmethod
+    async def create(
+        cls, engine: AsyncEngine, embed: BatchEmbedder, redis=None
+    ) -> "RAGService":
+        async with engine.begin() as conn:
+            for statement in document_schema(
+                settings.EMBEDDING_DIMENSIONS,
+                m=settings.RAG_HNSW_M,
+                ef_construction=settings.RAG_HNSW_EF_CONSTRUCTION,
+            ):
+                await conn.execute(text(statement))
+        cache = None
+        if settings.EMBEDDING_CACHE_ENABLED:
+            cache = EmbeddingCache(
+                settings.EMBEDDING_MODEL,
+                engine=engine if settings.EMBEDDING_CACHE_POSTGRES else None,
+                redis=redis,
+                max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+                ttl=settings.EMBEDDING_CACHE_TTL,
+            )
+            await cache.create_schema(settings.EMBEDDING_DIMENSIONS)
+        pipeline = IngestionPipeline(
+            embed,
+            block_size=settings.INGEST_BLOCK_SIZE,
+            chunk_size=settings.INGEST_CHUNK_SIZE,
+            chunk_overlap=settings.INGEST_CHUNK_OVERLAP,
+            embed_batch_size=settings.INGEST_EMBED_BATCH,
+            queue_size=settings.INGEST_QUEUE_SIZE,
+            cache=cache,
+        )
+        return cls(
+            engine,
+            pipeline,
+            jobs=JobRegistry(redis),
+            max_concurrent_jobs=settings.INGEST_MAX_CONCURRENT_JOBS,
+            spool_dir=settings.INGEST_SPOOL_DIR,
+        )
+
+    async def submit(
+        self, files: List[Any], user_id: Optional[str] = None
+    ) -> IngestionJob:
+        """Spool uploaded files and start ingesting them in the background"""
+        job = IngestionJob(id=str(uuid.uuid4()), user_id=user_id)
+        spooled: List[Tuple[FileProgress, str]] = []
+        try:
+            for file in files:
+                path, size = await self._spool(file)
+                progress = FileProgress(
+                    filename=file.filename or "upload",
+                    document_id=str(uuid.uuid4()),
+                    size=size,
+                )
+                job.files.append(progress)
+                spooled.append((progress, path))
+        except BaseException:
+            for _, path in spooled:
+                _remove(path)
+            raise
+
+        self.jobs.add(job)
+        await self.jobs.publish(job)
+        task = asyncio.create_task(self._run(job, spooled))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _spool(self, file) -> Tuple[str, int]:
+        block_size = self.pipeline.block_size
+        fd, path = tempfile.mkstemp(prefix="synapse-upload-", dir=self.spool_dir)
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    block = await file.read(block_size)
+                    if not block:
+                        break
+                    size += len(block)
+                    await asyncio.to_thread(out.write, block)
+        except BaseException:
+            _remove(path)
+            raise
+        return path, size
+
+    async def _run(
+        self, job: IngestionJob, spooled: List[Tuple[FileProgress, str]]
+    ):
+        try:
+            async with self._slots:
+                job.status = "processing"
+                await self.jobs.publish(job)
+                for progress, path in spooled:
+                    try:
+                        await self._ingest(job, progress, path)
+                    finally:
+                        _remove(path)
+            failed = any(progress.status == "failed" for progress, _ in spooled)
+            job.status = "failed" if failed else "completed"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            raise
+        except Exception as e:
+            logger.error(f"Ingestion job {job.id} failed: {e}")
+            job.status = "failed"
+        finally:
+            for _, path in spooled:
+                _remove(path)
+            job.finished_at = time.time()
+            await self.jobs.publish(job)
+
+    async def _ingest(self, job: IngestionJob, progress: FileProgress, path: str):
+        progress.status = "processing"
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                _INSERT_DOCUMENT,
+                {
+                    "id": progress.document_id,
+                    "filename": progress.filename,
+                    "user_id": job.user_id,
+                    "size": progress.size,
+                    "metadata": json.dumps({"job_id": job.id}),
+                },
+            )
+
+        async def write(batch):
+            async with self.engine.begin() as conn:
+                await conn.execute(
+                    _INSERT_CHUNK,
+                    [
+                        {
+                            "document_id": progress.document_id,
+                            "chunk_index": index,
+                            "content": content,
+                            "embedding": vector_literal(vector),
+                        }
+                        for index, content, vector in batch
+                    ],
+                )
+
+        async def publish():
+            await self.jobs.publish(job)
+
+        try:
+            await self.pipeline.run(path, progress, write, publish)
+            progress.status = "indexed"
+        except Exception as e:
+            logger.error(f"Ingestion of {progress.filename} failed: {e}")
+            progress.status = "failed"
+            progress.error = str(e)
+
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                _FINISH_DOCUMENT,
+                {
+                    "id": progress.document_id,
+                    "status": progress.status,
+                    "chunk_count": progress.chunks_inserted,
+                    "error": progress.error,
+                },
+            )
+
+    async def job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.jobs.get(job_id)
+
+    async def search(
+        self, query: str, limit: int = 10, user_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Hybrid keyword + vector search over chunks, fused by reciprocal rank
+
+        Searches shared documents and those uploaded by ``user_id``.
+        """
+        [embedding] = await self.embed([query])
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                _HYBRID_SEARCH,
+                {
+                    "query": query,
+                    "user_id": user_id,
+                    "embedding": vector_literal(embedding),
+                    "candidates": max(limit, settings.RAG_SEARCH_CANDIDATES),
+                    "rrf_k": settings.RAG_RRF_K,
+                    "limit": limit,
+                },
+            )
+            return [
+                {
+                    "chunk_id": str(row.id),
+                    "document_id": str(row.document_id),
+                    "filename": row.filename,
+                    "chunk_index": row.chunk_index,
+                    "content": row.content,
+                    "score": float(row.score),
+                    "vector_rank": row.vector_rank,
+                    "text_rank": row.text_rank,
+                }
+                for row in result
+            ]
+
+    async def document(self, document_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            uuid.UUID(document_id)
+        except ValueError:
+            return None
+        async with self.engine.connect() as conn:
+            result = await conn.execute(_GET_DOCUMENT, {"id": document_id})
+            row = result.first()
+        if row is None:
+            return None
+        return {
+            "document_id": str(row.id),
+            "filename": row.filename,
+            "user_id": row.user_id,
+            "size": row.size,
+            "status": row.status,
+            "chunk_count": row.chunk_count,
+            "error": row.error,
+        }
+
+    async def delete_document(self, document_id: str) -> bool:
+        try:
+            uuid.UUID(document_id)
+        except ValueError:
+            return False
+        async with self.engine.begin() as conn:
+            result = await conn.execute(_DELETE_DOCUMENT, {"id": document_id})
+            return result.first() is not None
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+def _remove(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
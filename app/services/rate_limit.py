@@ -0,0 +1,216 @@
+"""Token-bucket rate limiting and per-user stream concurrency caps"""
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Iterable, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Shared bucket in a Redis hash, refilled with the server clock. Grants up to
+# ARGV[3] tokens and returns {granted, seconds until one token is available}.
+_TAKE = """
+if redis.replicate_commands then redis.replicate_commands() end
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local want = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local granted = math.min(want, math.floor(tokens))
+tokens = tokens - granted
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+local wait = 0
+if granted == 0 then wait = (1 - tokens) / rate end
+return {granted, tostring(wait)}
+"""
+
+
+@dataclass(frozen=True)
+class Limit:
+    """Sustained ``rate`` in requests per second, bursting to ``burst``"""
+
+    rate: float
+    burst: float
+
+    @classmethod
+    def per_minute(cls, requests: float, burst: float) -> "Limit":
+        return cls(requests / 60.0, burst)
+
+
+class TokenBucket:
+    """In-process token bucket"""
+
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+    def take(self, limit: Limit, now: float) -> float:
+        """Take one token; returns 0 or the seconds until one is available"""
+        refill = (now - self.updated) * limit.rate
+        self.tokens = min(limit.burst, self.tokens + refill)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / limit.rate
+
+
+class Lease:
+    """Tokens taken from the shared bucket, spent locally until they expire"""
+
+    __slots__ = ("tokens", "expires", "size")
+
+    def __init__(self, size: int = 1):
+        self.tokens = 0
+        self.expires = 0.0
+        self.size = size
+
+
+class RateLimiter:
+    """Token buckets per (kind, identity), e.g. per API key and per user
+
+    Without Redis every process keeps its own buckets. With Redis the
+    bucket is shared by all pods, but requests are served from a local
+    lease of tokens taken from it, so only about one request per lease
+    makes a Redis round trip. A lease that is used up
+    within ``lease_ttl`` doubles for next time (up to ``max_lease``); one
+    that expires unused halves. If Redis fails, the local buckets take
+    over and Redis is left alone for ``redis_retry`` seconds, so an
+    outage costs one failed round trip per window rather than per request.
+    """
+
+    def __init__(
+        self,
+        limits: Dict[str, Limit],
+        redis=None,
+        max_lease: int = 10,
+        lease_ttl: float = 1.0,
+        max_entries: int = 100_000,
+        prefix: str = "synapse:rl:",
+        redis_retry: float = 5.0,
+    ):
+        self.limits = limits
+        self.redis = redis
+        self.max_lease = max_lease
+        self.lease_ttl = lease_ttl
+        self.max_entries = max_entries
+        self.prefix = prefix
+        self.redis_retry = redis_retry
+        self.allowed = 0
+        self.limited = 0
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._leases: "OrderedDict[str, Lease]" = OrderedDict()
+        self._redis_down_until = 0.0
+        self._script = redis.register_script(_TAKE) if redis is not None else None
+
+    async def check(self, identities: Iterable[Tuple[str, str]]) -> float:
+        """Take a token from every (kind, identity) bucket
+
+        Returns 0 if the request may proceed, else the seconds to wait
+        before retrying. Kinds without a configured limit are ignored.
+        """
+        for kind, identity in identities:
+            limit = self.limits.get(kind)
+            if limit is None:
+                continue
+            key = f"{kind}:{identity}"
+            if self._script is None:
+                wait = self._take_local(key, limit)
+            else:
+                wait = await self._take_shared(key, limit)
+            if wait > 0:
+                self.limited += 1
+                return wait
+        self.allowed += 1
+        return 0.0
+
+    def _take_local(self, key: str, limit: Limit) -> float:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(limit.burst, now)
+            if len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take(limit, now)
+
+    async def _take_shared(self, key: str, limit: Limit) -> float:
+        now = time.monotonic()
+        if now < self._redis_down_until:
+            return self._take_local(key, limit)
+        lease = self._leases.get(key)
+        if lease is None:
+            lease = self._leases[key] = Lease()
+            if len(self._leases) > self.max_entries:
+                self._leases.popitem(last=False)
+        elif lease.tokens >= 1 and lease.expires > now:
+            lease.tokens -= 1
+            return 0.0
+
+        if lease.expires > now:
+            lease.size = min(self.max_lease, lease.size * 2)
+        elif lease.tokens >= 1:
+            lease.size = max(1, lease.size // 2)
+        try:
+            granted, wait = await self._script(
+                keys=[self.prefix + key], args=[limit.rate, limit.burst, lease.size]
+            )
+        except Exception as e:
+            logger.warning(f"Rate limit store unavailable, limiting locally: {e}")
+            self._redis_down_until = now + self.redis_retry
+            return self._take_local(key, limit)
+
+        granted = int(granted)
+        lease.expires = now + self.lease_ttl
+        if granted == 0:
+            lease.tokens = 0
+            return max(float(wait), 0.001)
+        lease.tokens = granted - 1
+        return 0.0
+
+    def stats(self) -> Dict[str, int]:
+        return {"allowed": self.allowed, "limited": self.limited}
+
+
+class StreamLimiter:
+    """Caps concurrent streamed completions per user in this process"""
+
+    def __init__(self, max_streams: int):
+        self.max_streams = max_streams
+        self.active: Dict[str, int] = {}
+
+    def acquire(self, user_id: str) -> bool:
+        if self.max_streams <= 0:
+            return True
+        active = self.active.get(user_id, 0)
+        if active >= self.max_streams:
+            return False
+        self.active[user_id] = active + 1
+        return True
+
+    def release(self, user_id: str):
+        if self.max_streams <= 0:
+            return
+        active = self.active.get(user_id, 0) - 1
+        if active > 0:
+            self.active[user_id] = active
+        else:
+            self.active.pop(user_id, None)
+
+    async def hold(
+        self, user_id: str, events: AsyncIterator[str]
+    ) -> AsyncIterator[str]:
+        """Pass ``events`` through, releasing the user's slot once they end"""
+        try:
+            async for event in events:
+                yield event
+        finally:
+            self.release(user_id)
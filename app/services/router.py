@@ -0,0 +1,386 @@
+"""Latency-aware routing of virtual models to upstream providers"""
+import asyncio
+import functools
+import logging
+import time
+from collections import deque
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+if TYPE_CHECKING:
+    from app.services.llm import Completion, Provider
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+Backend = Tuple["Provider", str]
+
+
+def backend_name(backend: Backend) -> str:
+    provider, model = backend
+    return f"{provider.name}/{model}"
+
+
+def percentile(ordered: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence"""
+    index = min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))
+    return ordered[index]
+
+
+class LatencyStats:
+    """Rolling time-to-first-token and error rate of one backend
+
+    Only the last ``window`` seconds count, so a backend that was slow or
+    failing is sampled again once its history has aged out.
+    """
+
+    def __init__(self, window: float = 300.0, max_samples: int = 1_000):
+        self.window = window
+        self._latencies: Deque[Tuple[float, float]] = deque(maxlen=max_samples)
+        self._outcomes: Deque[Tuple[float, bool]] = deque(maxlen=max_samples)
+        self._sorted: Optional[List[float]] = None
+
+    def _expire(self):
+        horizon = time.monotonic() - self.window
+        while self._latencies and self._latencies[0][0] < horizon:
+            self._latencies.popleft()
+            self._sorted = None
+        while self._outcomes and self._outcomes[0][0] < horizon:
+            self._outcomes.popleft()
+
+    def record(self, latency: float):
+        now = time.monotonic()
+        self._latencies.append((now, latency))
+        self._outcomes.append((now, True))
+        self._sorted = None
+
+    def record_error(self):
+        self._outcomes.append((time.monotonic(), False))
+
+    @property
+    def samples(self) -> int:
+        self._expire()
+        return len(self._outcomes)
+
+    @property
+    def error_rate(self) -> float:
+        self._expire()
+        if not self._outcomes:
+            return 0.0
+        return sum(1 for _, ok in self._outcomes if not ok) / len(self._outcomes)
+
+    def quantile(self, q: float) -> Optional[float]:
+        self._expire()
+        if not self._latencies:
+            return None
+        if self._sorted is None:
+            self._sorted = sorted(latency for _, latency in self._latencies)
+        return percentile(self._sorted, q)
+
+    def snapshot(self) -> Dict[str, Optional[float]]:
+        return {
+            "samples": self.samples,
+            "error_rate": round(self.error_rate, 3),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+        }
+
+
+class HedgeBudget:
+    """Caps hedged calls at ``ratio`` of all calls, plus a small burst
+
+    Every call deposits ``ratio`` tokens (up to ``burst``) and every hedge
+    spends one, so over any stretch of traffic hedges stay within about
+    ``ratio`` extra upstream calls even when a provider is slow throughout.
+    """
+
+    def __init__(self, ratio: float = 0.1, burst: float = 10.0):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+        self.calls = 0
+        self.hedges = 0
+        self.denied = 0
+
+    def deposit(self):
+        self.calls += 1
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            self.denied += 1
+            return False
+        self.tokens -= 1
+        self.hedges += 1
+        return True
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "denied": self.denied,
+            "tokens": round(self.tokens, 2),
+        }
+
+
+class ModelRouter:
+    """Resolves virtual models to the fastest healthy upstream backend
+
+    Each route lists ``<provider>/<model>`` targets; targets whose provider
+    is not configured are ignored. Candidates are ranked healthy first,
+    then by p50 time to first token; streams and plain completions are
+    measured separately. Backends with too few recent samples rank first
+    so they get measured. A failed attempt fails over immediately.
+
+    For routes in ``hedge_routes`` (and for every plain completion with
+    ``hedge_completions``) a duplicate request goes to the runner-up when
+    the primary has produced nothing within its p95, or ``hedge_delay``
+    until that is known. The first to answer wins and the other is
+    cancelled. Hedges are capped by ``budget``.
+    """
+
+    def __init__(
+        self,
+        providers: Dict[str, "Provider"],
+        routes: Optional[Dict[str, List[str]]] = None,
+        hedge_routes: Sequence[str] = (),
+        hedge_delay: float = 0.5,
+        hedge_completions: bool = False,
+        budget: Optional[HedgeBudget] = None,
+        max_error_rate: float = 0.5,
+        min_samples: int = 5,
+        window: float = 300.0,
+    ):
+        self.providers = providers
+        self.hedge_routes = set(hedge_routes)
+        self.hedge_delay = hedge_delay
+        self.hedge_completions = hedge_completions
+        self.budget = budget or HedgeBudget()
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.window = window
+        self.stats: Dict[Tuple[str, str], LatencyStats] = {}
+        self.routes: Dict[str, List[Backend]] = {}
+        for name, targets in (routes or {}).items():
+            backends = [b for b in map(self._backend, targets) if b is not None]
+            if backends:
+                self.routes[name] = backends
+            elif targets:
+                logger.warning(f"No configured provider for any target of {name}")
+
+    def _backend(self, target: str) -> Optional[Backend]:
+        prefix, _, model = target.partition("/")
+        provider = self.providers.get(prefix)
+        if provider is None or not model:
+            return None
+        return provider, model
+
+    def stats_for(self, backend: Backend, kind: str = "complete") -> LatencyStats:
+        """Stats of one backend for ``kind`` ("complete" or "stream") calls"""
+        key = (backend_name(backend), kind)
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = LatencyStats(self.window)
+        return stats
+
+    def healthy(self, backend: Backend, kind: str = "complete") -> bool:
+        stats = self.stats_for(backend, kind)
+        return (
+            stats.samples < self.min_samples
+            or stats.error_rate < self.max_error_rate
+        )
+
+    def candidates(self, model: str, kind: str = "complete") -> List[Backend]:
+        """Backends for a routed model, best first"""
+        backends = self.routes[model]
+
+        def rank(item: Tuple[int, Backend]):
+            index, backend = item
+            stats = self.stats_for(backend, kind)
+            measured = stats.samples >= self.min_samples
+            p50 = stats.quantile(0.5) if measured else None
+            return (not self.healthy(backend, kind), measured, p50 or 0.0, index)
+
+        return [backend for _, backend in sorted(enumerate(backends), key=rank)]
+
+    def hedge_delay_for(
+        self, model: str, primary: Backend, kind: str = "complete"
+    ) -> Optional[float]:
+        """Seconds to wait before hedging ``model``, or None to not hedge"""
+        hedged = model in self.hedge_routes or (
+            kind == "complete" and self.hedge_completions
+        )
+        if not hedged or len(self.routes[model]) < 2:
+            return None
+        stats = self.stats_for(primary, kind)
+        if stats.samples >= self.min_samples:
+            p95 = stats.quantile(0.95)
+            if p95 is not None:
+                return p95
+        return self.hedge_delay
+
+    async def _timed(
+        self, backend: Backend, kind: str, call: Callable[[], Awaitable[T]]
+    ) -> T:
+        started = time.monotonic()
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.stats_for(backend, kind).record_error()
+            raise
+        self.stats_for(backend, kind).record(time.monotonic() - started)
+        return result
+
+    async def race(
+        self,
+        backends: List[Backend],
+        attempt: Callable[[Backend], Awaitable[T]],
+        delay: Optional[float],
+        kind: str = "complete",
+        release: Optional[Callable[[T], Awaitable[None]]] = None,
+    ) -> Tuple[T, Backend]:
+        """First successful ``attempt``, starting backups after ``delay``
+
+        With ``delay`` None, or once the hedge budget is spent, backends are
+        only tried one after another on failure. Attempts still running
+        when one succeeds are cancelled; ``release`` disposes of results
+        that finished too late to be used.
+        """
+        waiting = list(backends)
+        running: Dict[asyncio.Future, Backend] = {}
+
+        def launch():
+            backend = waiting.pop(0)
+            call = functools.partial(attempt, backend)
+            task = asyncio.ensure_future(self._timed(backend, kind, call))
+            running[task] = backend
+
+        self.budget.deposit()
+        launch()
+        error: Optional[BaseException] = None
+        try:
+            while True:
+                timeout = delay if waiting and delay is not None else None
+                done, _ = await asyncio.wait(
+                    running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    if self.budget.withdraw():
+                        logger.debug(f"Hedging to {backend_name(waiting[0])}")
+                        launch()
+                    else:
+                        delay = None
+                    continue
+                winner = None
+                for task in done:
+                    backend = running.pop(task)
+                    if task.exception() is not None:
+                        error = task.exception()
+                        logger.warning(
+                            f"Upstream {backend_name(backend)} failed: {error}"
+                        )
+                    elif winner is None:
+                        winner = task.result(), backend
+                    elif release is not None:
+                        await release(task.result())
+                if winner is not None:
+                    return winner
+                if not running:
+                    if not waiting:
+                        raise error
+                    launch()
+        finally:
+            for task in running:
+                if not task.done():
+                    task.cancel()
+                elif (
+                    not task.cancelled()
+                    and task.exception() is None
+                    and release is not None
+                ):
+                    # Finished between the wait and the cancel
+                    await release(task.result())
+
+    async def complete(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> "Completion":
+        backends = self.candidates(model, "complete")
+
+        async def attempt(backend: Backend) -> "Completion":
+            provider, upstream_model = backend
+            return await provider.complete(
+                upstream_model, messages, temperature, max_tokens
+            )
+
+        delay = self.hedge_delay_for(model, backends[0], "complete")
+        completion, _ = await self.race(backends, attempt, delay, "complete")
+        return completion
+
+    async def stream(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> AsyncIterator[str]:
+        """Stream from whichever backend produces the first delta
+
+        Once a delta has been sent there is no failover; a later error is
+        recorded against the backend and re-raised.
+        """
+        backends = self.candidates(model, "stream")
+
+        async def attempt(backend: Backend):
+            provider, upstream_model = backend
+            deltas = provider.stream(upstream_model, messages, temperature, max_tokens)
+            try:
+                first = await deltas.__anext__()
+            except StopAsyncIteration:
+                first = None
+            except BaseException:
+                await deltas.aclose()
+                raise
+            return first, deltas
+
+        async def release(result):
+            await result[1].aclose()
+
+        delay = self.hedge_delay_for(model, backends[0], "stream")
+        (first, deltas), backend = await self.race(
+            backends, attempt, delay, "stream", release
+        )
+        try:
+            if first is not None:
+                yield first
+                async for delta in deltas:
+                    yield delta
+        except Exception:
+            self.stats_for(backend, "stream").record_error()
+            raise
+        finally:
+            await deltas.aclose()
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, Optional[float]]]]:
+        """Stats per upstream model and call kind"""
+        snapshot: Dict[str, Dict[str, Dict[str, Optional[float]]]] = {}
+        for (name, kind), stats in self.stats.items():
+            snapshot.setdefault(name, {})[kind] = stats.snapshot()
+        return snapshot
@@ -0,0 +1,189 @@
+"""Server-sent event encoding for streamed chat completions"""
+import asyncio
+import json
+import time
+import uuid
+from typing import AsyncIterable, AsyncIterator, Callable, Dict, List, Optional
+
+DONE = b"data: [DONE]\n\n"
+
+_OPEN_CONTENT = b'{"content":'
+_CLOSE_DELTA = b'},"finish_reason":null}]}\n\n'
+
+_END = object()
+
+
+class _Failure:
+    """Carries an upstream exception across the coalescing queue"""
+
+    __slots__ = ("error",)
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class ChunkEncoder:
+    """Encodes ``chat.completion.chunk`` events for a single completion
+
+    Everything that is constant for the lifetime of a stream (id, created
+    timestamp, model) is serialized once into a byte prefix, so each event
+    costs one ``json.dumps`` of the delta text and a single join.
+    """
+
+    __slots__ = ("completion_id", "created", "model", "_prefix")
+
+    def __init__(
+        self,
+        model: str,
+        completion_id: Optional[str] = None,
+        created: Optional[int] = None,
+    ):
+        self.completion_id = completion_id or f"chatcmpl-{uuid.uuid4()}"
+        self.created = int(time.time()) if created is None else created
+        self.model = model
+        self._prefix = (
+            'data: {"id":%s,"object":"chat.completion.chunk","created":%d,'
+            '"model":%s,"choices":[{"index":0,"delta":'
+            % (json.dumps(self.completion_id), self.created, json.dumps(model))
+        ).encode()
+
+    def role(self, role: str = "assistant") -> bytes:
+        """Opening event announcing the assistant role"""
+        return b"".join(
+            (self._prefix, b'{"role":', json.dumps(role).encode(), _CLOSE_DELTA)
+        )
+
+    def content(self, text: str) -> bytes:
+        """Event carrying a content delta"""
+        return b"".join(
+            (self._prefix, _OPEN_CONTENT, json.dumps(text).encode(), _CLOSE_DELTA)
+        )
+
+    def finish(self, reason: str = "stop") -> bytes:
+        """Closing event with an empty delta and the finish reason"""
+        return b"".join(
+            (
+                self._prefix,
+                b'{},"finish_reason":',
+                json.dumps(reason).encode(),
+                b"}]}\n\n",
+            )
+        )
+
+    def usage(self, usage: Dict[str, int]) -> bytes:
+        """Trailing event with no choices and the token usage
+
+        Sent when the client asks for ``stream_options.include_usage``.
+        """
+        return b"".join(
+            (
+                self._prefix[: self._prefix.index(b'"choices":')],
+                b'"choices":[],"usage":',
+                json.dumps(usage, separators=(",", ":")).encode(),
+                b"}\n\n",
+            )
+        )
+
+
+async def coalesce(
+    deltas: AsyncIterable[str],
+    flush_interval: float,
+    max_chars: int = 1024,
+    max_pending: int = 256,
+) -> AsyncIterator[str]:
+    """Merge small deltas so at most one frame is emitted per flush interval
+
+    The first delta after a flush is held for up to ``flush_interval``
+    seconds while further deltas are appended to it; the buffer is flushed
+    early once it reaches ``max_chars``. A non-positive interval passes
+    deltas through unchanged.
+
+    Upstream is drained by a single pump task into a bounded queue, so the
+    timed wait is only paid when upstream has nothing ready.
+    """
+    if flush_interval <= 0:
+        async for delta in deltas:
+            if delta:
+                yield delta
+        return
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+
+    async def pump():
+        try:
+            async for delta in deltas:
+                await queue.put(delta)
+        except Exception as e:
+            await queue.put(_Failure(e))
+        else:
+            await queue.put(_END)
+
+    pump_task = asyncio.ensure_future(pump())
+    buffer: List[str] = []
+    size = 0
+    deadline = 0.0
+
+    try:
+        while True:
+            if not buffer:
+                item = await queue.get()
+            elif not queue.empty():
+                item = queue.get_nowait()
+            else:
+                remaining = deadline - loop.time()
+                try:
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError
+                    item = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    yield "".join(buffer)
+                    buffer.clear()
+                    size = 0
+                    continue
+
+            if item is _END:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+            if not item:
+                continue
+
+            if not buffer:
+                deadline = loop.time() + flush_interval
+            buffer.append(item)
+            size += len(item)
+            if size >= max_chars:
+                yield "".join(buffer)
+                buffer.clear()
+                size = 0
+
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        if not pump_task.done():
+            pump_task.cancel()
+
+
+async def encode_stream(
+    encoder: ChunkEncoder,
+    deltas: AsyncIterable[str],
+    flush_interval: float = 0.0,
+    finish_reason: str = "stop",
+    usage: Optional[Callable[[str], Dict[str, int]]] = None,
+) -> AsyncIterator[bytes]:
+    """Turn a stream of text deltas into complete SSE events
+
+    ``usage``, if given, is called with the full completion text and its
+    result sent as a final usage event.
+    """
+    yield encoder.role()
+    texts = [] if usage is not None else None
+    async for text in coalesce(deltas, flush_interval):
+        if texts is not None:
+            texts.append(text)
+        yield encoder.content(text)
+    yield encoder.finish(finish_reason)
+    if usage is not None:
+        yield encoder.usage(usage("".join(texts)))
+    yield DONE
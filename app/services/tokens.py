@@ -0,0 +1,297 @@
+"""Per-model token counting and context-window fitting"""
+import hashlib
+import importlib.util
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from app.core.lazy import lazy_import
+
+tiktoken = lazy_import("tiktoken")
+
+logger = logging.getLogger(__name__)
+
+# Checked without importing; without tiktoken counts are estimated
+TIKTOKEN_AVAILABLE = importlib.util.find_spec("tiktoken") is not None
+
+# Framing tokens per message and for priming the reply (OpenAI chat format)
+MESSAGE_OVERHEAD = 4
+REPLY_OVERHEAD = 3
+
+# Messages are never truncated below this many tokens
+MIN_MESSAGE_TOKENS = 64
+
+# Context windows by model-name prefix; the longest matching prefix wins
+CONTEXT_WINDOWS: Dict[str, int] = {
+    "gpt-4o": 128_000,
+    "gpt-4.1": 1_047_576,
+    "gpt-4-turbo": 128_000,
+    "gpt-4": 8_192,
+    "gpt-3.5-turbo": 16_385,
+    "o1": 200_000,
+    "o3": 200_000,
+    "o4": 200_000,
+    "claude": 200_000,
+    "llama3": 8_192,
+    "llama3.1": 128_000,
+    "llama3.2": 128_000,
+    "mistral": 32_768,
+    "qwen2.5": 32_768,
+}
+
+_O200K_PREFIXES = ("gpt-4o", "gpt-4.1", "o1", "o3", "o4")
+
+
+class ContextWindowError(ValueError):
+    """Raised when a prompt cannot be made to fit the model's context window"""
+
+
+def estimate_tokens(content: str) -> int:
+    """Rough token count (~4 characters per token)"""
+    return len(content) // 4 + 1
+
+
+def base_model(model: str) -> str:
+    """``openai/gpt-4o-mini`` -> ``gpt-4o-mini``"""
+    return model.rsplit("/", 1)[-1].lower()
+
+
+def encoding_name(model: str) -> str:
+    """tiktoken encoding for ``model``
+
+    Non-OpenAI models have no public tiktoken encoding; ``cl100k_base`` is
+    a close enough approximation for budgeting.
+    """
+    if base_model(model).startswith(_O200K_PREFIXES):
+        return "o200k_base"
+    return "cl100k_base"
+
+
+@lru_cache(maxsize=None)
+def get_encoding(name: str):
+    """Shared tiktoken encoding, or None when tiktoken is unavailable
+
+    Building an encoding parses its whole BPE table, so each one is
+    created once per process.
+    """
+    if not TIKTOKEN_AVAILABLE:
+        return None
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        logger.warning(f"tiktoken encoding {name} unavailable, estimating: {e}")
+        return None
+
+
+@dataclass
+class FittedPrompt:
+    """Messages that fit the context window, with their token accounting"""
+
+    messages: List[Dict[str, str]]
+    model: str
+    prompt_tokens: int
+    max_tokens: Optional[int]
+    window: int
+    dropped: int = 0
+    truncated: List[int] = field(default_factory=list)
+
+
+class TokenCounter:
+    """Counts chat tokens per model and fits prompts to the context window
+
+    Counts are memoized by (encoding, content hash), so the messages that
+    repeat on every turn of a conversation are tokenized once.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 50_000,
+        windows: Optional[Dict[str, int]] = None,
+        default_window: int = 8_192,
+        completion_reserve: int = 1_024,
+    ):
+        self.max_entries = max_entries
+        self.windows = {**CONTEXT_WINDOWS, **(windows or {})}
+        self.default_window = default_window
+        self.completion_reserve = completion_reserve
+        self.hits = 0
+        self.misses = 0
+        self._counts: "OrderedDict[Tuple[str, bytes], int]" = OrderedDict()
+
+    def context_window(self, model: str) -> int:
+        name = base_model(model)
+        matches = [prefix for prefix in self.windows if name.startswith(prefix)]
+        if not matches:
+            return self.default_window
+        return self.windows[max(matches, key=len)]
+
+    def count(self, content: str, model: str = "") -> int:
+        """Tokens in ``content`` under ``model``'s encoding"""
+        if not content:
+            return 0
+        encoding = encoding_name(model)
+        key = (encoding, hashlib.blake2b(content.encode(), digest_size=16).digest())
+        cached = self._counts.get(key)
+        if cached is not None:
+            self._counts.move_to_end(key)
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        encoder = get_encoding(encoding)
+        if encoder is None:
+            tokens = estimate_tokens(content)
+        else:
+            tokens = len(encoder.encode(content, disallowed_special=()))
+        self._counts[key] = tokens
+        while len(self._counts) > self.max_entries:
+            self._counts.popitem(last=False)
+        return tokens
+
+    def count_message(self, message: Dict[str, str], model: str = "") -> int:
+        return MESSAGE_OVERHEAD + self.count(message.get("content") or "", model)
+
+    def count_messages(self, messages: List[Dict[str, str]], model: str = "") -> int:
+        """Prompt tokens for a chat request, framing included"""
+        return REPLY_OVERHEAD + sum(self.count_message(m, model) for m in messages)
+
+    def truncate(self, content: str, tokens: int, model: str = "") -> str:
+        """Keep the head and tail of ``content``, about ``tokens`` in total"""
+        marker = "\n...[truncated]...\n"
+        budget = max(tokens - self.count(marker, model), 2)
+        head = budget * 2 // 3
+        tail = budget - head
+        encoder = get_encoding(encoding_name(model))
+        if encoder is None:
+            # Mirror estimate_tokens: ~4 characters per token
+            if len(content) <= budget * 4:
+                return content
+            return content[: head * 4] + marker + content[len(content) - tail * 4 :]
+        ids = encoder.encode(content, disallowed_special=())
+        if len(ids) <= budget:
+            return content
+        return encoder.decode(ids[:head]) + marker + encoder.decode(ids[-tail:])
+
+    def fit(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        max_tokens: Optional[int] = None,
+        counts: Optional[List[int]] = None,
+    ) -> FittedPrompt:
+        """Trim ``messages`` so prompt and completion fit ``model``'s window
+
+        Up to half the window is held back for the completion (``max_tokens``
+        or the default reserve). If the prompt is over budget the oldest
+        messages after the leading system messages are dropped, always
+        keeping the latest one; if that is not enough the largest remaining
+        messages are cut down to their head and tail. ``max_tokens`` is then
+        clamped to what is left of the window.
+
+        ``counts`` are per-message counts already known from an earlier
+        turn of the conversation, aligned with ``messages``.
+        """
+        window = self.context_window(model)
+        if max_tokens is not None and max_tokens <= 0:
+            raise ContextWindowError("max_tokens must be positive")
+        reserve = min(max_tokens or self.completion_reserve, window // 2)
+        budget = window - reserve
+
+        messages = list(messages)
+        if counts is None:
+            counts = [self.count_message(m, model) for m in messages]
+        else:
+            counts = list(counts)
+        total = REPLY_OVERHEAD + sum(counts)
+        fitted = FittedPrompt(messages, model, total, max_tokens, window)
+
+        if total > budget:
+            self._drop_oldest(fitted, counts, budget, model)
+        if fitted.prompt_tokens > budget:
+            self._truncate_largest(fitted, counts, budget, model)
+        if fitted.dropped or fitted.truncated:
+            logger.info(
+                f"Fitted prompt to {model} window {window}: {total} -> "
+                f"{fitted.prompt_tokens} tokens, dropped {fitted.dropped} "
+                f"messages, truncated {len(fitted.truncated)}"
+            )
+
+        available = window - fitted.prompt_tokens
+        if max_tokens is not None:
+            fitted.max_tokens = min(max_tokens, available)
+        return fitted
+
+    def _drop_oldest(
+        self, fitted: FittedPrompt, counts: List[int], budget: int, model: str
+    ):
+        messages = fitted.messages
+        start = 0
+        while start < len(messages) and messages[start]["role"] == "system":
+            start += 1
+        end = start
+        total = fitted.prompt_tokens
+        note: Optional[Dict[str, str]] = None
+        note_tokens = 0
+        # Keep dropping until the note standing in for them fits as well
+        while end < len(messages) - 1 and total + note_tokens > budget:
+            total -= counts[end]
+            end += 1
+            note = {
+                "role": "system",
+                "content": f"[{end - start} earlier messages omitted to fit the "
+                "context window]",
+            }
+            note_tokens = self.count_message(note, model)
+        if note is None:
+            return
+
+        messages[start:end] = [note]
+        counts[start:end] = [note_tokens]
+        fitted.dropped = end - start
+        fitted.prompt_tokens = total + note_tokens
+
+    def _truncate_largest(
+        self, fitted: FittedPrompt, counts: List[int], budget: int, model: str
+    ):
+        messages = fitted.messages
+        while fitted.prompt_tokens > budget:
+            index = max(range(len(messages)), key=counts.__getitem__)
+            content_tokens = counts[index] - MESSAGE_OVERHEAD
+            if content_tokens <= MIN_MESSAGE_TOKENS:
+                raise ContextWindowError(
+                    f"Prompt needs {fitted.prompt_tokens} tokens but {model} "
+                    f"allows {budget} with the completion reserve"
+                )
+            excess = fitted.prompt_tokens - budget
+            target = max(content_tokens - excess, MIN_MESSAGE_TOKENS)
+            content = self.truncate(messages[index]["content"], target, model)
+            messages[index] = {**messages[index], "content": content}
+            new_count = self.count_message(messages[index], model)
+            if new_count >= counts[index]:
+                raise ContextWindowError(f"Could not shorten message {index}")
+            fitted.prompt_tokens -= counts[index] - new_count
+            counts[index] = new_count
+            if index not in fitted.truncated:
+                fitted.truncated.append(index)
+
+    def usage(
+        self,
+        fitted: FittedPrompt,
+        completion: str,
+        reported: Optional[Dict[str, int]] = None,
+    ) -> Dict[str, int]:
+        """Provider-reported usage if any, otherwise counted locally"""
+        if reported and reported.get("total_tokens"):
+            return reported
+        prompt_tokens = fitted.prompt_tokens
+        completion_tokens = self.count(completion, fitted.model)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._counts), "hits": self.hits, "misses": self.misses}
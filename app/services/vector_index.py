@@ -0,0 +1,158 @@
+"""HNSW index lifecycle for pgvector columns"""
+import logging
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_OPTION = re.compile(r"(\w+)\s*=\s*'?(\w+)'?")
+
+
+@dataclass
+class VectorIndex:
+    """An HNSW index on a vector column and the parameters it should have"""
+
+    name: str
+    table: str
+    column: str = "embedding"
+    opclass: str = "vector_cosine_ops"
+    m: int = 16
+    ef_construction: int = 64
+    partitioned: bool = False
+
+    @property
+    def schema(self) -> str:
+        return self.table.split(".")[0]
+
+    def ddl(self, name: Optional[str] = None, concurrently: bool = False) -> str:
+        return (
+            f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}"
+            f"IF NOT EXISTS {name or self.name} ON {self.table} "
+            f"USING hnsw ({self.column} {self.opclass}) "
+            f"WITH (m = {self.m}, ef_construction = {self.ef_construction})"
+        )
+
+    def drift(self, indexdef: Optional[str]) -> List[str]:
+        """How an existing index definition differs from this one"""
+        if indexdef is None:
+            return ["missing"]
+        method = re.search(r"USING (\w+)", indexdef)
+        if method is None or method.group(1) != "hnsw":
+            return [f"method {method.group(1) if method else '?'} != hnsw"]
+        options = dict(_OPTION.findall(indexdef.partition(" WITH ")[2]))
+        # pgvector defaults when an option is not spelled out
+        wanted = {"m": self.m, "ef_construction": self.ef_construction}
+        defaults = {"m": 16, "ef_construction": 64}
+        return [
+            f"{key} {options.get(key, defaults[key])} != {value}"
+            for key, value in wanted.items()
+            if int(options.get(key, defaults[key])) != value
+        ]
+
+
+_INDEXDEF = text(
+    """
+    SELECT indexdef FROM pg_indexes
+    WHERE schemaname = :schema AND indexname = :name
+    """
+)
+
+
+async def indexdef(conn: AsyncConnection, index: VectorIndex) -> Optional[str]:
+    result = await conn.execute(
+        _INDEXDEF, {"schema": index.schema, "name": index.name}
+    )
+    return result.scalar()
+
+
+async def check(engine: AsyncEngine, index: VectorIndex) -> List[str]:
+    """Log and return any drift between the live index and its definition"""
+    async with engine.connect() as conn:
+        drift = index.drift(await indexdef(conn, index))
+    if drift:
+        logger.warning(
+            f"Vector index {index.name} differs from settings "
+            f"({', '.join(drift)}); run scripts/reindex_vectors.py "
+            f"--rebuild --index {index.name}"
+        )
+    return drift
+
+
+async def set_ef_search(conn: AsyncConnection, ef_search: int):
+    """Set ``hnsw.ef_search`` for the rest of the current transaction"""
+    await conn.execute(
+        text("SELECT set_config('hnsw.ef_search', :value, true)"),
+        {"value": str(int(ef_search))},
+    )
+
+
+async def reindex(engine: AsyncEngine, index: VectorIndex):
+    """Rebuild an index in place without blocking writes
+
+    Use after bulk loads; the graph is rebuilt from the current rows.
+    """
+    autocommit = engine.execution_options(isolation_level="AUTOCOMMIT")
+    async with autocommit.connect() as conn:
+        await conn.execute(
+            text(f"REINDEX INDEX CONCURRENTLY {index.schema}.{index.name}")
+        )
+
+
+async def rebuild(engine: AsyncEngine, index: VectorIndex):
+    """Recreate an index with its configured method and parameters
+
+    A replacement is built concurrently under a temporary name and swapped
+    in, so reads keep using the old index until the new one is ready.
+    Partitioned tables do not support concurrent builds and are rebuilt
+    in place.
+    """
+    autocommit = engine.execution_options(isolation_level="AUTOCOMMIT")
+    qualified = f"{index.schema}.{index.name}"
+    async with autocommit.connect() as conn:
+        if index.partitioned:
+            await conn.execute(text(f"DROP INDEX IF EXISTS {qualified}"))
+            await conn.execute(text(index.ddl()))
+            return
+        replacement = f"{index.name}_rebuild"
+        await conn.execute(
+            text(f"DROP INDEX CONCURRENTLY IF EXISTS {index.schema}.{replacement}")
+        )
+        await conn.execute(text(index.ddl(replacement, concurrently=True)))
+        await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {qualified}"))
+        await conn.execute(
+            text(f"ALTER INDEX {index.schema}.{replacement} RENAME TO {index.name}")
+        )
+
+
+def managed_indexes() -> Dict[str, VectorIndex]:
+    """Every HNSW index the application manages, with parameters from settings"""
+    return {
+        index.name: index
+        for index in (
+            VectorIndex(
+                "idx_entities_embedding",
+                "shared.entities",
+                m=settings.ENTITY_HNSW_M,
+                ef_construction=settings.ENTITY_HNSW_EF_CONSTRUCTION,
+            ),
+            VectorIndex(
+                "idx_chunks_embedding",
+                "r2r.chunks",
+                m=settings.RAG_HNSW_M,
+                ef_construction=settings.RAG_HNSW_EF_CONSTRUCTION,
+            ),
+            VectorIndex(
+                "idx_memories_embedding",
+                "mem0.memories",
+                m=settings.MEMORY_HNSW_M,
+                ef_construction=settings.MEMORY_HNSW_EF_CONSTRUCTION,
+                partitioned=True,
+            ),
+        )
+    }
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark bulk loading of shared.entities / shared.relationships
+
+Generates synthetic entities with random 1536-d embeddings and random
+relationships between them, loads them with BulkLoader (binary COPY into a
+staging table + one merge statement per batch), then loads them again to
+time the update path. --baseline N also times N row-by-row INSERTs for
+comparison.
+
+Usage: python scripts/bench_bulk_load.py [--entities 100000]
+                                         [--relationships 200000]
+                                         [--baseline 2000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.database import engine  # noqa: E402
+from app.services.bulk_load import (  # noqa: E402
+    BulkLoader,
+    EntityRecord,
+    RelationshipRecord,
+)
+from app.services.memory import vector_literal  # noqa: E402
+
+TYPES = ["person", "project", "library", "concept", "service"]
+
+
+def entities(n, dimensions):
+    for i in range(n):
+        yield EntityRecord(
+            name=f"bench-entity-{i}",
+            type=TYPES[i % len(TYPES)],
+            embedding=[random.random() - 0.5 for _ in range(dimensions)],
+            metadata={"bench": True, "i": i},
+            source_system="r2r",
+        )
+
+
+def relationships(n, n_entities):
+    for _ in range(n):
+        a, b = random.randrange(n_entities), random.randrange(n_entities)
+        yield RelationshipRecord(
+            from_name=f"bench-entity-{a}",
+            from_type=TYPES[a % len(TYPES)],
+            to_name=f"bench-entity-{b}",
+            to_type=TYPES[b % len(TYPES)],
+            relationship_type=random.choice(["uses", "mentions", "depends_on"]),
+            weight=random.random(),
+            source_system="mem0",
+        )
+
+
+async def timed(label, n, coro):
+    started = time.perf_counter()
+    result = await coro
+    elapsed = time.perf_counter() - started
+    print(
+        f"{label:<28} {n:>9,} rows {elapsed:7.2f}s "
+        f"{n / elapsed:>10,.0f} rows/s {result}"
+    )
+
+
+async def baseline(n, dimensions):
+    insert = text(
+        """
+        INSERT INTO shared.entities (name, type, metadata, embedding, source_system)
+        VALUES (:name, :type, '{}', CAST(:embedding AS vector), 'r2r')
+        """
+    )
+    started = time.perf_counter()
+    for record in entities(n, dimensions):
+        async with engine.begin() as conn:
+            await conn.execute(
+                insert,
+                {
+                    "name": f"baseline-{record.name}",
+                    "type": record.type,
+                    "embedding": vector_literal(record.embedding),
+                },
+            )
+    elapsed = time.perf_counter() - started
+    print(
+        f"{'row-by-row INSERT':<28} {n:>9,} rows {elapsed:7.2f}s "
+        f"{n / elapsed:>10,.0f} rows/s"
+    )
+
+
+async def main(args):
+    dimensions = settings.EMBEDDING_DIMENSIONS
+    async with engine.begin() as conn:
+        await conn.execute(
+            text(
+                "DELETE FROM shared.entities "
+                "WHERE name LIKE 'bench-entity-%' OR name LIKE 'baseline-bench-%'"
+            )
+        )
+    loader = BulkLoader(engine, dimensions=dimensions)
+    if args.baseline:
+        await baseline(args.baseline, dimensions)
+    await timed(
+        "entities (insert)",
+        args.entities,
+        loader.load_entities(entities(args.entities, dimensions)),
+    )
+    await timed(
+        "entities (update)",
+        args.entities,
+        loader.load_entities(entities(args.entities, dimensions)),
+    )
+    await timed(
+        "relationships",
+        args.relationships,
+        loader.load_relationships(relationships(args.relationships, args.entities)),
+    )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entities", type=int, default=100_000)
+    parser.add_argument("--relationships", type=int, default=200_000)
+    parser.add_argument("--baseline", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark embeddings/sec vs. micro-batch size
+
+Many concurrent callers each embed one text through BatchingEmbedder. The
+upstream is LocalEmbedder behind a simulated round trip (fixed latency plus
+a per-text cost), so the numbers isolate the effect of batching.
+
+Usage: python scripts/bench_embeddings.py [--texts 5000] [--callers 256]
+                                          [--latency 0.02] [--per-text 0.0002]
+                                          [--batch-sizes 1,8,32,64,128]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.embeddings import BatchingEmbedder, LocalEmbedder  # noqa: E402
+
+
+def simulated_provider(latency, per_text, dimensions):
+    local = LocalEmbedder(dimensions)
+
+    async def embed(texts):
+        await asyncio.sleep(latency + per_text * len(texts))
+        return await local(texts)
+
+    return embed
+
+
+async def run(batch_size, args):
+    embedder = BatchingEmbedder(
+        simulated_provider(args.latency, args.per_text, args.dimensions),
+        max_batch_size=batch_size,
+        max_wait=args.max_wait,
+        max_concurrency=args.concurrency,
+    )
+    queue = asyncio.Queue()
+    for i in range(args.texts):
+        queue.put_nowait(f"chunk {i} of a synthetic document about topic {i % 97}")
+
+    async def caller():
+        while not queue.empty():
+            await embedder.embed_one(queue.get_nowait())
+
+    started = time.perf_counter()
+    await asyncio.gather(*(caller() for _ in range(args.callers)))
+    elapsed = time.perf_counter() - started
+    stats = embedder.stats()
+    print(
+        f"batch {batch_size:>4}  {args.texts / elapsed:>10,.0f} embeddings/s  "
+        f"{stats['batches']:>6} calls  mean batch {stats['mean_batch_size']:6.1f}  "
+        f"{elapsed:.2f}s"
+    )
+
+
+async def main(args):
+    for batch_size in args.batch_sizes:
+        await run(batch_size, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--texts", type=int, default=5000)
+    parser.add_argument("--callers", type=int, default=256)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--per-text", type=float, default=0.0002)
+    parser.add_argument("--max-wait", type=float, default=0.005)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument(
+        "--batch-sizes",
+        type=lambda s: [int(x) for x in s.split(",")],
+        default=[1, 8, 32, 64, 128],
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Measure import time of the app package with ``python -X importtime``
+
+Reports the cumulative import time of the target module (median over
+several fresh interpreters), the slowest imports, and any heavy AI
+dependencies that were pulled in at import time.
+
+Usage: python scripts/bench_import.py [--module app.main] [--runs 5] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Must only be imported on first use, never by ``import app.main``
+HEAVY_MODULES = [
+    "langchain",
+    "langchain_community",
+    "langchain_openai",
+    "langchain_anthropic",
+    "litellm",
+    "r2r",
+    "mem0",
+    "fastmcp",
+    "openai",
+    "anthropic",
+    "numpy",
+    "httpx",
+    "h2",
+    "redis",
+]
+
+PROBE = (
+    "import sys, json; import {module}; "
+    "print(json.dumps([m for m in {heavy!r} if m in sys.modules]))"
+)
+
+
+def measure(module: str) -> dict:
+    """Import ``module`` in a fresh interpreter and parse -X importtime"""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            PROBE.format(module=module, heavy=HEAVY_MODULES),
+        ],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imports = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        imports[name.strip()] = (int(self_us), int(cumulative_us))
+    return {
+        "total_ms": imports[module][1] / 1000,
+        "imports": imports,
+        "heavy": json.loads(result.stdout.strip().splitlines()[-1]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", action="store_true", help="machine-readable summary")
+    args = parser.parse_args()
+
+    # The first run also warms the bytecode cache; don't count it
+    measure(args.module)
+    runs = [measure(args.module) for _ in range(args.runs)]
+    total_ms = statistics.median(run["total_ms"] for run in runs)
+    heavy = sorted({m for run in runs for m in run["heavy"]})
+
+    if args.json:
+        print(json.dumps({"module": args.module, "total_ms": total_ms, "heavy": heavy}))
+        return
+
+    print(f"import {args.module}: {total_ms:.1f} ms (median of {args.runs})")
+    print(f"heavy modules imported: {', '.join(heavy) or 'none'}")
+    print("\nslowest imports (self time, last run):")
+    slowest = sorted(runs[-1]["imports"].items(), key=lambda i: i[1][0], reverse=True)
+    for name, (self_us, cumulative_us) in slowest[: args.top]:
+        print(f"  {self_us / 1000:8.1f} ms  {cumulative_us / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark top-k memory retrieval from mem0.memories
+
+Seeds synthetic memories (random vectors generated server-side) spread over
+a number of users, then measures MemoryStore.search latency for random users.
+Target: p99 < 20 ms for top-10 with 1M memories across 10k users.
+
+Usage: python scripts/bench_memory.py [--memories 1000000] [--users 10000]
+                                      [--queries 2000] [--mode exact|ann]
+                                      [--skip-seed]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.database import engine  # noqa: E402
+from app.services.memory import MemoryStore  # noqa: E402
+
+SEED = text(
+    """
+    INSERT INTO mem0.memories (user_id, content, embedding)
+    SELECT
+        'bench-user-' || (g % :users),
+        'synthetic memory ' || g,
+        ARRAY(
+            SELECT random()::real FROM generate_series(1, :dimensions)
+            WHERE g IS NOT NULL
+        )::vector
+    FROM generate_series(:start, :stop) AS g
+    """
+)
+
+
+async def seed(memories: int, users: int, dimensions: int, batch: int = 10_000):
+    async with engine.begin() as conn:
+        await conn.execute(
+            text("DELETE FROM mem0.memories WHERE user_id LIKE 'bench-user-%'")
+        )
+    started = time.perf_counter()
+    for start in range(0, memories, batch):
+        async with engine.begin() as conn:
+            await conn.execute(
+                SEED,
+                {
+                    "users": users,
+                    "dimensions": dimensions,
+                    "start": start,
+                    "stop": min(start + batch, memories) - 1,
+                },
+            )
+        print(f"\rseeded {min(start + batch, memories):,}/{memories:,}", end="")
+    async with engine.begin() as conn:
+        await conn.execute(text("ANALYZE mem0.memories"))
+    print(f"\nseeding took {time.perf_counter() - started:.1f}s")
+
+
+async def main(args):
+    store = MemoryStore(
+        engine,
+        dimensions=settings.EMBEDDING_DIMENSIONS,
+        partitions=settings.MEMORY_PARTITIONS,
+        search_mode=args.mode,
+    )
+    await store.create_schema()
+    if not args.skip_seed:
+        await seed(args.memories, args.users, store.dimensions)
+
+    async def one_query():
+        vector = [random.random() for _ in range(store.dimensions)]
+        user = f"bench-user-{random.randrange(args.users)}"
+        started = time.perf_counter()
+        await store.search(user, vector, args.k)
+        return (time.perf_counter() - started) * 1000
+
+    for _ in range(50):  # warm the pool and the buffer cache
+        await one_query()
+    latencies = sorted([await one_query() for _ in range(args.queries)])
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"mode={args.mode} top-{args.k} over {args.queries} queries: "
+        f"p50={quantiles[49]:.2f} ms p95={quantiles[94]:.2f} ms "
+        f"p99={quantiles[98]:.2f} ms max={latencies[-1]:.2f} ms"
+    )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--memories", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=2_000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--mode", choices=["exact", "ann"], default="exact")
+    parser.add_argument("--skip-seed", action="store_true")
+    asyncio.run(main(parser.parse_args()))
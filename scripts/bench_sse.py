@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark SSE chunk encoding: legacy fragment generator vs ChunkEncoder
+
+Usage: python scripts/bench_sse.py [--events 200000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.streaming import ChunkEncoder, encode_stream  # noqa: E402
+
+MODEL = "synapse"
+
+
+async def words(n):
+    for i in range(n):
+        yield f" word{i % 97}"
+
+
+async def legacy_stream(n):
+    """The original per-fragment generator from app/api/chat.py"""
+    completion_id = f"chatcmpl-{uuid.uuid4()}"
+    async for word in words(n):
+        yield "data: {"
+        yield f'"id":"{completion_id}",'
+        yield '"object":"chat.completion.chunk",'
+        yield f'"created":{int(time.time())},'
+        yield f'"model":"{MODEL}",'
+        yield f'"choices":[{{"index":0,"delta":{{"content":"{word}"}},"finish_reason":null}}]'
+        yield "}\n\n"
+
+
+async def consume(stream):
+    """Count sends the way an ASGI server would see them"""
+    sends = 0
+    async for part in stream:
+        if isinstance(part, str):
+            part = part.encode()
+        sends += 1
+    return sends
+
+
+async def run(name, factory, events):
+    start = time.process_time()
+    sends = await consume(factory())
+    elapsed = time.process_time() - start
+    print(
+        f"{name:<24} {events / elapsed:>12,.0f} events/s/core "
+        f"{sends:>9,} sends  {elapsed:.3f}s cpu"
+    )
+
+
+async def main(events):
+    await run("legacy generator", lambda: legacy_stream(events), events)
+    await run(
+        "ChunkEncoder",
+        lambda: encode_stream(ChunkEncoder(MODEL), words(events)),
+        events,
+    )
+    await run(
+        "ChunkEncoder+coalesce",
+        lambda: encode_stream(ChunkEncoder(MODEL), words(events), flush_interval=0.01),
+        events,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=200_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.events))
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Recall / latency benchmark for HNSW parameters over synthetic vectors
+
+Loads random vectors into a scratch table, builds an HNSW index with the
+given m / ef_construction, computes exact top-k for a set of queries with
+index scans disabled, then reports recall@k and latency for each ef_search.
+
+Usage: python scripts/bench_vector_index.py [--rows 100000] [--dimensions 1536]
+                                            [--m 16] [--ef-construction 64]
+                                            [--ef-search 40,100,200]
+                                            [--queries 200] [--k 10]
+                                            [--skip-seed]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+from app.core.database import engine  # noqa: E402
+from app.services import vector_index  # noqa: E402
+from app.services.memory import vector_literal  # noqa: E402
+
+TABLE = "shared.bench_vectors"
+
+SEED = text(
+    f"""
+    INSERT INTO {TABLE} (id, embedding)
+    SELECT
+        g,
+        ARRAY(
+            SELECT random()::real - 0.5 FROM generate_series(1, :dimensions)
+            WHERE g IS NOT NULL
+        )::vector
+    FROM generate_series(:start, :stop) AS g
+    """
+)
+
+SEARCH = text(
+    f"""
+    SELECT id FROM {TABLE}
+    ORDER BY embedding <=> CAST(:embedding AS vector)
+    LIMIT :k
+    """
+)
+
+
+async def seed(rows: int, dimensions: int, batch: int = 10_000):
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+        await conn.execute(
+            text(
+                f"CREATE TABLE {TABLE} "
+                f"(id BIGINT PRIMARY KEY, embedding vector({dimensions}))"
+            )
+        )
+    started = time.perf_counter()
+    for start in range(0, rows, batch):
+        async with engine.begin() as conn:
+            await conn.execute(
+                SEED,
+                {
+                    "dimensions": dimensions,
+                    "start": start,
+                    "stop": min(start + batch, rows) - 1,
+                },
+            )
+        print(f"\rseeded {min(start + batch, rows):,}/{rows:,}", end="")
+    print(f"\nseeding took {time.perf_counter() - started:.1f}s")
+
+
+async def build(index: vector_index.VectorIndex):
+    started = time.perf_counter()
+    await vector_index.rebuild(engine, index)
+    async with engine.begin() as conn:
+        await conn.execute(text(f"ANALYZE {TABLE}"))
+    print(
+        f"built hnsw m={index.m} ef_construction={index.ef_construction} "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+
+
+async def exact(queries, k):
+    truth = []
+    async with engine.begin() as conn:
+        await conn.execute(text("SET LOCAL enable_indexscan = off"))
+        for query in queries:
+            result = await conn.execute(SEARCH, {"embedding": query, "k": k})
+            truth.append({row.id for row in result})
+    return truth
+
+
+async def measure(queries, truth, k, ef_search):
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        async with engine.begin() as conn:
+            await vector_index.set_ef_search(conn, ef_search)
+            started = time.perf_counter()
+            result = await conn.execute(SEARCH, {"embedding": query, "k": k})
+            found = {row.id for row in result}
+            latencies.append((time.perf_counter() - started) * 1000)
+        recalls.append(len(found & expected) / k)
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"ef_search={ef_search:<5} recall@{k}={statistics.mean(recalls):.3f}  "
+        f"p50={quantiles[49]:.2f} ms p99={quantiles[98]:.2f} ms"
+    )
+
+
+async def main(args):
+    if not args.skip_seed:
+        await seed(args.rows, args.dimensions)
+    index = vector_index.VectorIndex(
+        "idx_bench_vectors_embedding",
+        TABLE,
+        m=args.m,
+        ef_construction=args.ef_construction,
+    )
+    await build(index)
+
+    queries = [
+        vector_literal([random.random() - 0.5 for _ in range(args.dimensions)])
+        for _ in range(args.queries)
+    ]
+    truth = await exact(queries, args.k)
+    for ef_search in args.ef_search:
+        await measure(queries, truth, args.k, ef_search)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=64)
+    parser.add_argument(
+        "--ef-search",
+        type=lambda s: [int(x) for x in s.split(",")],
+        default=[40, 100, 200],
+    )
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--skip-seed", action="store_true")
+    asyncio.run(main(parser.parse_args()))
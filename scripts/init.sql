@@ -13,6 +13,9 @@ GRANT ALL ON SCHEMA r2r TO synapse;
 GRANT ALL ON SCHEMA mem0 TO synapse;
 GRANT ALL ON SCHEMA shared TO synapse;
 
+-- mem0.memories is created by the memory service at startup
+-- (app/services/memory.py) so partition count and HNSW parameters follow settings
+
 -- Shared entities table (knowledge graph)
 CREATE TABLE IF NOT EXISTS shared.entities (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -38,8 +41,13 @@ CREATE TABLE IF NOT EXISTS shared.relationships (
 );
 
 -- Create indexes
+-- HNSW needs no training data, so it is safe to create on an empty table.
+-- Parameters must match ENTITY_HNSW_M / ENTITY_HNSW_EF_CONSTRUCTION; change
+-- them with scripts/reindex_vectors.py --rebuild
 CREATE INDEX IF NOT EXISTS idx_entities_embedding ON shared.entities 
-    USING ivfflat (embedding vector_cosine_ops);
+    USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
 CREATE INDEX IF NOT EXISTS idx_entities_name ON shared.entities(name);
 CREATE INDEX IF NOT EXISTS idx_entities_type ON shared.entities(type);
-CREATE INDEX IF NOT EXISTS idx_relationships_from_to ON shared.relationships(from_entity_id, to_entity_id);
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS idx_relationships_from_to ON shared.relationships(from_entity_id, to_entity_id);
+-- Reverse edges for traversals that follow relationships in both directions
+CREATE INDEX IF NOT EXISTS idx_relationships_to ON shared.relationships(to_entity_id);
\ No newline at end of file
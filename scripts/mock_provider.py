@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Local mock LLM provider for development and load testing
+
+Speaks the OpenAI (/v1/chat/completions), Anthropic (/v1/messages) and
+Ollama (/api/chat) wire formats and echoes the last user message back.
+
+Usage:
+    python scripts/mock_provider.py --port 9000 --ttft 0.05 --token-delay 0.01
+    OPENAI_API_KEY=mock OPENAI_BASE_URL=http://localhost:9000/v1 make dev
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+app = FastAPI(title="Synapse mock provider")
+config = {"ttft": 0.0, "token_delay": 0.0}
+
+
+def reply_tokens(body: dict) -> list:
+    users = [m["content"] for m in body.get("messages", []) if m["role"] == "user"]
+    last = users[-1] if users else ""
+    return [f" {word}" for word in f"echo: {last}".split()]
+
+
+async def timed_tokens(body: dict):
+    await asyncio.sleep(config["ttft"])
+    for token in reply_tokens(body):
+        yield token
+        await asyncio.sleep(config["token_delay"])
+
+
+@app.post("/v1/chat/completions")
+async def openai_chat(request: Request):
+    body = await request.json()
+    if body.get("stream"):
+
+        async def events():
+            async for token in timed_tokens(body):
+                chunk = {"choices": [{"index": 0, "delta": {"content": token}}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    tokens = [t async for t in timed_tokens(body)]
+    return {
+        "id": f"mock-{time.time_ns()}",
+        "model": body["model"],
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(tokens)},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 1, "completion_tokens": len(tokens)},
+    }
+
+
+@app.post("/v1/messages")
+async def anthropic_messages(request: Request):
+    body = await request.json()
+    if body.get("stream"):
+
+        async def events():
+            async for token in timed_tokens(body):
+                event = {"type": "content_block_delta", "delta": {"text": token}}
+                yield f"event: content_block_delta\ndata: {json.dumps(event)}\n\n"
+            yield 'event: message_stop\ndata: {"type":"message_stop"}\n\n'
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    tokens = [t async for t in timed_tokens(body)]
+    return {
+        "model": body["model"],
+        "content": [{"type": "text", "text": "".join(tokens)}],
+        "stop_reason": "end_turn",
+        "usage": {"input_tokens": 1, "output_tokens": len(tokens)},
+    }
+
+
+@app.post("/api/chat")
+async def ollama_chat(request: Request):
+    body = await request.json()
+    if body.get("stream", True):
+
+        async def lines():
+            async for token in timed_tokens(body):
+                yield json.dumps({"message": {"content": token}, "done": False}) + "\n"
+            yield json.dumps({"done": True}) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    tokens = [t async for t in timed_tokens(body)]
+    return {
+        "model": body["model"],
+        "message": {"role": "assistant", "content": "".join(tokens)},
+        "done": True,
+        "prompt_eval_count": 1,
+        "eval_count": len(tokens),
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument(
+        "--ttft", type=float, default=0.0, help="seconds before first token"
+    )
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    args = parser.parse_args()
+    config.update(ttft=args.ttft, token_delay=args.token_delay)
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
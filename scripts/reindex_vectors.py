@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Reindex or rebuild the application's HNSW vector indexes
+
+By default each index is rebuilt in place with REINDEX CONCURRENTLY, which
+is what you want after a bulk load. With --rebuild, indexes whose method or
+parameters differ from settings (e.g. the legacy ivfflat index on
+shared.entities) are recreated with the configured m / ef_construction.
+
+Usage: python scripts/reindex_vectors.py [--index idx_entities_embedding]
+                                         [--rebuild] [--check]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import engine  # noqa: E402
+from app.services import vector_index  # noqa: E402
+
+
+async def main(args):
+    indexes = vector_index.managed_indexes()
+    names = args.index or list(indexes)
+    unknown = [name for name in names if name not in indexes]
+    if unknown:
+        sys.exit(f"Unknown index: {', '.join(unknown)} (known: {', '.join(indexes)})")
+
+    for name in names:
+        index = indexes[name]
+        drift = await vector_index.check(engine, index)
+        if args.check:
+            print(f"{name:<28} {'ok' if not drift else ', '.join(drift)}")
+            continue
+        started = time.perf_counter()
+        if args.rebuild and drift:
+            await vector_index.rebuild(engine, index)
+            action = "rebuilt"
+        elif "missing" in drift:
+            print(f"{name:<28} missing, use --rebuild to create it")
+            continue
+        else:
+            await vector_index.reindex(engine, index)
+            action = "reindexed"
+        print(f"{name:<28} {action} in {time.perf_counter() - started:.1f}s")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--index", action="append", help="repeatable; default all")
+    parser.add_argument("--rebuild", action="store_true")
+    parser.add_argument("--check", action="store_true", help="report drift only")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,94 @@
+"""Authentication middleware and token cache tests"""
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from jose import jwt
+
+from app.core.auth import TokenVerifier, authorize_user, bearer_token, current_user
+from app.core.middleware import AuthMiddleware
+
+SECRET = "test-secret"
+
+
+def token(sub="alice", **claims):
+    return jwt.encode({"sub": sub, **claims}, SECRET, algorithm="HS256")
+
+
+def make_app(required: bool) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(
+        AuthMiddleware,
+        verifier=TokenVerifier(["sk-test"], jwt_secret=SECRET),
+        required=required,
+    )
+
+    @app.get("/v1/whoami")
+    async def whoami(req: Request):
+        return {"user_id": current_user(req)}
+
+    @app.get("/api/memory/{user_id}")
+    async def memory(user_id: str, req: Request):
+        authorize_user(req, user_id)
+        return {"user_id": user_id}
+
+    return app
+
+
+def test_bearer_token():
+    assert bearer_token("Bearer abc") == "abc"
+    assert bearer_token("bearer abc ") == "abc"
+    assert bearer_token("abc") == "abc"
+    assert bearer_token(None) is None
+
+
+def test_verifier_caches_by_token_hash():
+    verifier = TokenVerifier(["sk-test"], jwt_secret=SECRET)
+    encoded = token()
+    first = verifier.verify(encoded)
+    assert first.method == "jwt" and first.user_id == "alice"
+    assert verifier.verify(encoded) is first
+    assert verifier.verify("sk-test").method == "api_key"
+    assert verifier.verify("sk-wrong") is None
+    assert verifier.verify("sk-wrong") is None
+    assert verifier.stats() == {"entries": 3, "hits": 2, "misses": 3}
+
+
+def test_verifier_rejects_bad_and_expired_jwts():
+    verifier = TokenVerifier(jwt_secret=SECRET)
+    forged = jwt.encode({"sub": "alice"}, "other-secret", algorithm="HS256")
+    assert verifier.verify(forged) is None
+    assert verifier.verify(token(exp=int(time.time()) - 10)) is None
+    assert verifier.verify(jwt.encode({}, SECRET, algorithm="HS256")) is None
+
+
+def test_verifier_cache_is_bounded():
+    verifier = TokenVerifier(["sk-test"], max_entries=2)
+    for i in range(5):
+        verifier.verify(f"sk-{i}")
+    assert verifier.stats()["entries"] == 2
+
+
+def test_middleware_resolves_user():
+    client = TestClient(make_app(required=False))
+    headers = {"Authorization": f"Bearer {token('alice')}", "X-User-ID": "mallory"}
+    assert client.get("/v1/whoami", headers=headers).json() == {"user_id": "alice"}
+    headers = {"Authorization": "Bearer sk-test", "X-User-ID": "bob"}
+    assert client.get("/v1/whoami", headers=headers).json() == {"user_id": "bob"}
+    # Without enforcement unauthenticated requests pass through
+    assert client.get("/v1/whoami").json() == {"user_id": None}
+
+
+def test_middleware_enforces_auth():
+    client = TestClient(make_app(required=True))
+    response = client.get("/v1/whoami", headers={"Authorization": "Bearer nope"})
+    assert response.status_code == 401
+    assert response.json()["error"]["code"] == "invalid_api_key"
+    assert client.get("/v1/whoami").status_code == 401
+
+    headers = {"Authorization": f"Bearer {token('alice')}"}
+    assert client.get("/api/memory/alice", headers=headers).status_code == 200
+    assert client.get("/api/memory/bob", headers=headers).status_code == 403
+    # API keys act for any user
+    headers = {"Authorization": "Bearer sk-test"}
+    assert client.get("/api/memory/bob", headers=headers).status_code == 200
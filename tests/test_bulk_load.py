@@ -0,0 +1,94 @@
+"""Bulk loader tests"""
+import struct
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.bulk_load import (
+    BulkLoader,
+    EntityRecord,
+    _batches,
+    decode_vector,
+    encode_vector,
+)
+
+
+def test_vector_binary_format_round_trips():
+    encoded = encode_vector([1.0, -0.5, 0.25])
+    assert encoded[:4] == struct.pack(">HH", 3, 0)
+    assert len(encoded) == 4 + 3 * 4
+    assert decode_vector(encoded) == [1.0, -0.5, 0.25]
+
+
+def test_batches_consume_generators_lazily():
+    pulled = []
+
+    def records():
+        for i in range(7):
+            pulled.append(i)
+            yield i
+
+    batches = _batches(records(), 3)
+    assert next(batches) == [0, 1, 2]
+    assert pulled == [0, 1, 2]
+    assert list(batches) == [[3, 4, 5], [6]]
+
+
+def test_dimension_mismatch_is_rejected():
+    loader = BulkLoader(engine=None, dimensions=4)
+    with pytest.raises(ValueError):
+        loader._check(EntityRecord(name="x", type="concept", embedding=[0.0] * 3))
+
+
+class FakeDriver:
+    """asyncpg connection that encodes vector parameters like the real one"""
+
+    def __init__(self, fail_copy: bool = False):
+        self.fail_copy = fail_copy
+        self.encoders = {}
+        self.copied = []
+
+    async def set_type_codec(self, typename, encoder, decoder, format):
+        self.encoders[typename] = encoder
+
+    async def reset_type_codec(self, typename):
+        self.encoders.pop(typename, None)
+
+    async def copy_records_to_table(self, table, records, columns):
+        index = columns.index("embedding")
+        encode = self.encoders["vector"]
+        self.copied += [encode(record[index]) for record in records]
+        if self.fail_copy:
+            raise RuntimeError("copy failed")
+
+    def bind(self, typename, value):
+        """Encode a query parameter; the text codec accepts literals"""
+        encoder = self.encoders.get(typename)
+        return encoder(value) if encoder else value
+
+
+class FakeConnection:
+    def __init__(self, driver):
+        self.driver = driver
+        self.statements = []
+
+    async def get_raw_connection(self):
+        return SimpleNamespace(driver_connection=self.driver)
+
+    async def execute(self, statement):
+        self.statements.append(str(statement))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fail_copy", [False, True])
+async def test_copy_leaves_text_vector_queries_working(fail_copy):
+    driver = FakeDriver(fail_copy=fail_copy)
+    conn = FakeConnection(driver)
+    loader = BulkLoader(engine=None, dimensions=2)
+    try:
+        await loader._copy(conn, "staging", ["seq", "embedding"], [(0, [1.0, 2.0])])
+    except RuntimeError:
+        assert fail_copy
+    assert driver.copied == [encode_vector([1.0, 2.0])]
+    # A later CAST(:embedding AS vector) query on the same pooled connection
+    assert driver.bind("vector", "[1.0,2.0]") == "[1.0,2.0]"
@@ -0,0 +1,121 @@
+"""Response cache tests"""
+import pytest
+
+from app.services.cache import (
+    CachedResponse,
+    LRUCache,
+    ResponseCache,
+    SemanticIndex,
+    cache_key,
+    canonical_request,
+)
+
+
+class FakeRedis:
+    """Dict-backed stand-in for the two Redis calls the cache makes"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+
+def request(content, temperature=0.0, model="synapse"):
+    return canonical_request(
+        model, [{"role": "user", "content": content}], temperature
+    )
+
+
+def test_cache_key_is_canonical():
+    """Key ignores dict ordering but not content or parameters"""
+    a = request("hello")
+    b = {k: a[k] for k in reversed(list(a))}
+    assert cache_key(a) == cache_key(b)
+    assert cache_key(a) != cache_key(request("hello", temperature=0.7))
+    assert cache_key(a) != cache_key(request("hello!"))
+
+
+def test_lru_evicts_by_count_bytes_and_ttl(monkeypatch):
+    """Oldest entries go first; expired entries are not served"""
+    lru = LRUCache(max_entries=2, max_bytes=10, ttl=60)
+    lru.set("a", CachedResponse("aaaa"))
+    lru.set("b", CachedResponse("bbbb"))
+    lru.get("a")
+    lru.set("c", CachedResponse("cccc"))
+    assert lru.get("b") is None
+    assert lru.get("a") is not None and lru.get("c") is not None
+    assert lru.bytes == 8
+
+    lru.set("d", CachedResponse("dddddd"))
+    assert lru.bytes <= 10
+
+    monkeypatch.setattr("app.services.cache.time.monotonic", lambda: 1e12)
+    assert lru.get("d") is None
+
+
+@pytest.mark.asyncio
+async def test_redis_tier_promotes_to_local():
+    """A fresh process serves from Redis and then from its own LRU"""
+    redis = FakeRedis()
+    await ResponseCache(redis=redis).set(request("hi"), CachedResponse("hello"))
+
+    cache = ResponseCache(redis=redis)
+    assert (await cache.get(request("hi"))).content == "hello"
+    assert (await cache.get(request("hi"))).content == "hello"
+    assert await cache.get(request("bye")) is None
+
+    stats = cache.stats()
+    assert stats["redis_hits"] == 1
+    assert stats["local_hits"] == 1
+    assert stats["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_streamed_response_replays_chunks():
+    """Streamed entries keep their original delta boundaries"""
+    cache = ResponseCache()
+    await cache.set(request("hi"), CachedResponse("Hello", chunks=["Hel", "lo"]))
+    cached = await cache.get(request("hi"))
+    assert cached.deltas() == ["Hel", "lo"]
+    assert CachedResponse("Hello").deltas() == ["Hello"]
+
+
+@pytest.mark.asyncio
+async def test_semantic_tier_serves_near_duplicates():
+    """Similar prompts hit above the threshold, only with equal parameters"""
+
+    async def embed(text):
+        return [text.count("a"), text.count("b"), 1.0]
+
+    cache = ResponseCache(semantic=SemanticIndex(embed, threshold=0.99))
+    await cache.set(request("aaaa b"), CachedResponse("answer"))
+
+    assert (await cache.get(request("b aaaa"))).content == "answer"
+    assert await cache.get(request("bbbb")) is None
+    assert await cache.get(request("b aaaa", temperature=0.7)) is None
+    assert cache.stats()["semantic_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_semantic_miss_embeds_prompt_once():
+    embedded = []
+
+    async def embed(text):
+        embedded.append(text)
+        return [text.count("a"), text.count("b"), 1.0]
+
+    cache = ResponseCache(semantic=SemanticIndex(embed, threshold=0.99), max_pending=1)
+    assert await cache.get(request("aaaa b")) is None
+    await cache.set(request("aaaa b"), CachedResponse("answer"))
+    assert len(embedded) == 1
+    assert (await cache.get(request("b aaaa"))).content == "answer"
+
+    # Vectors of misses that are never stored are bounded
+    await cache.get(request("bbbb"))
+    await cache.get(request("bbbb b"))
+    await cache.set(request("bbbb"), CachedResponse("evicted"))
+    assert len(embedded) == 5
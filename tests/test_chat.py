@@ -0,0 +1,221 @@
+"""Chat completions endpoint tests with stubbed services"""
+import json
+import re
+
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import chat
+from app.core.auth import TokenVerifier
+from app.core.middleware import AuthMiddleware
+from app.services.cache import ResponseCache
+from app.services.context import ContextAssembler
+from app.services.conversations import ConversationStore
+from app.services.llm import LLMService, OpenAIProvider
+from app.services.rate_limit import StreamLimiter
+from app.services.tokens import TokenCounter
+
+MODEL = "openai/gpt-4o-mini"
+
+
+class FakeMemory:
+    async def search(self, user_id, query, limit):
+        return [{"content": f"{user_id} prefers tabs"}]
+
+
+class FakeRAG:
+    async def search(self, query, limit, user_id=None):
+        return [{"filename": "style.md", "content": "Indent with four spaces"}]
+
+
+class Upstream:
+    """OpenAI-compatible upstream that records every request body"""
+
+    def __init__(self, reply="Sure thing"):
+        self.reply = reply
+        self.requests = []
+
+    async def handler(self, request):
+        body = json.loads(request.content)
+        self.requests.append(body)
+        if body["stream"]:
+            events = [
+                "data: " + json.dumps({"choices": [{"delta": {"content": word}}]})
+                for word in re.findall(r"\S+\s*", self.reply)
+            ]
+            return httpx.Response(200, text="\n\n".join(events + ["data: [DONE]"]))
+        return httpx.Response(
+            200,
+            json={
+                "choices": [
+                    {
+                        "message": {"content": self.reply},
+                        "finish_reason": "stop",
+                    }
+                ]
+            },
+        )
+
+
+class Services:
+    def __init__(self, upstream, context=True, cache=None, windows=None):
+        provider = OpenAIProvider(
+            "http://mock", "key", transport=httpx.MockTransport(upstream.handler)
+        )
+        self.llm = LLMService([provider])
+        self.memory = FakeMemory()
+        self.rag = FakeRAG()
+        self.cache = cache
+        self.coalescer = None
+        self.extractor = None
+        self.streams = StreamLimiter(max_streams=4)
+        self.tokens = TokenCounter(windows=windows)
+        self.conversations = ConversationStore()
+        self.context = None
+        if context:
+            self.context = ContextAssembler(
+                self.get, timeouts={"memory": 1.0, "graph": 0, "documents": 1.0}
+            )
+
+    async def get(self, name):
+        return getattr(self, name)
+
+
+def make_client(services: Services) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(AuthMiddleware, verifier=TokenVerifier(), required=False)
+    app.include_router(chat.router, prefix="/v1")
+    app.state.services = services
+    return TestClient(app)
+
+
+def complete(client, messages, user="alice", **options):
+    return client.post(
+        "/v1/chat/completions",
+        json={"model": MODEL, "messages": messages, **options},
+        headers={"X-User-ID": user},
+    )
+
+
+def test_context_is_sent_upstream_with_server_timing():
+    upstream = Upstream()
+    client = make_client(Services(upstream))
+    messages = [
+        {"role": "system", "content": "You are a code reviewer"},
+        {"role": "user", "content": "How should I indent?"},
+    ]
+
+    response = complete(client, messages)
+
+    assert response.status_code == 200
+    timings = response.headers["Server-Timing"].split(", ")
+    assert [t.split(";")[0] for t in timings] == [
+        "memory", "graph", "documents", "context"
+    ]
+    assert timings[0].endswith('desc="ok"')
+    assert timings[1] == 'graph;dur=0.0;desc="disabled"'
+    assert int(response.headers["X-Synapse-Context-Tokens"]) > 0
+
+    [sent] = upstream.requests
+    assert [m["role"] for m in sent["messages"]] == ["system", "system", "user"]
+    context = sent["messages"][1]["content"]
+    assert "alice prefers tabs" in context
+    assert "[style.md]\nIndent with four spaces" in context
+
+
+def test_prompt_that_cannot_fit_is_a_400():
+    upstream = Upstream()
+    services = Services(upstream, context=False, windows={"gpt-4o-mini": 64})
+    client = make_client(services)
+    # Leading system messages are never dropped and each is already minimal
+    rules = [{"role": "system", "content": f"Rule {i}"} for i in range(20)]
+
+    response = complete(client, rules + [{"role": "user", "content": "hi"}])
+
+    assert response.status_code == 400
+    assert "gpt-4o-mini allows" in response.json()["detail"]
+    assert upstream.requests == []
+
+
+def test_long_history_is_fitted_before_going_upstream():
+    upstream = Upstream()
+    services = Services(upstream, context=False, windows={"gpt-4o-mini": 400})
+    client = make_client(services)
+    history = [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": "word " * 40}
+        for i in range(10)
+    ]
+
+    response = complete(
+        client, history + [{"role": "user", "content": "and now?"}], max_tokens=50
+    )
+
+    assert response.status_code == 200
+    [sent] = upstream.requests
+    assert sent["messages"][0]["content"].endswith("to fit the context window]")
+    assert sent["messages"][-1] == {"role": "user", "content": "and now?"}
+    assert services.tokens.count_messages(sent["messages"]) <= 400 - 50
+
+
+def test_resumed_conversation_sends_its_whole_prefix_upstream():
+    upstream = Upstream(reply="Use four spaces")
+    client = make_client(Services(upstream, context=False))
+    first = [
+        {"role": "system", "content": "You are a code reviewer"},
+        {"role": "user", "content": "How should I indent?"},
+    ]
+    assert complete(client, first).headers["X-Synapse-Reused-Messages"] == "0"
+
+    # The client resends the history with the reply and a new question
+    second = first + [
+        {"role": "assistant", "content": "Use four spaces"},
+        {"role": "user", "content": "And line length?"},
+    ]
+    response = complete(client, second)
+    assert response.headers["X-Synapse-Reused-Messages"] == "3"
+    assert upstream.requests[-1]["messages"] == second
+
+    # Another user's identical history starts from scratch
+    response = complete(client, second, user="bob")
+    assert response.headers["X-Synapse-Reused-Messages"] == "0"
+
+    # An edited earlier message matches no stored prefix
+    edited = [first[0], {"role": "user", "content": "How should I wrap?"}]
+    response = complete(client, edited + second[2:])
+    assert response.headers["X-Synapse-Reused-Messages"] == "0"
+    assert upstream.requests[-1]["messages"] == edited + second[2:]
+
+
+def streamed_content(response) -> str:
+    content = ""
+    for line in response.text.splitlines():
+        if line.startswith("data: ") and line != "data: [DONE]":
+            for choice in json.loads(line[6:])["choices"]:
+                content += choice.get("delta", {}).get("content") or ""
+    return content
+
+
+def test_cached_responses_replay_as_json_and_sse():
+    upstream = Upstream(reply="Use four spaces")
+    client = make_client(Services(upstream, context=False, cache=ResponseCache()))
+    messages = [{"role": "user", "content": "How should I indent?"}]
+
+    first = complete(client, messages, temperature=0)
+    assert first.json()["choices"][0]["message"]["content"] == "Use four spaces"
+    again = complete(client, messages, temperature=0, user="bob")
+    assert again.json()["choices"][0]["message"]["content"] == "Use four spaces"
+    streamed = complete(client, messages, temperature=0, stream=True)
+    assert streamed.headers["content-type"].startswith("text/event-stream")
+    assert streamed_content(streamed) == "Use four spaces"
+    assert len(upstream.requests) == 1
+
+    # A completed stream is cached too, and served to both paths
+    other = [{"role": "user", "content": "And line length?"}]
+    first = complete(client, other, temperature=0, stream=True)
+    assert streamed_content(first) == "Use four spaces"
+    streamed = complete(client, other, temperature=0, stream=True)
+    assert streamed_content(streamed) == "Use four spaces"
+    replayed = complete(client, other, temperature=0)
+    assert replayed.json()["choices"][0]["message"]["content"] == "Use four spaces"
+    assert len(upstream.requests) == 2
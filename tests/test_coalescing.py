@@ -0,0 +1,136 @@
+"""Single-flight coalescing tests"""
+import asyncio
+
+import pytest
+
+from app.services.coalescing import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_identical_calls_share_one_upstream():
+    """Followers get the leader's result without a second call"""
+    flights = SingleFlight()
+    calls = 0
+
+    async def upstream():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    results = await asyncio.gather(*(flights.do("k", upstream) for _ in range(5)))
+    assert results == ["answer"] * 5
+    assert calls == 1
+    assert flights.stats() == {"leaders": 1, "coalesced": 4, "in_flight": 0}
+
+    await flights.do("k", upstream)
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_leader_cancellation_does_not_fail_followers():
+    """The upstream call outlives a disconnected leader"""
+    flights = SingleFlight()
+
+    async def upstream():
+        await asyncio.sleep(0.02)
+        return "answer"
+
+    leader = asyncio.ensure_future(flights.do("k", upstream))
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(flights.do("k", upstream))
+    await asyncio.sleep(0)
+    leader.cancel()
+    assert await follower == "answer"
+
+
+@pytest.mark.asyncio
+async def test_errors_fan_out():
+    """Every waiter sees the upstream failure"""
+    flights = SingleFlight()
+
+    async def upstream():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(
+        *(flights.do("k", upstream) for _ in range(3)), return_exceptions=True
+    )
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_stream_fan_out_with_late_joiner():
+    """A follower joining mid-stream still receives every chunk"""
+    flights = SingleFlight()
+    calls = 0
+
+    async def upstream():
+        nonlocal calls
+        calls += 1
+        for chunk in ["a", "b", "c"]:
+            await asyncio.sleep(0.01)
+            yield chunk
+
+    async def consume(delay=0.0):
+        await asyncio.sleep(delay)
+        return [c async for c in flights.stream("k", upstream)]
+
+    results = await asyncio.gather(consume(), consume(0.015))
+    assert results == [["a", "b", "c"], ["a", "b", "c"]]
+    assert calls == 1
+    assert flights.stats()["coalesced"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_waiters_count_from_first_iteration():
+    """A stream that is never iterated does not keep the upstream alive"""
+    flights = SingleFlight()
+
+    async def upstream():
+        for chunk in ["a", "b", "c"]:
+            await asyncio.sleep(0.01)
+            yield chunk
+
+    abandoned = flights.stream("k", upstream)
+    stream = flights.stream("k", upstream)
+    assert await stream.__anext__() == "a"
+    await stream.aclose()
+    await asyncio.sleep(0.001)
+    assert flights.stats()["in_flight"] == 0
+
+    # Starting after the upstream was cancelled fails instead of ending early
+    with pytest.raises(RuntimeError):
+        [c async for c in abandoned]
+
+
+@pytest.mark.asyncio
+async def test_stream_nobody_starts_is_cancelled_after_start_timeout():
+    """A leader that disconnects before its first chunk does not drain upstream"""
+    flights = SingleFlight(start_timeout=0.01)
+    pulled = []
+
+    async def upstream():
+        for chunk in range(100):
+            await asyncio.sleep(0.005)
+            pulled.append(chunk)
+            yield chunk
+
+    abandoned = flights.stream("k", upstream)
+    await asyncio.sleep(0.05)
+    assert flights.stats()["in_flight"] == 0
+    assert len(pulled) < 5
+    with pytest.raises(RuntimeError):
+        [c async for c in abandoned]
+
+
+@pytest.mark.asyncio
+async def test_start_timeout_spares_streams_being_read():
+    flights = SingleFlight(start_timeout=0.01)
+
+    async def upstream():
+        for chunk in ["a", "b", "c"]:
+            await asyncio.sleep(0.01)
+            yield chunk
+
+    assert [c async for c in flights.stream("k", upstream)] == ["a", "b", "c"]
@@ -0,0 +1,89 @@
+"""Context assembly tests"""
+import asyncio
+import time
+
+import pytest
+
+from app.services.context import ContextAssembler, LegResult
+
+
+class FakeMemory:
+    async def search(self, user_id, query, limit):
+        await asyncio.sleep(0.05)
+        return [{"content": f"{user_id} likes {query}"}]
+
+
+class SlowRAG:
+    async def search(self, query, limit, user_id=None):
+        await asyncio.sleep(1.0)
+        return [{"filename": "late.md", "content": "too late"}]
+
+
+class BrokenEntities:
+    async def search(self, embedding, limit):
+        raise RuntimeError("graph down")
+
+
+class FakeEmbeddings:
+    async def embed_one(self, text):
+        return [0.0]
+
+
+def make_assembler(**kwargs):
+    services = {
+        "memory": FakeMemory(),
+        "rag": SlowRAG(),
+        "entities": BrokenEntities(),
+        "embeddings": FakeEmbeddings(),
+    }
+
+    async def get(name):
+        return services[name]
+
+    timeouts = {"memory": 0.5, "documents": 0.1, "graph": 0.5}
+    return ContextAssembler(get, timeouts=timeouts, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_legs_run_concurrently_and_slow_or_failing_legs_are_dropped():
+    started = time.perf_counter()
+    context = await make_assembler().assemble("tea", "alice")
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.3  # bounded by the slowest deadline, not the sum
+    assert {name: leg.status for name, leg in context.legs.items()} == {
+        "memory": "ok",
+        "graph": "error",
+        "documents": "timeout",
+    }
+    assert context.content == "Relevant memories about the user:\n- alice likes tea"
+
+    header = context.headers()["Server-Timing"]
+    assert "memory;dur=" in header and "documents;dur=" in header
+    assert 'desc="timeout"' in header
+
+
+@pytest.mark.asyncio
+async def test_context_is_inserted_after_system_messages():
+    context = await make_assembler().assemble("tea", "alice")
+    messages = context.apply(
+        [
+            {"role": "system", "content": "Be brief."},
+            {"role": "user", "content": "tea?"},
+        ]
+    )
+    assert [m["role"] for m in messages] == ["system", "system", "user"]
+    assert messages[1]["content"] == context.content
+
+
+def test_packing_respects_the_token_budget():
+    assembler = make_assembler(token_budget=10, count_tokens=lambda s: 3)
+    legs = [
+        LegResult("memory", items=["a", "b", "c", "d"]),
+        LegResult("documents", items=["e"]),
+    ]
+    content, tokens = assembler.pack(legs)
+    assert tokens <= 10
+    assert legs[0].packed == 2  # heading + two items = 9 tokens
+    assert legs[1].packed == 0
+    assert "e" not in content.split("\n")
@@ -0,0 +1,63 @@
+"""Conversation prefix state tests"""
+from app.services.context import AssembledContext
+from app.services.conversations import ConversationStore, chain
+from app.services.tokens import TokenCounter
+
+
+def turn(*contents):
+    roles = ["user", "assistant"]
+    return [
+        {"role": roles[i % 2], "content": content} for i, content in enumerate(contents)
+    ]
+
+
+def test_chain_identifies_prefixes():
+    digests = chain(turn("a", "b", "c"))
+    assert digests[:2] == chain(turn("a", "b"))
+    assert chain(turn("a", "x", "c"))[2] != digests[2]
+    assert chain([{"role": "system", "content": "a"}]) != digests[:1]
+
+
+def test_resume_counts_only_the_new_tail():
+    store = ConversationStore()
+    tokens = TokenCounter()
+    first = store.resume("u1", turn("hello"), "gpt-4o", tokens)
+    first.query, first.context = "hello", AssembledContext(legs={}, content="ctx")
+    store.save("u1", first)
+    store.save("u1", store.extend(first, {"role": "assistant", "content": "hi"}, tokens))
+
+    misses = tokens.misses
+    second = store.resume("u1", turn("hello", "hi", "more"), "gpt-4o", tokens)
+    assert second.reused == 2
+    assert tokens.misses == misses + 1
+    assert second.counts == [
+        tokens.count_message(m, "gpt-4o") for m in turn("hello", "hi", "more")
+    ]
+    assert second.context is first.context and second.query == "hello"
+
+
+def test_states_are_per_user_and_model():
+    store = ConversationStore()
+    tokens = TokenCounter()
+    store.save("u1", store.resume("u1", turn("hello"), "gpt-4o", tokens))
+
+    assert store.resume("u2", turn("hello", "hi"), "gpt-4o", tokens).reused == 0
+    other_model = store.resume("u1", turn("hello", "hi"), "claude-3", tokens)
+    assert other_model.reused == 1
+    assert len(other_model.counts) == 2
+
+
+def test_disabled_and_bounded():
+    tokens = TokenCounter()
+    disabled = ConversationStore(ttl=0)
+    disabled.save("u1", disabled.resume("u1", turn("a"), "m", tokens))
+    assert disabled.resume("u1", turn("a", "b"), "m", tokens).reused == 0
+
+    store = ConversationStore(max_users=2, per_user=2)
+    for user in ("u1", "u2", "u3"):
+        for n in range(1, 4):
+            store.save(user, store.resume(user, turn(*"abc"[:n]), "m", tokens))
+    assert store.stats()["users"] == 2
+    assert store.resume("u1", turn("a"), "m", tokens).reused == 0
+    assert store.resume("u3", turn("a"), "m", tokens).reused == 0
+    assert store.resume("u3", turn("a", "b", "c", "d"), "m", tokens).reused == 3
@@ -0,0 +1,101 @@
+"""Content-addressed embedding cache tests"""
+import pytest
+
+from app.services.embedding_cache import EmbeddingCache, embedding_key
+from app.services.embeddings import LocalEmbedder
+from app.services.ingestion import FileProgress, IngestionJob, IngestionPipeline
+
+
+class FakePipeline:
+    def __init__(self, store):
+        self.store = store
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def set(self, key, value, ex=None):
+        self.store[key] = value
+
+    async def execute(self):
+        pass
+
+
+class FakeRedis:
+    def __init__(self):
+        self.store = {}
+
+    async def mget(self, keys):
+        return [self.store.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self.store)
+
+
+def counting_embedder():
+    local = LocalEmbedder(dimensions=8)
+    calls = []
+
+    async def embed(texts):
+        calls.append(list(texts))
+        return await local(texts)
+
+    return embed, calls
+
+
+def test_key_ignores_whitespace_but_not_model():
+    assert embedding_key("m", "hello   world\n") == embedding_key("m", " hello world")
+    assert embedding_key("m", "hello") != embedding_key("other", "hello")
+
+
+@pytest.mark.asyncio
+async def test_only_new_content_is_embedded():
+    embed, calls = counting_embedder()
+    cache = EmbeddingCache("local/hash")
+
+    first, hits = await cache.embed(["a b", "c d", "a b"], embed)
+    assert hits == 0
+    assert calls == [["a b", "c d"]]
+    assert first[0] == first[2]
+
+    second, hits = await cache.embed(["c d", "e f"], embed)
+    assert hits == 1
+    assert calls[-1] == ["e f"]
+    assert second[0] == pytest.approx(first[1])
+
+
+@pytest.mark.asyncio
+async def test_redis_tier_is_shared_between_caches():
+    embed, calls = counting_embedder()
+    redis = FakeRedis()
+    await EmbeddingCache("local/hash", redis=redis).embed(["shared chunk"], embed)
+
+    other = EmbeddingCache("local/hash", redis=redis)
+    _, hits = await other.embed(["shared chunk"], embed)
+    assert hits == 1
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_job_reports_hit_ratio(tmp_path):
+    path = tmp_path / "doc.txt"
+    path.write_text(" ".join(f"word{i}" for i in range(400)))
+    embed, _ = counting_embedder()
+    pipeline = IngestionPipeline(
+        embed, chunk_size=200, chunk_overlap=20, cache=EmbeddingCache("local/hash")
+    )
+
+    async def write(batch):
+        pass
+
+    job = IngestionJob(id="job")
+    for name in ("first.txt", "again.txt"):
+        progress = FileProgress(filename=name, document_id=name)
+        job.files.append(progress)
+        await pipeline.run(str(path), progress, write)
+
+    stats = job.to_dict()["embedding_cache"]
+    assert stats["hits"] == stats["misses"] > 0
+    assert stats["hit_ratio"] == 0.5
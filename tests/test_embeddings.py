@@ -0,0 +1,58 @@
+"""Micro-batching embedder tests"""
+import asyncio
+
+import pytest
+
+from app.services.embeddings import BatchingEmbedder, LocalEmbedder
+
+
+def test_local_embedder_is_deterministic_and_normalized():
+    embedder = LocalEmbedder(dimensions=64)
+    a = embedder.embed_text("the quick brown fox")
+    assert a == embedder.embed_text("The quick brown fox")
+    assert abs(sum(x * x for x in a) - 1.0) < 1e-9
+
+    related = embedder.embed_text("the quick brown dog")
+    unrelated = embedder.embed_text("stock market closing prices")
+    dot = lambda u, v: sum(x * y for x, y in zip(u, v))  # noqa: E731
+    assert dot(a, related) > dot(a, unrelated)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_batches():
+    local = LocalEmbedder(dimensions=16)
+    calls = []
+
+    async def embed(texts):
+        calls.append(list(texts))
+        return await local(texts)
+
+    batching = BatchingEmbedder(embed, max_batch_size=8, max_wait=0.01)
+    texts = [f"text {i % 10}" for i in range(20)]
+    vectors = await asyncio.gather(*(batching.embed_one(t) for t in texts))
+
+    assert vectors == [local.embed_text(t) for t in texts]
+    assert [len(batch) for batch in calls] == [8, 8, 4]
+    # Duplicates within a batch are embedded once
+    assert all(len(set(batch)) == len(batch) for batch in calls)
+    assert batching.stats()["requests"] == 20
+
+
+@pytest.mark.asyncio
+async def test_partial_batch_flushes_after_max_wait():
+    batching = BatchingEmbedder(LocalEmbedder(8), max_batch_size=64, max_wait=0.01)
+    [vector] = await asyncio.wait_for(batching.embed(["lonely"]), 1.0)
+    assert len(vector) == 8
+    assert batching.stats()["batches"] == 1
+
+
+@pytest.mark.asyncio
+async def test_upstream_error_reaches_every_caller():
+    async def embed(texts):
+        raise RuntimeError("provider down")
+
+    batching = BatchingEmbedder(embed, max_batch_size=4, max_wait=0.001)
+    results = await asyncio.gather(
+        *(batching.embed_one(f"t{i}") for i in range(3)), return_exceptions=True
+    )
+    assert all(isinstance(r, RuntimeError) for r in results)
@@ -0,0 +1,34 @@
+"""Knowledge graph store tests"""
+import uuid
+
+import pytest
+
+from app.services.entities import EntityStore, NeighborhoodCache
+
+
+def test_neighborhood_cache_expires_and_evicts(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("app.services.entities.time.monotonic", lambda: now[0])
+    cache = NeighborhoodCache(max_entries=2, ttl=10)
+
+    cache.set(("a",), [1])
+    cache.set(("b",), [2])
+    assert cache.get(("a",)) == [1]
+    cache.set(("c",), [3])  # evicts the least recently used, "b"
+    assert cache.get(("b",)) is None
+
+    now[0] += 11
+    assert cache.get(("a",)) is None
+    assert cache.hits == 1 and cache.misses == 2
+
+
+@pytest.mark.asyncio
+async def test_cached_neighborhoods_skip_the_database():
+    """Warm entities are served from cache; ids are matched canonically"""
+    entity_id = str(uuid.uuid4())
+    store = EntityStore(engine=None, cache=NeighborhoodCache())
+    params = (2, (), 0.0, 50, False)
+    store.cache.set((entity_id, *params), [{"id": "neighbor"}])
+
+    result = await store.neighborhoods([entity_id.upper(), "not-a-uuid"])
+    assert result == {entity_id.upper(): [{"id": "neighbor"}], "not-a-uuid": []}
@@ -0,0 +1,218 @@
+"""Background memory extraction tests"""
+import asyncio
+
+import pytest
+
+from app.services.extraction import (
+    MemoryExtractor,
+    Turn,
+    explicit_statements,
+    parse_statements,
+    transcript,
+)
+from app.services.llm import LLMService
+from app.services.memory import MemoryService
+
+
+class FakeCompletion:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeLLM:
+    providers = {"openai": None}
+
+    def __init__(self):
+        self.calls = []
+
+    async def complete(self, model, messages, temperature=None, max_tokens=None):
+        self.calls.append(messages[-1]["content"])
+        return FakeCompletion('Sure: ["Favorite color is blue", "Uses Python"]')
+
+
+class FakeMemory:
+    def __init__(self, failures=0):
+        self.added = []
+        self.failures = failures
+
+    async def add_many(self, user_id, contents, type="general", **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("database down")
+        self.added.append((user_id, contents))
+        return contents
+
+
+def test_parse_statements():
+    assert parse_statements('["a", " b ", 3, ""]') == ["a", "b"]
+    assert parse_statements("nothing here") == []
+    assert parse_statements("[not json]") == []
+
+
+def test_explicit_statements_and_transcript():
+    turns = [
+        Turn("u1", [{"role": "user", "content": "Remember that my dog is Rex."}]),
+        Turn("u1", [{"role": "assistant", "content": "remember this"}]),
+    ]
+    assert explicit_statements(turns) == ["my dog is Rex"]
+    text = transcript(turns, max_chars=30)
+    assert text == "assistant: remember this"
+
+
+@pytest.mark.asyncio
+async def test_explicit_statements_without_providers():
+    async def get(name):
+        return LLMService([])
+
+    extractor = MemoryExtractor(get)
+    turns = [Turn("u1", [{"role": "user", "content": "Remember I use vim"}])]
+    assert await extractor.extract(turns) == ["I use vim"]
+
+
+@pytest.mark.asyncio
+async def test_local_worker_batches_per_user():
+    llm, memory = FakeLLM(), FakeMemory()
+    services = {"llm": llm, "memory": memory}
+
+    async def get(name):
+        return services[name]
+
+    extractor = MemoryExtractor(get, batch_wait=0.05)
+    extractor.start()
+    try:
+        extractor.submit("u1", [{"role": "user", "content": "I like blue"}])
+        extractor.submit("u1", [{"role": "user", "content": "I use Python"}])
+        extractor.submit("u2", [{"role": "user", "content": "hi"}])
+        for _ in range(50):
+            if len(memory.added) == 2:
+                break
+            await asyncio.sleep(0.02)
+    finally:
+        await extractor.close()
+
+    assert len(llm.calls) == 2
+    assert any("blue" in call and "Python" in call for call in llm.calls)
+    assert sorted(user for user, _ in memory.added) == ["u1", "u2"]
+    assert extractor.stats()["stored"] == 4
+
+
+class FakeStream:
+    """Redis stream whose group creation and first ack fail"""
+
+    def __init__(self, entries, failures=1):
+        self.entries = list(entries)
+        self.failures = {"xgroup_create": failures, "xack": failures}
+        self.acked = []
+        self.pending = {}
+
+    def _fail(self, command):
+        if self.failures[command]:
+            self.failures[command] -= 1
+            raise ConnectionError(f"{command} failed")
+
+    async def xgroup_create(self, stream, group, id, mkstream):
+        self._fail("xgroup_create")
+
+    async def xautoclaim(self, stream, group, consumer, idle, start_id, count):
+        return "0-0", list(self.pending.items()), []
+
+    async def xreadgroup(self, group, consumer, streams, count, block):
+        if not self.entries:
+            await asyncio.sleep(block / 1000)
+            return []
+        batch, self.entries = self.entries[:1], self.entries[1:]
+        self.pending.update(batch)
+        return [("stream", batch)]
+
+    async def xack(self, stream, group, *ids):
+        self._fail("xack")
+        self.acked += ids
+        for entry_id in ids:
+            self.pending.pop(entry_id, None)
+
+
+@pytest.mark.asyncio
+async def test_stream_worker_survives_redis_errors():
+    memory = FakeMemory()
+    services = {"llm": None, "memory": memory}
+
+    async def get(name):
+        return services[name]
+
+    entries = [
+        (f"{i}-0", Turn("u1", [{"role": "user", "content": f"Remember {i}"}]).dumps())
+        for i in range(2)
+    ]
+    redis = FakeStream(entries)
+    extractor = MemoryExtractor(get, redis=redis, batch_wait=0.01)
+    extractor.start()
+    try:
+        for _ in range(100):
+            if redis.acked:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await extractor.close()
+
+    assert redis.acked == ["1-0"]
+    assert [contents for _, contents in memory.added] == [["0"], ["1"]]
+
+
+@pytest.mark.asyncio
+async def test_failed_users_stay_pending_until_reclaimed():
+    memory = FakeMemory(failures=1)
+    services = {"llm": None, "memory": memory}
+
+    async def get(name):
+        return services[name]
+
+    entries = [
+        (f"{i}-0", Turn(user, [{"role": "user", "content": f"Remember {i}"}]).dumps())
+        for i, user in enumerate(["u1", "u2"])
+    ]
+    redis = FakeStream(entries, failures=0)
+    extractor = MemoryExtractor(get, redis=redis, batch_wait=0.01, claim_idle=0.05)
+    # Users are extracted in order, so u1 meets the failing write
+    extractor.start()
+    try:
+        for _ in range(100):
+            if len(redis.acked) == 2:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await extractor.close()
+
+    assert redis.acked == ["1-0", "0-0"]
+    assert redis.pending == {}
+    assert [user for user, _ in memory.added] == ["u2", "u1"]
+    assert extractor.stats()["failed"] == 1
+
+
+class FakeStore:
+    def __init__(self, existing):
+        self.existing = existing
+        self.inserted = []
+
+    async def search(self, user_id, embedding, limit):
+        score = sum(a * b for a, b in zip(embedding, self.existing))
+        return [{"score": score}]
+
+    async def add_many(self, user_id, contents, embeddings, type, metadata):
+        self.inserted.extend(contents)
+        return [{"content": c} for c in contents]
+
+
+@pytest.mark.asyncio
+async def test_add_many_skips_near_duplicates():
+    vectors = {"old fact": [1.0, 0.0], "new fact": [0.0, 1.0], "new fact!": [0.1, 1.0]}
+
+    async def embed(texts):
+        return [vectors[t] for t in texts]
+
+    store = FakeStore(existing=[1.0, 0.0])
+    service = MemoryService(store, embed)
+    stored = await service.add_many(
+        "u1", ["old fact", "new fact", "new fact!", "new fact"], dedupe_threshold=0.9
+    )
+    assert [m["content"] for m in stored] == ["new fact"]
+    assert store.inserted == ["new fact"]
@@ -0,0 +1,101 @@
+"""Streaming ingestion pipeline tests"""
+import asyncio
+
+import pytest
+
+from app.services.ingestion import (
+    FileProgress,
+    IngestionPipeline,
+    buffered,
+    decode_text,
+    split_chunks,
+)
+
+
+async def collect(source):
+    return [item async for item in source]
+
+
+async def pieces(*items):
+    for item in items:
+        yield item
+
+
+@pytest.mark.asyncio
+async def test_decode_keeps_multibyte_characters_across_blocks():
+    data = "naïve café ☕".encode()
+    blocks = [data[i : i + 1] for i in range(len(data))]
+    assert "".join(await collect(decode_text(pieces(*blocks)))) == "naïve café ☕"
+
+
+@pytest.mark.asyncio
+async def test_split_chunks_bounds_size_and_overlaps():
+    words = " ".join(f"w{i}" for i in range(500))
+    chunks = await collect(split_chunks(pieces(words[:700], words[700:]), 100, 20))
+
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert chunks[0].split()[0] == "w0"
+    assert chunks[-1].split()[-1] == "w499"
+    # Every chunk starts inside the previous one
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk[:10] in previous[-20:]
+
+
+@pytest.mark.asyncio
+async def test_buffered_applies_backpressure():
+    produced = 0
+
+    async def source():
+        nonlocal produced
+        for i in range(100):
+            produced += 1
+            yield i
+
+    stream = buffered(source(), maxsize=2)
+    assert await stream.__anext__() == 0
+    await asyncio.sleep(0.01)
+    assert produced <= 4
+    await stream.aclose()
+
+
+@pytest.mark.asyncio
+async def test_pipeline_embeds_and_writes_in_batches(tmp_path):
+    path = tmp_path / "doc.txt"
+    path.write_text(" ".join(f"word{i}" for i in range(2000)))
+    embed_calls = []
+    written = []
+
+    async def embed(texts):
+        embed_calls.append(len(texts))
+        return [[float(len(t))] for t in texts]
+
+    async def write(batch):
+        written.extend(batch)
+
+    pipeline = IngestionPipeline(
+        embed, block_size=256, chunk_size=200, chunk_overlap=20, embed_batch_size=8
+    )
+    progress = FileProgress(filename="doc.txt", document_id="d1")
+    await pipeline.run(str(path), progress, write)
+
+    assert progress.bytes_read == path.stat().st_size
+    assert progress.chunks_inserted == len(written) == sum(embed_calls)
+    assert max(embed_calls) == 8
+    assert [index for index, _, _ in written] == list(range(len(written)))
+
+
+@pytest.mark.asyncio
+async def test_pipeline_rejects_binary_formats(tmp_path):
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(b"%PDF-1.7")
+
+    async def embed(texts):
+        return []
+
+    async def write(batch):
+        pass
+
+    with pytest.raises(ValueError):
+        await IngestionPipeline(embed).run(
+            str(path), FileProgress(filename="doc.pdf", document_id="d1"), write
+        )
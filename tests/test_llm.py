@@ -0,0 +1,198 @@
+"""LLM provider engine tests"""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.services.llm import (
+    AnthropicProvider,
+    LLMService,
+    OllamaProvider,
+    OpenAIProvider,
+    ProviderError,
+)
+
+MESSAGES = [
+    {"role": "system", "content": "be brief"},
+    {"role": "user", "content": "hi"},
+]
+
+
+def openai_handler(request: httpx.Request) -> httpx.Response:
+    body = json.loads(request.content)
+    if body["stream"]:
+        lines = [
+            'data: {"choices":[{"delta":{"content":"Hel"}}]}',
+            'data: {"choices":[{"delta":{"content":"lo"}}]}',
+            "data: [DONE]",
+        ]
+        return httpx.Response(200, text="\n\n".join(lines))
+    return httpx.Response(
+        200,
+        json={
+            "model": body["model"],
+            "choices": [
+                {"message": {"content": "Hello"}, "finish_reason": "stop"}
+            ],
+            "usage": {"prompt_tokens": 3, "completion_tokens": 1},
+        },
+    )
+
+
+@pytest.mark.asyncio
+async def test_openai_complete_and_stream():
+    """OpenAI wire format is normalized for both call styles"""
+    provider = OpenAIProvider(
+        "http://mock/v1", "key", transport=httpx.MockTransport(openai_handler)
+    )
+    completion = await provider.complete("gpt-4o", MESSAGES)
+    assert completion.content == "Hello"
+    assert completion.usage == {
+        "prompt_tokens": 3,
+        "completion_tokens": 1,
+        "total_tokens": 4,
+    }
+    assert [d async for d in provider.stream("gpt-4o", MESSAGES)] == ["Hel", "lo"]
+    await provider.close()
+
+
+@pytest.mark.asyncio
+async def test_anthropic_moves_system_prompt():
+    """System messages go to the top-level system field"""
+    seen = {}
+
+    def handler(request):
+        seen.update(json.loads(request.content))
+        assert request.headers["x-api-key"] == "key"
+        return httpx.Response(
+            200,
+            json={
+                "content": [{"type": "text", "text": "Hi"}],
+                "stop_reason": "end_turn",
+                "usage": {"input_tokens": 2, "output_tokens": 1},
+            },
+        )
+
+    provider = AnthropicProvider(
+        "http://mock", "key", transport=httpx.MockTransport(handler)
+    )
+    completion = await provider.complete("claude", MESSAGES)
+    assert completion.content == "Hi"
+    assert seen["system"] == "be brief"
+    assert seen["messages"] == [{"role": "user", "content": "hi"}]
+    await provider.close()
+
+
+@pytest.mark.asyncio
+async def test_ollama_stream_ndjson():
+    """Ollama NDJSON stream yields deltas until done"""
+
+    def handler(request):
+        lines = [
+            json.dumps({"message": {"content": "a"}, "done": False}),
+            json.dumps({"message": {"content": "b"}, "done": False}),
+            json.dumps({"done": True}),
+        ]
+        return httpx.Response(200, text="\n".join(lines))
+
+    provider = OllamaProvider("http://mock", transport=httpx.MockTransport(handler))
+    assert [d async for d in provider.stream("llama3", MESSAGES)] == ["a", "b"]
+    await provider.close()
+
+
+@pytest.mark.asyncio
+async def test_provider_errors_and_concurrency_limit():
+    """Upstream errors raise ProviderError; in-flight calls are capped"""
+    active = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        if json.loads(request.content)["model"] == "bad":
+            return httpx.Response(429, text="slow down")
+        return openai_handler(request)
+
+    provider = OpenAIProvider(
+        "http://mock/v1",
+        "key",
+        max_concurrency=2,
+        transport=httpx.MockTransport(handler),
+    )
+    await asyncio.gather(*(provider.complete("gpt", MESSAGES) for _ in range(6)))
+    assert peak == 2
+
+    with pytest.raises(ProviderError) as exc:
+        await provider.complete("bad", MESSAGES)
+    assert exc.value.status_code == 429
+    await provider.close()
+
+
+@pytest.mark.asyncio
+async def test_transport_errors_become_provider_errors():
+    """Dead hosts and timeouts map to 502 / 504 instead of escaping raw"""
+
+    async def refuse(request):
+        raise httpx.ConnectError("connection refused", request=request)
+
+    async def stall(request):
+        raise httpx.ReadTimeout("read timed out", request=request)
+
+    for handler, status_code in ((refuse, 502), (stall, 504)):
+        provider = OllamaProvider(
+            "http://localhost:11434", transport=httpx.MockTransport(handler)
+        )
+        with pytest.raises(ProviderError) as exc:
+            await provider.complete("llama3", MESSAGES)
+        assert exc.value.status_code == status_code
+        with pytest.raises(ProviderError) as exc:
+            async for _ in provider.stream("llama3", MESSAGES):
+                pass
+        assert exc.value.status_code == status_code
+        with pytest.raises(ProviderError) as exc:
+            await provider.embed("nomic-embed-text", ["hi"])
+        assert exc.value.status_code == status_code
+        await provider.close()
+
+
+def test_model_resolution():
+    """Prefixed models pick a provider; others use the default"""
+    openai = OpenAIProvider("http://mock/v1", "key")
+    ollama = OllamaProvider("http://mock")
+    service = LLMService([openai, ollama])
+
+    assert service.resolve("ollama/qwen2") == (ollama, "qwen2")
+    assert service.resolve("synapse") == (openai, openai.default_model)
+    assert service.resolve("gpt-4o") == (openai, openai.default_model)
+
+    with pytest.raises(ProviderError):
+        LLMService([]).resolve("synapse")
+
+
+@pytest.mark.asyncio
+async def test_embeddings_batch_and_routing():
+    """One upstream call per batch, results kept in input order"""
+    calls = 0
+
+    def handler(request):
+        nonlocal calls
+        calls += 1
+        texts = json.loads(request.content)["input"]
+        data = [{"index": i, "embedding": [float(len(t))]} for i, t in enumerate(texts)]
+        return httpx.Response(200, json={"data": list(reversed(data))})
+
+    provider = OpenAIProvider(
+        "http://mock/v1", "key", transport=httpx.MockTransport(handler)
+    )
+    service = LLMService([provider])
+    vectors = await service.embed(["a", "bbb"], model="openai/text-embedding-3-small")
+    assert vectors == [[1.0], [3.0]]
+    assert calls == 1
+
+    with pytest.raises(ProviderError):
+        await service.embed(["a"], model="ollama/nomic-embed-text")
+    await provider.close()
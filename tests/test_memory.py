@@ -0,0 +1,256 @@
+"""pgvector memory store tests"""
+import datetime
+from collections import namedtuple
+
+import pytest
+
+from app.services.memory import (
+    _INSERT_MANY,
+    _SEARCH_ANN,
+    _SEARCH_EXACT,
+    MemoryService,
+    MemoryStore,
+    memory_schema,
+    vector_literal,
+)
+
+CREATED = datetime.datetime(2024, 5, 1, 12, 30)
+
+Memory = namedtuple("Memory", "id user_id content type metadata created_at")
+Scored = namedtuple("Scored", "id user_id content type metadata created_at score")
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = list(rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def all(self):
+        return self.rows
+
+    def one(self):
+        [row] = self.rows
+        return row
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+
+class FakeConnection:
+    def __init__(self, handler):
+        self.handler = handler
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement, params=None):
+        self.calls.append((statement, params))
+        return FakeResult(self.handler(statement, params))
+
+
+class FakeEngine:
+    """Engine whose statements are answered by ``handler(statement, params)``"""
+
+    def __init__(self, handler=lambda statement, params: []):
+        self.connection = FakeConnection(handler)
+
+    def connect(self):
+        return self.connection
+
+    def begin(self):
+        return self.connection
+
+    @property
+    def calls(self):
+        return self.connection.calls
+
+
+def parse_vector(literal):
+    return [float(x) for x in literal[1:-1].split(",")]
+
+
+def test_schema_partitions_by_user():
+    statements = memory_schema(8, partitions=4, m=24, ef_construction=128)
+    assert "PARTITION BY HASH (user_id)" in statements[0]
+    assert "PRIMARY KEY (user_id, id)" in statements[0]
+    assert "vector(8)" in statements[0]
+    partitions = [s for s in statements if "PARTITION OF" in s]
+    assert [f"REMAINDER {i})" in p for i, p in enumerate(partitions)] == [True] * 4
+    assert all("MODULUS 4," in p for p in partitions)
+    assert "WITH (m = 24, ef_construction = 128)" in statements[-1]
+
+
+def test_store_rejects_unknown_search_mode():
+    with pytest.raises(ValueError):
+        MemoryStore(FakeEngine(), search_mode="fuzzy")
+
+
+@pytest.mark.asyncio
+async def test_store_rejects_wrong_dimensions():
+    store = MemoryStore(FakeEngine(), dimensions=3)
+    with pytest.raises(ValueError):
+        await store.search("alice", [1.0, 0.0])
+    with pytest.raises(ValueError):
+        await store.add_many("alice", ["a"], [[1.0, 0.0]])
+
+
+@pytest.mark.asyncio
+async def test_exact_search_binds_parameters_and_maps_rows():
+    rows = [
+        Scored("m1", "alice", "Likes tea", "general", {"source": "chat"}, CREATED, 0.9),
+        Scored("m2", "alice", "Uses vim", "extracted", None, CREATED, 0.5),
+    ]
+    engine = FakeEngine(lambda statement, params: rows)
+    store = MemoryStore(engine, dimensions=3, search_mode="exact", ef_search=64)
+
+    results = await store.search("alice", [0.5, 0.25, 1.0], limit=2)
+
+    # Exact mode scans one partition and never touches hnsw.ef_search
+    [(statement, params)] = engine.calls
+    assert statement is _SEARCH_EXACT
+    assert params == {"user_id": "alice", "embedding": "[0.5,0.25,1]", "limit": 2}
+    assert results == [
+        {
+            "id": "m1",
+            "user_id": "alice",
+            "content": "Likes tea",
+            "type": "general",
+            "metadata": {"source": "chat"},
+            "created_at": "2024-05-01T12:30:00",
+            "score": 0.9,
+        },
+        {
+            "id": "m2",
+            "user_id": "alice",
+            "content": "Uses vim",
+            "type": "extracted",
+            "metadata": {},
+            "created_at": "2024-05-01T12:30:00",
+            "score": 0.5,
+        },
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "ef_search, limit, expected", [(64, 10, "64"), (64, 100, "100")]
+)
+async def test_ann_search_sets_ef_search_in_the_same_transaction(
+    ef_search, limit, expected
+):
+    engine = FakeEngine()
+    store = MemoryStore(engine, dimensions=2, search_mode="ann", ef_search=ef_search)
+    await store.search("alice", [1.0, 0.0], limit=limit)
+    (config, config_params), (statement, params) = engine.calls
+    assert "hnsw.ef_search" in config.text
+    assert config_params == {"value": expected}
+    assert statement is _SEARCH_ANN
+    assert params == {"user_id": "alice", "embedding": "[1,0]", "limit": limit}
+
+
+@pytest.mark.asyncio
+async def test_ann_search_without_ef_search_keeps_server_default():
+    engine = FakeEngine()
+    store = MemoryStore(engine, dimensions=2, search_mode="ann")
+    await store.search("alice", [1.0, 0.0])
+    [(statement, _)] = engine.calls
+    assert statement is _SEARCH_ANN
+
+
+@pytest.mark.asyncio
+async def test_add_many_is_one_statement_in_contents_order():
+    def insert(statement, params):
+        # RETURNING order is not guaranteed
+        return [
+            Memory(f"id-{c}", params["user_id"], c, params["type"], {}, CREATED)
+            for c in reversed(params["contents"])
+        ]
+
+    engine = FakeEngine(insert)
+    store = MemoryStore(engine, dimensions=2)
+    stored = await store.add_many(
+        "alice", ["a", "b"], [[1.0, 0.0], [0.0, 1.0]], type="extracted"
+    )
+    [(statement, params)] = engine.calls
+    assert statement is _INSERT_MANY
+    assert params == {
+        "user_id": "alice",
+        "contents": ["a", "b"],
+        "type": "extracted",
+        "metadata": "{}",
+        "embeddings": ["[1,0]", "[0,1]"],
+    }
+    assert [m["id"] for m in stored] == ["id-a", "id-b"]
+    assert "score" not in stored[0]
+
+
+@pytest.mark.asyncio
+async def test_add_many_drops_near_duplicates():
+    vectors = {
+        "Likes tea": [0.99, 0.1, 0.0],
+        "Lives in Oslo": [0.0, 1.0, 0.0],
+        "Lives in Oslo, Norway": [0.0, 0.98, 0.15],
+        "Uses vim": [0.0, 0.0, 1.0],
+    }
+    known = [1.0, 0.0, 0.0]
+
+    def database(statement, params):
+        if statement is _SEARCH_EXACT:
+            # The user already has a memory pointing along ``known``
+            vector = parse_vector(params["embedding"])
+            norm = sum(x * x for x in vector) ** 0.5
+            score = sum(a * b for a, b in zip(vector, known)) / norm
+            return [Scored("m0", "alice", "Likes tea", "general", {}, CREATED, score)]
+        assert statement is _INSERT_MANY
+        return [
+            Memory(f"id-{i}", "alice", c, "extracted", {}, CREATED)
+            for i, c in enumerate(params["contents"])
+        ]
+
+    async def embed(texts):
+        return [vectors[t] for t in texts]
+
+    engine = FakeEngine(database)
+    service = MemoryService(MemoryStore(engine, dimensions=3), embed)
+    stored = await service.add_many(
+        "alice",
+        ["Likes tea", "Lives in Oslo", "Lives in Oslo, Norway", "Uses vim", "Uses vim"],
+        type="extracted",
+        dedupe_threshold=0.9,
+    )
+
+    assert [m["content"] for m in stored] == ["Lives in Oslo", "Uses vim"]
+    statement, params = engine.calls[-1]
+    assert statement is _INSERT_MANY
+    assert params["contents"] == ["Lives in Oslo", "Uses vim"]
+    assert params["embeddings"] == [
+        vector_literal(vectors["Lives in Oslo"]),
+        vector_literal(vectors["Uses vim"]),
+    ]
+    # One nearest-neighbour probe per distinct candidate
+    searches = [call for call in engine.calls if call[0] is _SEARCH_EXACT]
+    assert len(searches) == 4
+
+
+@pytest.mark.asyncio
+async def test_add_many_without_threshold_keeps_everything():
+    async def embed(texts):
+        return [[1.0, 0.0] for _ in texts]
+
+    def database(statement, params):
+        return [
+            Memory(c, "alice", c, "general", {}, CREATED) for c in params["contents"]
+        ]
+
+    engine = FakeEngine(database)
+    service = MemoryService(MemoryStore(engine, dimensions=2), embed)
+    stored = await service.add_many("alice", ["a", " a ", "b", ""])
+    assert [m["content"] for m in stored] == ["a", "b"]
+    [(statement, _)] = engine.calls
+    assert statement is _INSERT_MANY
@@ -0,0 +1,153 @@
+"""Per-user hot memory cache tests"""
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.services.memory_cache import MemoryCache, normalize
+
+
+def memory(memory_id):
+    return {"id": memory_id, "content": f"memory {memory_id}"}
+
+
+class FakeRedis:
+    def __init__(self):
+        self.published = []
+
+    async def publish(self, channel, message):
+        self.published.append(message)
+
+
+def make_cache(store, **kwargs):
+    loads = []
+
+    async def loader(user_id):
+        loads.append(user_id)
+        await asyncio.sleep(0.01)
+        rows = store.get(user_id, [])
+        if len(rows) > 3:
+            return None
+        vectors = np.array([v for _, v in rows], dtype=np.float32).reshape(-1, 2)
+        return [m for m, _ in rows], vectors
+
+    return MemoryCache(loader, **kwargs), loads
+
+
+@pytest.mark.asyncio
+async def test_search_is_ranked_and_loads_once():
+    """Concurrent misses share one load; results are ranked by cosine"""
+    store = {
+        "u": [(memory("a"), [1, 0]), (memory("b"), [0, 1]), (memory("c"), [1, 1])]
+    }
+    cache, loads = make_cache(store)
+
+    entries = await asyncio.gather(*(cache.get("u") for _ in range(5)))
+    assert loads == ["u"]
+
+    results = entries[0].search(normalize([1, 0.1]), limit=2)
+    assert [r["id"] for r in results] == ["a", "c"]
+    assert results[0]["score"] > results[1]["score"]
+    assert (await cache.get("u")) is entries[0]
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_write_through_and_invalidation():
+    """Local writes patch the entry; remote writes evict it"""
+    store = {"u": [(memory("a"), [1, 0])]}
+    redis = FakeRedis()
+    cache, loads = make_cache(store, redis=redis)
+
+    entry = await cache.get("u")
+    await cache.added("u", memory("b"), [0, 1])
+    assert [m["id"] for m in entry.memories] == ["b", "a"]
+    assert entry.search(normalize([0, 1]), 1)[0]["id"] == "b"
+
+    await cache.removed("u", "a")
+    assert [m["id"] for m in entry.memories] == ["b"]
+    assert entry.matrix.shape == (1, 2)
+    assert len(redis.published) == 2
+
+    cache.handle_invalidation(redis.published[0])
+    assert len(cache) == 1  # own messages are ignored
+    cache.handle_invalidation("other-pod:u")
+    assert len(cache) == 0
+    await cache.get("u")
+    assert loads == ["u", "u"]
+
+
+@pytest.mark.asyncio
+async def test_bounds_and_oversized_users():
+    """LRU respects user and byte limits; huge users are not cached"""
+    store = {f"u{i}": [(memory(f"m{i}"), [1, 0])] for i in range(3)}
+    store["big"] = [(memory(str(i)), [1, 0]) for i in range(4)]
+    cache, _ = make_cache(store, max_users=2)
+
+    for user in ("u0", "u1", "u2"):
+        await cache.get(user)
+    assert len(cache) == 2
+    assert cache.bytes == 2 * 2 * 4
+
+    assert await cache.get("big") is None
+    assert len(cache) == 2
+
+
+@pytest.mark.asyncio
+async def test_oversized_users_are_not_reloaded_until_they_change():
+    store = {"big": [(memory(str(i)), [1, 0]) for i in range(4)]}
+    cache, loads = make_cache(store)
+
+    for _ in range(5):
+        assert await cache.get("big") is None
+    assert loads == ["big"]
+
+    # A deletion may bring the user under the limit
+    store["big"].pop()
+    await cache.removed("big", "3")
+    assert await cache.get("big") is not None
+    assert loads == ["big", "big"]
+
+
+@pytest.mark.asyncio
+async def test_write_through_respects_load_limits():
+    """Entries grown past the per-user or byte limit are dropped"""
+    store = {
+        "u": [(memory("a"), [1, 0])],
+        "v": [(memory("v"), [1, 0])],
+        "w": [(memory("w"), [1, 0])],
+    }
+    cache, loads = make_cache(store, max_per_user=3, max_bytes=5 * 2 * 4)
+    for user in ("u", "v", "w"):
+        await cache.get(user)
+
+    # Two more fit the per-user limit; the byte budget evicts the idlest user
+    await cache.added_many("u", [memory("b"), memory("c")], [[0, 1], [1, 1]])
+    assert cache.bytes == 5 * 2 * 4
+    await cache.added("w", memory("x"), [0, 1])
+    assert "u" in cache._entries and "v" not in cache._entries
+    assert cache.bytes == sum(e.nbytes for e in cache._entries.values())
+
+    await cache.added("u", memory("d"), [0, 1])
+    assert "u" not in cache._entries
+    assert cache.bytes == 2 * 2 * 4
+    assert await cache.get("u") is None
+    assert loads == ["u", "v", "w"]
+    assert cache.stats()["oversized_users"] == 1
+
+
+@pytest.mark.asyncio
+async def test_invalidation_during_load_discards_it():
+    store = {"u": [(memory("a"), [1, 0])]}
+    cache, loads = make_cache(store)
+
+    load = asyncio.ensure_future(cache.get("u"))
+    await asyncio.sleep(0.005)  # the loader takes 10ms
+    assert "u" in cache._loading
+    cache.evict("u")
+    assert await load is not None
+    assert len(cache) == 0
+    # No per-user bookkeeping outlives the load
+    assert cache._loading == {}
+    await cache.get("u")
+    assert len(cache) == 1
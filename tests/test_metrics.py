@@ -0,0 +1,108 @@
+"""Prometheus metrics tests"""
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.chat import upstream_label
+from app.core.metrics import NOOP, Metrics
+from app.core.middleware import MetricsMiddleware
+from app.services.llm import LLMService, OpenAIProvider
+
+
+def sample(metrics: Metrics, name: str, **labels) -> float:
+    value = metrics.registry.get_sample_value(name, labels)
+    return value or 0.0
+
+
+def test_disabled_metrics_are_noops():
+    metrics = Metrics(enabled=False)
+    assert metrics.upstream_latency("openai", "complete") is NOOP
+    timer = metrics.stream_timer("gpt-4o", time.perf_counter())
+    timer.delta()
+    timer.delta()
+    metrics.track_caches(lambda: {})
+
+
+def test_children_are_bound_once():
+    metrics = Metrics(enabled=True)
+    child = metrics.upstream_latency("openai", "stream")
+    assert metrics.upstream_latency("openai", "stream") is child
+    child.observe(0.2)
+    assert sample(
+        metrics,
+        "synapse_upstream_duration_seconds_count",
+        provider="openai",
+        kind="stream",
+    ) == 1
+
+
+def test_stream_timer_records_ttft_and_gaps():
+    metrics = Metrics(enabled=True)
+    timer = metrics.stream_timer("openai", time.perf_counter())
+    for _ in range(4):
+        timer.delta()
+    assert sample(metrics, "synapse_stream_ttft_seconds_count", upstream="openai") == 1
+    assert sample(
+        metrics, "synapse_stream_inter_token_seconds_count", upstream="openai"
+    ) == 3
+
+
+def test_stream_labels_are_bounded():
+    llm = LLMService(
+        [OpenAIProvider("http://mock", "key")],
+        routes={"synapse-fast": ["openai/gpt-4o-mini"]},
+    )
+    assert upstream_label(llm, "synapse-fast") == "synapse-fast"
+    assert upstream_label(llm, "openai/made-up-1") == "openai"
+    assert upstream_label(llm, "anything-else") == "openai"
+
+
+def test_cache_hit_ratios_are_read_at_scrape_time():
+    metrics = Metrics(enabled=True)
+    stats = {"response": (3, 1)}
+    metrics.track_caches(lambda: stats)
+    assert sample(metrics, "synapse_cache_hit_ratio", cache="response") == 0.75
+    stats["response"] = (9, 1)
+    assert sample(metrics, "synapse_cache_hits_total", cache="response") == 9
+    body, content_type = metrics.exposition()
+    assert b"synapse_cache_hit_ratio" in body
+    assert content_type.startswith("text/plain")
+
+
+def test_tracking_caches_again_replaces_the_source():
+    metrics = Metrics(enabled=True)
+    metrics.track_caches(lambda: {"response": (1, 1)})
+    metrics.track_caches(lambda: {"response": (4, 0)})
+    assert sample(metrics, "synapse_cache_hit_ratio", cache="response") == 1.0
+    body, _ = metrics.exposition()
+    assert body.count(b"synapse_cache_hit_ratio{") == 1
+
+
+def test_middleware_labels_requests_by_route_template():
+    metrics = Metrics(enabled=True)
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+    @app.get("/api/memory/{user_id}")
+    async def memory(user_id: str):
+        return {"user_id": user_id}
+
+    client = TestClient(app)
+    client.get("/api/memory/alice")
+    client.get("/api/memory/bob")
+    client.get("/nowhere")
+    name = "synapse_request_duration_seconds_count"
+    assert sample(metrics, name, method="GET", route="/api/memory/{user_id}") == 2
+    assert sample(metrics, name, method="GET", route="unmatched") == 1
+
+
+def test_observation_is_cheap():
+    metrics = Metrics(enabled=True)
+    child = metrics.upstream_latency("openai", "complete")
+    runs = 10_000
+    started = time.perf_counter()
+    for _ in range(runs):
+        child.observe(0.1)
+    # Observations sit on the per-delta path of every stream
+    assert (time.perf_counter() - started) / runs < 50e-6
@@ -0,0 +1,267 @@
+"""Hybrid document search tests"""
+import sqlite3
+from collections import namedtuple
+from typing import Dict, List
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from jose import jwt
+
+from app.api import documents
+from app.core.auth import TokenVerifier
+from app.core.config import settings
+from app.core.middleware import AuthMiddleware
+from app.services.rag import _HYBRID_SEARCH, RAGService
+
+SECRET = "test-secret"
+
+Row = namedtuple(
+    "Row",
+    "id document_id filename chunk_index content score vector_rank text_rank",
+)
+
+
+def rrf(legs: List[List[str]], k: int, limit: int) -> List[str]:
+    """Reference reciprocal-rank fusion: sum over legs of 1 / (k + rank)"""
+    scores: Dict[str, float] = {}
+    for leg in legs:
+        for rank, chunk_id in enumerate(leg, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda chunk_id: -scores[chunk_id])[:limit]
+
+
+def run_fusion(vector: List[str], text: List[str], rrf_k: int, limit: int):
+    """The statement's fusion stage run on SQLite over given leg rankings"""
+    sql = _HYBRID_SEARCH.text
+    db = sqlite3.connect(":memory:")
+    db.execute("ATTACH DATABASE ':memory:' AS r2r")
+    db.execute("CREATE TABLE r2r.documents (id, filename)")
+    db.execute("CREATE TABLE r2r.chunks (id, document_id, chunk_index, content)")
+    db.execute("INSERT INTO r2r.documents VALUES ('d1', 'notes.md')")
+    for name, leg in (("vector_leg", vector), ("text_leg", text)):
+        db.execute(f"CREATE TABLE {name} (id, rank)")
+        db.executemany(
+            f"INSERT INTO {name} VALUES (?, ?)",
+            [(chunk_id, rank) for rank, chunk_id in enumerate(leg, start=1)],
+        )
+    for index, chunk_id in enumerate(sorted(set(vector) | set(text))):
+        db.execute(
+            "INSERT INTO r2r.chunks VALUES (?, 'd1', ?, ?)",
+            (chunk_id, index, f"content of {chunk_id}"),
+        )
+    rows = db.execute(
+        "WITH " + sql[sql.index("fused AS"):], {"rrf_k": rrf_k, "limit": limit}
+    ).fetchall()
+    return [Row(*row) for row in rows]
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement, params):
+        self.calls.append((statement, params))
+        return iter(self.rows)
+
+
+class FakeEngine:
+    def __init__(self, rows):
+        self.connection = FakeConnection(rows)
+
+    def connect(self):
+        return self.connection
+
+
+class FakePipeline:
+    def __init__(self):
+        self.texts = []
+
+    async def embed(self, texts):
+        self.texts.extend(texts)
+        return [[0.5, 0.25] for _ in texts]
+
+
+class FakeRAG:
+    def __init__(self):
+        self.calls = []
+        self.deleted = []
+        self.jobs = {"j1": {"id": "j1", "user_id": "alice", "status": "done"}}
+        self.documents = {"d1": {"document_id": "d1", "user_id": "alice"}}
+
+    async def search(self, query, limit, user_id=None):
+        self.calls.append((query, limit, user_id))
+        return [{"chunk_id": "c1", "content": f"about {query}"}]
+
+    async def job(self, job_id):
+        return self.jobs.get(job_id)
+
+    async def document(self, document_id):
+        return self.documents.get(document_id)
+
+    async def delete_document(self, document_id):
+        self.deleted.append(document_id)
+        return self.documents.pop(document_id, None) is not None
+
+
+class FakeMemory:
+    def __init__(self):
+        self.calls = []
+
+    async def search(self, user_id, query, limit):
+        self.calls.append((user_id, query, limit))
+        return [{"content": f"{user_id} likes {query}"}]
+
+
+class FakeServices:
+    def __init__(self):
+        self.rag = FakeRAG()
+        self.memory = FakeMemory()
+
+    async def get(self, name):
+        return getattr(self, name)
+
+
+def make_client(services: FakeServices) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(
+        AuthMiddleware, verifier=TokenVerifier(jwt_secret=SECRET), required=False
+    )
+    app.include_router(documents.router, prefix="/api")
+    app.state.services = services
+    return TestClient(app)
+
+
+@pytest.mark.skipif(
+    sqlite3.sqlite_version_info < (3, 39), reason="needs FULL OUTER JOIN"
+)
+@pytest.mark.parametrize(
+    "vector, text, limit",
+    [
+        (["a", "b", "c", "d"], ["c", "e", "b"], 10),
+        (["a", "b", "c", "d"], ["c", "e", "b"], 2),
+        (["a", "b"], [], 5),
+        ([], ["x", "y", "z"], 5),
+    ],
+)
+def test_fusion_matches_reference(vector, text, limit):
+    rows = run_fusion(vector, text, rrf_k=60, limit=limit)
+    assert [row.id for row in rows] == rrf([vector, text], k=60, limit=limit)
+    for row in rows:
+        vector_rank = vector.index(row.id) + 1 if row.id in vector else None
+        text_rank = text.index(row.id) + 1 if row.id in text else None
+        assert (row.vector_rank, row.text_rank) == (vector_rank, text_rank)
+        expected = sum(1.0 / (60 + rank) for rank in (vector_rank, text_rank) if rank)
+        assert row.score == pytest.approx(expected)
+
+
+def test_fusion_favours_chunks_found_by_both_legs():
+    # Third in both legs beats first in only one
+    ranked = rrf([["a", "b", "c"], ["d", "e", "c"]], k=60, limit=10)
+    assert ranked[0] == "c"
+    assert set(ranked[1:3]) == {"a", "d"}
+
+
+@pytest.mark.asyncio
+async def test_search_binds_parameters_and_maps_rows():
+    rows = [
+        Row("c1", "d1", "notes.md", 0, "first", 0.0325, 1, 2),
+        Row("c2", "d1", "notes.md", 1, "second", 0.0161, None, 1),
+    ]
+    engine, pipeline = FakeEngine(rows), FakePipeline()
+    rag = RAGService(engine, pipeline)
+
+    results = await rag.search("hybrid search", limit=5, user_id="alice")
+
+    assert pipeline.texts == ["hybrid search"]
+    [(statement, params)] = engine.connection.calls
+    assert statement is _HYBRID_SEARCH
+    assert params == {
+        "query": "hybrid search",
+        "user_id": "alice",
+        "embedding": "[0.5,0.25]",
+        "candidates": settings.RAG_SEARCH_CANDIDATES,
+        "rrf_k": settings.RAG_RRF_K,
+        "limit": 5,
+    }
+    assert results[0] == {
+        "chunk_id": "c1",
+        "document_id": "d1",
+        "filename": "notes.md",
+        "chunk_index": 0,
+        "content": "first",
+        "score": 0.0325,
+        "vector_rank": 1,
+        "text_rank": 2,
+    }
+    assert results[1]["vector_rank"] is None
+
+
+@pytest.mark.asyncio
+async def test_search_takes_at_least_limit_candidates_per_leg():
+    engine = FakeEngine([])
+    rag = RAGService(engine, FakePipeline())
+    limit = settings.RAG_SEARCH_CANDIDATES + 10
+    assert await rag.search("q", limit=limit) == []
+    [(_, params)] = engine.connection.calls
+    assert params["candidates"] == limit
+
+
+def test_endpoint_gathers_documents_and_memories():
+    services = FakeServices()
+    client = make_client(services)
+    response = client.post(
+        "/api/documents/search",
+        json={"query": "pgvector", "limit": 3},
+        headers={"X-User-ID": "alice"},
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["count"] == 1
+    assert body["results"] == [{"chunk_id": "c1", "content": "about pgvector"}]
+    assert body["memories"] == [{"content": "alice likes pgvector"}]
+    assert body["user_context_applied"] is True
+    assert services.rag.calls == [("pgvector", 3, "alice")]
+    assert services.memory.calls == [("alice", "pgvector", 5)]
+
+
+@pytest.mark.parametrize(
+    "payload, headers",
+    [
+        ({"query": "pgvector", "use_memory": False}, {"X-User-ID": "alice"}),
+        ({"query": "pgvector"}, {}),
+    ],
+)
+def test_endpoint_skips_memory(payload, headers):
+    services = FakeServices()
+    client = make_client(services)
+    body = client.post("/api/documents/search", json=payload, headers=headers).json()
+    assert body["memories"] == []
+    assert body["user_context_applied"] is False
+    assert body["count"] == 1
+    assert services.rag.calls == [("pgvector", 10, headers.get("X-User-ID"))]
+    assert services.memory.calls == []
+
+
+def test_jobs_and_documents_are_checked_against_their_owner():
+    services = FakeServices()
+    client = make_client(services)
+    bob = {"Authorization": "Bearer " + jwt.encode({"sub": "bob"}, SECRET)}
+    alice = {"Authorization": "Bearer " + jwt.encode({"sub": "alice"}, SECRET)}
+
+    assert client.get("/api/documents/jobs/j1", headers=bob).status_code == 403
+    assert client.get("/api/documents/jobs/j1", headers=alice).status_code == 200
+    assert client.get("/api/documents/jobs/nope", headers=alice).status_code == 404
+
+    assert client.delete("/api/documents/d1", headers=bob).status_code == 403
+    assert services.rag.deleted == []
+    assert client.delete("/api/documents/d1", headers=alice).status_code == 200
+    assert client.delete("/api/documents/d1", headers=alice).status_code == 404
+    assert services.rag.deleted == ["d1"]
@@ -0,0 +1,162 @@
+"""Rate limiting and stream concurrency tests"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.auth import Principal, TokenVerifier
+from app.core.middleware import (
+    AuthMiddleware,
+    RateLimitMiddleware,
+    request_identities,
+)
+from app.services.rate_limit import Limit, RateLimiter, StreamLimiter
+
+
+class FakeRedis:
+    """Shared bucket with a fixed number of tokens and no refill"""
+
+    def __init__(self, tokens: int, fail: bool = False):
+        self.tokens = tokens
+        self.fail = fail
+        self.calls = 0
+
+    def register_script(self, script):
+        async def run(keys, args):
+            self.calls += 1
+            if self.fail:
+                raise ConnectionError("redis down")
+            granted = min(int(args[2]), self.tokens)
+            self.tokens -= granted
+            return [granted, "0" if granted else "0.5"]
+
+        return run
+
+
+@pytest.mark.asyncio
+async def test_local_bucket_limits_after_burst():
+    limiter = RateLimiter({"user": Limit(rate=1.0, burst=3)})
+    waits = [await limiter.check([("user", "alice")]) for _ in range(4)]
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert 0 < waits[3] <= 1.0
+    # Other users have their own bucket; unknown kinds are not limited
+    assert await limiter.check([("user", "bob"), ("team", "x")]) == 0.0
+    assert limiter.stats() == {"allowed": 4, "limited": 1}
+
+
+@pytest.mark.asyncio
+async def test_shared_bucket_is_spent_through_local_leases():
+    redis = FakeRedis(tokens=20)
+    limiter = RateLimiter({"key": Limit(rate=1.0, burst=20)}, redis=redis)
+    waits = [await limiter.check([("key", "k")]) for _ in range(25)]
+    assert waits[:20] == [0.0] * 20
+    assert all(wait > 0 for wait in waits[20:])
+    # Leases grow 1, 2, 4, 8... so most requests never reach Redis
+    assert redis.calls < 12
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_local_bucket_when_redis_fails():
+    limiter = RateLimiter(
+        {"key": Limit(rate=1.0, burst=2)}, redis=FakeRedis(0, fail=True)
+    )
+    waits = [await limiter.check([("key", "k")]) for _ in range(3)]
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] > 0
+
+
+@pytest.mark.asyncio
+async def test_failing_redis_is_skipped_until_retry():
+    redis = FakeRedis(0, fail=True)
+    limiter = RateLimiter(
+        {"key": Limit(rate=1e9, burst=1e9)}, redis=redis, redis_retry=0.05
+    )
+    for _ in range(10):
+        assert await limiter.check([("key", "k")]) == 0.0
+    assert redis.calls == 1
+    await asyncio.sleep(0.06)
+    redis.fail = False
+    redis.tokens = 10
+    assert await limiter.check([("key", "k")]) == 0.0
+    assert redis.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_local_check_is_fast():
+    limiter = RateLimiter(
+        {"key": Limit(rate=1e9, burst=1e9), "user": Limit(rate=1e9, burst=1e9)}
+    )
+    scope = {"state": {"principal": Principal("k1", "api_key"), "user_id": "u1"}}
+    runs = 10_000
+    started = time.perf_counter()
+    for _ in range(runs):
+        await limiter.check(request_identities(scope))
+    assert (time.perf_counter() - started) / runs < 100e-6
+
+
+def test_stream_limiter_caps_concurrent_streams():
+    streams = StreamLimiter(max_streams=2)
+    assert streams.acquire("alice") and streams.acquire("alice")
+    assert not streams.acquire("alice")
+    assert streams.acquire("bob")
+    streams.release("alice")
+    assert streams.acquire("alice")
+    assert StreamLimiter(max_streams=0).acquire("alice")
+
+
+@pytest.mark.asyncio
+async def test_hold_releases_slot_when_stream_ends():
+    streams = StreamLimiter(max_streams=1)
+    assert streams.acquire("alice")
+
+    async def events():
+        yield "a"
+        yield "b"
+
+    assert [e async for e in streams.hold("alice", events())] == ["a", "b"]
+    assert streams.active == {}
+
+
+def test_request_identities():
+    principal = Principal("k1", "jwt", "alice")
+    scope = {"state": {"principal": principal, "user_id": "alice"}}
+    assert request_identities(scope) == [("key", "k1"), ("user", "alice")]
+    scope = {"state": {"principal": None, "user_id": None}, "client": ("1.2.3.4", 80)}
+    assert request_identities(scope) == [("user", "ip:1.2.3.4")]
+    # A bare X-User-ID header does not escape the per-address limit
+    scope["state"]["user_id"] = "bob"
+    assert request_identities(scope) == [("user", "bob"), ("user", "ip:1.2.3.4")]
+
+
+def test_middleware_returns_openai_style_429():
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware)
+    app.add_middleware(
+        AuthMiddleware, verifier=TokenVerifier(["sk-test", "sk-other"])
+    )
+    app.state.services = SimpleNamespace(
+        limiter=RateLimiter({"key": Limit(rate=0.01, burst=1)})
+    )
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list"}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    client = TestClient(app)
+    headers = {"Authorization": "Bearer sk-test"}
+    assert client.get("/v1/models", headers=headers).status_code == 200
+    response = client.get("/v1/models", headers=headers)
+    assert response.status_code == 429
+    assert response.json()["error"]["code"] == "rate_limit_exceeded"
+    assert int(response.headers["retry-after"]) >= 1
+    # Other keys and unlimited paths are unaffected
+    other = {"Authorization": "Bearer sk-other"}
+    assert client.get("/v1/models", headers=other).status_code == 200
+    assert client.get("/health", headers=headers).status_code == 200
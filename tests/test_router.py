@@ -0,0 +1,195 @@
+"""Latency-aware model routing tests"""
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.services.llm import LLMService, OllamaProvider, OpenAIProvider
+from app.services.router import HedgeBudget, LatencyStats, ModelRouter
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+def fake_provider(cls, name, delay=0.0, fail=False):
+    """Provider backed by a mock transport that injects latency"""
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        await asyncio.sleep(delay)
+        if fail:
+            return httpx.Response(500, text="boom")
+        body = json.loads(request.content)
+        if cls is OllamaProvider:
+            if body["stream"]:
+                lines = [json.dumps({"message": {"content": name}, "done": True})]
+                return httpx.Response(200, text="\n".join(lines))
+            return httpx.Response(200, json={"message": {"content": name}})
+        if body["stream"]:
+            return httpx.Response(
+                200,
+                text=f'data: {{"choices":[{{"delta":{{"content":"{name}"}}}}]}}\n\n'
+                "data: [DONE]",
+            )
+        return httpx.Response(
+            200, json={"choices": [{"message": {"content": name}}]}
+        )
+
+    provider = cls("http://mock", "key", transport=httpx.MockTransport(handler))
+    provider.calls = calls
+    return provider
+
+
+def service(primary, secondary, **options):
+    return LLMService(
+        [primary, secondary],
+        routes={
+            "synapse-fast": ["openai/fast", "ollama/local", "missing/model"],
+            "synapse-smart": ["openai/smart"],
+        },
+        **options,
+    )
+
+
+def test_latency_stats_quantiles_and_window():
+    stats = LatencyStats(window=60)
+    for latency in range(1, 101):
+        stats.record(latency / 100)
+    stats.record_error()
+    assert stats.quantile(0.5) == 0.5
+    assert stats.quantile(0.95) == 0.95
+    assert stats.error_rate == pytest.approx(1 / 101)
+
+    stats.window = -1
+    assert stats.samples == 0 and stats.quantile(0.5) is None
+
+
+@pytest.mark.asyncio
+async def test_routes_skip_unconfigured_and_prefer_fastest():
+    openai = fake_provider(OpenAIProvider, "openai", delay=0.03)
+    ollama = fake_provider(OllamaProvider, "ollama", delay=0.0)
+    llm = service(openai, ollama, min_samples=2)
+    assert [b[0].name for b in llm.router.routes["synapse-fast"]] == [
+        "openai",
+        "ollama",
+    ]
+
+    # Unmeasured backends are tried first, then the faster one wins
+    for _ in range(4):
+        await llm.complete("synapse-fast", MESSAGES)
+    assert llm.resolve("synapse-fast") == (ollama, "local")
+    completion = await llm.complete("synapse-fast", MESSAGES)
+    assert completion.content == "ollama"
+    assert llm.resolve("synapse-smart") == (openai, "smart")
+    await llm.close()
+
+
+@pytest.mark.asyncio
+async def test_failover_and_unhealthy_backends_rank_last():
+    openai = fake_provider(OpenAIProvider, "openai", fail=True)
+    ollama = fake_provider(OllamaProvider, "ollama")
+    llm = service(openai, ollama, min_samples=1, hedge_routes=())
+
+    completion = await llm.complete("synapse-fast", MESSAGES)
+    assert completion.content == "ollama"
+    assert llm.router.snapshot()["openai/fast"]["complete"]["error_rate"] == 1.0
+    assert llm.resolve("synapse-fast") == (ollama, "local")
+    await llm.close()
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_takes_first_answer():
+    openai = fake_provider(OpenAIProvider, "openai", delay=0.5)
+    ollama = fake_provider(OllamaProvider, "ollama", delay=0.01)
+    llm = service(openai, ollama, hedge_routes=["synapse-fast"], hedge_delay=0.05)
+
+    started = time.perf_counter()
+    completion = await llm.complete("synapse-fast", MESSAGES)
+    assert completion.content == "ollama"
+    assert time.perf_counter() - started < 0.3
+    assert len(openai.calls) == len(ollama.calls) == 1
+
+    started = time.perf_counter()
+    llm.router.stats.clear()
+    deltas = [d async for d in llm.stream("synapse-fast", MESSAGES)]
+    assert deltas == ["ollama"]
+    assert time.perf_counter() - started < 0.3
+    await llm.close()
+
+
+def test_hedge_budget_caps_extra_traffic():
+    budget = HedgeBudget(ratio=0.1, burst=2)
+    granted = 0
+    for _ in range(100):
+        budget.deposit()
+        granted += budget.withdraw()
+    assert granted <= 2 + 100 * 0.1
+    assert budget.denied == 100 - granted
+
+
+@pytest.mark.asyncio
+async def test_completion_hedging_uses_p95_and_budget():
+    openai = fake_provider(OpenAIProvider, "openai", delay=0.02)
+    ollama = fake_provider(OllamaProvider, "ollama", delay=0.01)
+    llm = service(
+        openai,
+        ollama,
+        min_samples=3,
+        hedge_completions=True,
+        hedge_delay=10.0,
+        budget=HedgeBudget(ratio=0.0, burst=1),
+    )
+    router = llm.router
+    smart = router.candidates("synapse-smart")[0]
+    assert router.hedge_delay_for("synapse-smart", smart) is None  # one target
+
+    primary, secondary = router.candidates("synapse-fast")
+    assert router.hedge_delay_for("synapse-fast", primary, "stream") is None
+    assert router.hedge_delay_for("synapse-fast", primary) == 10.0
+    for _ in range(3):
+        router.stats_for(primary).record(0.05)
+        router.stats_for(secondary).record(0.1)
+    assert router.candidates("synapse-fast")[0] == primary
+    assert router.hedge_delay_for("synapse-fast", primary) == 0.05
+
+    # Primary is now slow: the first call hedges, the budget stops the second
+    openai_slow = fake_provider(OpenAIProvider, "openai", delay=0.3)
+    openai.client = openai_slow.client
+    first = await llm.complete("synapse-fast", MESSAGES)
+    second = await llm.complete("synapse-fast", MESSAGES)
+    assert (first.content, second.content) == ("ollama", "openai")
+    assert router.budget.snapshot()["hedges"] == 1
+    assert router.budget.snapshot()["denied"] == 1
+    await llm.close()
+
+
+@pytest.mark.asyncio
+async def test_race_releases_results_that_finish_before_cancel():
+    router = ModelRouter({})
+    backends = [(SimpleNamespace(name=name), "m") for name in ("a", "b", "c")]
+    go, late = asyncio.Event(), asyncio.Event()
+    released = []
+
+    async def attempt(backend):
+        provider, _ = backend
+        await (late if provider.name == "c" else go).wait()
+        return provider.name
+
+    async def release(result):
+        released.append(result)
+        # The last attempt finishes while a loser is being released
+        late.set()
+        await asyncio.sleep(0.01)
+
+    async def start():
+        await asyncio.sleep(0.02)
+        go.set()
+
+    starter = asyncio.ensure_future(start())
+    result, _ = await router.race(backends, attempt, 0.001, release=release)
+    await starter
+    assert sorted(released + [result]) == ["a", "b", "c"]
+    assert released[-1] == "c"
@@ -0,0 +1,64 @@
+"""Service manager tests"""
+import asyncio
+
+import pytest
+
+from app.core import services as services_module
+from app.core.services import ServiceManager
+
+
+@pytest.fixture(autouse=True)
+def no_database(monkeypatch):
+    async def init_db():
+        pass
+
+    class FakeService:
+        async def close(self):
+            pass
+
+    async def create(engine, embed, redis=None):
+        return FakeService()
+
+    async def create_entities(engine):
+        return FakeService()
+
+    monkeypatch.setattr(services_module, "init_db", init_db)
+    monkeypatch.setattr(services_module.MemoryService, "create", create)
+    monkeypatch.setattr(services_module.RAGService, "create", create)
+    monkeypatch.setattr(services_module.EntityStore, "create", create_entities)
+
+
+@pytest.mark.asyncio
+async def test_lazy_mode_warms_on_first_use():
+    """Lazy services stay cold until requested, then initialize once"""
+    manager = ServiceManager(lazy=True)
+    calls = 0
+    original = manager._init_mcp
+
+    async def init_mcp():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        await original()
+
+    manager._init_mcp = init_mcp
+    await manager.initialize()
+
+    status = manager.status()
+    assert status["database"] == "warm"
+    assert all(status[name] == "cold" for name in ServiceManager.LAZY)
+
+    await asyncio.gather(*(manager.get("mcp") for _ in range(5)))
+    assert calls == 1
+    assert manager.status()["mcp"] == "warm"
+    assert "mcp" in manager.startup_timings
+    await manager.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_eager_mode_warms_everything():
+    """Without lazy mode every service is warm after initialize"""
+    manager = ServiceManager(lazy=False)
+    await manager.initialize()
+    assert set(manager.status().values()) == {"warm"}
+    await manager.shutdown()
@@ -0,0 +1,65 @@
+"""Startup scheduler tests"""
+import asyncio
+import time
+
+import pytest
+
+from app.core.startup import StartupError, StartupScheduler
+
+
+def sleeper(seconds, log=None, name=None):
+    async def step():
+        await asyncio.sleep(seconds)
+        if log is not None:
+            log.append(name)
+
+    return step
+
+
+@pytest.mark.asyncio
+async def test_independent_steps_run_concurrently():
+    """Wall time is the longest chain, not the sum of steps"""
+    order = []
+    scheduler = StartupScheduler()
+    scheduler.add("database", sleeper(0.05, order, "database"))
+    scheduler.add("llm", sleeper(0.05, order, "llm"))
+    scheduler.add("memory", sleeper(0.05, order, "memory"), depends_on=["database"])
+    scheduler.add("rag", sleeper(0.05, order, "rag"), depends_on=["database"])
+
+    started = time.perf_counter()
+    await scheduler.run()
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.15
+    assert order.index("database") < order.index("memory")
+    assert order.index("database") < order.index("rag")
+    assert set(scheduler.timings) == {"database", "llm", "memory", "rag"}
+
+
+@pytest.mark.asyncio
+async def test_timeouts_and_failed_dependencies():
+    """A timed-out step fails, its dependents are skipped, others still run"""
+    ran = []
+    scheduler = StartupScheduler()
+    scheduler.add("database", sleeper(1.0), timeout=0.01)
+    scheduler.add("memory", sleeper(0, ran, "memory"), depends_on=["database"])
+    scheduler.add("llm", sleeper(0, ran, "llm"))
+
+    with pytest.raises(StartupError) as exc:
+        await scheduler.run()
+
+    assert set(exc.value.failures) == {"database", "memory"}
+    assert isinstance(exc.value.failures["database"], TimeoutError)
+    assert ran == ["llm"]
+
+
+def test_dependency_validation():
+    """Unknown dependencies and cycles are rejected before anything runs"""
+    scheduler = StartupScheduler()
+    scheduler.add("a", sleeper(0), depends_on=["b"])
+    with pytest.raises(ValueError):
+        asyncio.run(scheduler.run())
+
+    scheduler.add("b", sleeper(0), depends_on=["a"])
+    with pytest.raises(ValueError, match="cycle"):
+        asyncio.run(scheduler.run())
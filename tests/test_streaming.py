@@ -0,0 +1,101 @@
+"""SSE chunk encoder tests"""
+import asyncio
+import json
+
+import pytest
+
+from app.services.streaming import DONE, ChunkEncoder, coalesce, encode_stream
+
+
+def parse(event: bytes) -> dict:
+    assert event.startswith(b"data: ") and event.endswith(b"\n\n")
+    return json.loads(event[6:-2])
+
+
+async def collect(stream):
+    return [item async for item in stream]
+
+
+async def from_list(items, delay=0.0):
+    for item in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield item
+
+
+def test_encoder_events_are_valid_json():
+    """Each event is a complete chat.completion.chunk with escaped content"""
+    encoder = ChunkEncoder("synapse", completion_id="chatcmpl-1", created=42)
+
+    role = parse(encoder.role())
+    assert role["id"] == "chatcmpl-1"
+    assert role["created"] == 42
+    assert role["object"] == "chat.completion.chunk"
+    assert role["choices"][0]["delta"] == {"role": "assistant"}
+
+    content = parse(encoder.content('say "hi"\n'))
+    assert content["choices"][0]["delta"] == {"content": 'say "hi"\n'}
+    assert content["choices"][0]["finish_reason"] is None
+
+    finish = parse(encoder.finish())
+    assert finish["choices"][0]["delta"] == {}
+    assert finish["choices"][0]["finish_reason"] == "stop"
+
+
+@pytest.mark.asyncio
+async def test_encode_stream_without_coalescing():
+    """One content event per delta, framed by role/finish/DONE"""
+    events = await collect(
+        encode_stream(ChunkEncoder("synapse"), from_list(["a", "b", "c"]))
+    )
+    assert len(events) == 6
+    assert events[-1] == DONE
+    assert [parse(e)["choices"][0]["delta"].get("content") for e in events[1:4]] == [
+        "a",
+        "b",
+        "c",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_encode_stream_reports_usage_before_done():
+    """The usage callback sees the whole completion text"""
+    events = await collect(
+        encode_stream(
+            ChunkEncoder("synapse"),
+            from_list(["ab", "cd"]),
+            usage=lambda text: {"completion_tokens": len(text)},
+        )
+    )
+    assert events[-1] == DONE
+    usage = parse(events[-2])
+    assert usage["choices"] == []
+    assert usage["usage"] == {"completion_tokens": 4}
+
+
+@pytest.mark.asyncio
+async def test_coalesce_merges_fast_deltas():
+    """Deltas arriving within the flush interval share one frame"""
+    frames = await collect(coalesce(from_list(["a", "b", "c"]), flush_interval=0.05))
+    assert frames == ["abc"]
+
+
+@pytest.mark.asyncio
+async def test_coalesce_flushes_on_interval():
+    """A stalled upstream does not hold buffered text past the interval"""
+    frames = await collect(
+        coalesce(from_list(["a", "b"], delay=0.05), flush_interval=0.01)
+    )
+    assert frames == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_coalesce_propagates_upstream_errors():
+    """Upstream failures surface to the consumer"""
+
+    async def failing():
+        yield "a"
+        raise RuntimeError("upstream closed")
+
+    with pytest.raises(RuntimeError):
+        await collect(coalesce(failing(), flush_interval=0.01))
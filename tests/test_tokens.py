@@ -0,0 +1,83 @@
+"""Token accounting tests"""
+import pytest
+
+from app.services.tokens import (
+    MESSAGE_OVERHEAD,
+    REPLY_OVERHEAD,
+    ContextWindowError,
+    TokenCounter,
+)
+
+
+def message(role, content):
+    return {"role": role, "content": content}
+
+
+def test_counts_are_memoized_per_content():
+    counter = TokenCounter()
+    first = counter.count("hello world " * 100, "gpt-4o")
+    assert counter.count("hello world " * 100, "gpt-4o") == first
+    assert (counter.hits, counter.misses) == (1, 1)
+    assert counter.count_messages([message("user", "hi")]) == (
+        REPLY_OVERHEAD + MESSAGE_OVERHEAD + counter.count("hi")
+    )
+
+
+def test_context_window_uses_longest_prefix():
+    counter = TokenCounter(windows={"my-model": 4_000}, default_window=1_000)
+    assert counter.context_window("openai/gpt-4o-mini") == 128_000
+    assert counter.context_window("gpt-4") == 8_192
+    assert counter.context_window("ollama/my-model-7b") == 4_000
+    assert counter.context_window("unknown") == 1_000
+
+
+def test_fit_passes_small_prompts_through():
+    counter = TokenCounter()
+    messages = [message("system", "be brief"), message("user", "hi")]
+    fitted = counter.fit(messages, "gpt-4o", max_tokens=100)
+    assert fitted.messages == messages
+    assert fitted.max_tokens == 100
+    assert fitted.prompt_tokens == counter.count_messages(messages, "gpt-4o")
+
+
+def test_fit_drops_oldest_turns_first():
+    counter = TokenCounter(default_window=2_000, completion_reserve=500)
+    history = [message("user", f"turn {i} " + "x" * 2_000) for i in range(6)]
+    messages = [message("system", "be brief"), *history, message("user", "now?")]
+    fitted = counter.fit(messages, "small")
+
+    assert fitted.prompt_tokens <= 1_500
+    assert fitted.dropped > 0
+    assert fitted.messages[0] == messages[0]
+    assert "omitted" in fitted.messages[1]["content"]
+    assert fitted.messages[-1] == messages[-1]
+    assert fitted.messages[2:-1] == history[fitted.dropped :]
+
+
+def test_fit_truncates_oversized_latest_message_and_clamps_max_tokens():
+    counter = TokenCounter(default_window=4_000)
+    content = "HEAD " + "y" * 40_000 + " TAIL"
+    fitted = counter.fit([message("user", content)], "small", max_tokens=10_000)
+
+    assert fitted.truncated == [0]
+    truncated = fitted.messages[0]["content"]
+    assert truncated.startswith("HEAD") and truncated.endswith("TAIL")
+    assert fitted.prompt_tokens <= 2_000
+    assert fitted.max_tokens == 4_000 - fitted.prompt_tokens
+
+
+def test_fit_rejects_invalid_max_tokens():
+    with pytest.raises(ContextWindowError):
+        TokenCounter().fit([message("user", "hi")], "gpt-4o", max_tokens=0)
+
+
+def test_usage_prefers_provider_numbers():
+    counter = TokenCounter()
+    fitted = counter.fit([message("user", "hi")], "gpt-4o")
+    reported = {"prompt_tokens": 9, "completion_tokens": 1, "total_tokens": 10}
+    assert counter.usage(fitted, "hello", reported) == reported
+
+    usage = counter.usage(fitted, "hello", {"total_tokens": 0})
+    assert usage["prompt_tokens"] == fitted.prompt_tokens
+    assert usage["completion_tokens"] == counter.count("hello", "gpt-4o")
+    assert usage["total_tokens"] == usage["prompt_tokens"] + usage["completion_tokens"]
@@ -0,0 +1,41 @@
+"""Vector index lifecycle tests"""
+from pathlib import Path
+
+from app.services.vector_index import VectorIndex, managed_indexes
+
+IVFFLAT = (
+    "CREATE INDEX idx_entities_embedding ON shared.entities "
+    "USING ivfflat (embedding vector_cosine_ops) WITH (lists='100')"
+)
+HNSW = (
+    "CREATE INDEX idx_entities_embedding ON shared.entities "
+    "USING hnsw (embedding vector_cosine_ops) WITH (m='16', ef_construction='64')"
+)
+
+
+def test_ddl_uses_configured_parameters():
+    index = VectorIndex("idx_x", "shared.entities", m=32, ef_construction=128)
+    assert index.ddl(concurrently=True) == (
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_x ON shared.entities "
+        "USING hnsw (embedding vector_cosine_ops) "
+        "WITH (m = 32, ef_construction = 128)"
+    )
+
+
+def test_drift_detects_method_and_parameters():
+    index = VectorIndex("idx_entities_embedding", "shared.entities")
+    assert index.drift(HNSW) == []
+    assert index.drift(None) == ["missing"]
+    assert index.drift(IVFFLAT) == ["method ivfflat != hnsw"]
+
+    tuned = VectorIndex("idx_entities_embedding", "shared.entities", m=32)
+    assert tuned.drift(HNSW) == ["m 16 != 32"]
+    # Options left out of the definition take pgvector's defaults
+    assert index.drift(HNSW.partition(" WITH ")[0]) == []
+
+
+def test_init_sql_matches_default_settings():
+    init_sql = (Path(__file__).parent.parent / "scripts" / "init.sql").read_text()
+    index = managed_indexes()["idx_entities_embedding"]
+    assert "USING ivfflat" not in init_sql
+    assert f"m = {index.m}, ef_construction = {index.ef_construction}" in init_sql